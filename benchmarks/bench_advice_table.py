@@ -0,0 +1,61 @@
+# benchmarks/bench_advice_table.py
+"""
+比较规则引擎逐条调用原函数与查表的单条建议耗时
+用法: python benchmarks/bench_advice_table.py [--number 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.advice_table import lookup_advice
+from weather_advisor.advisor import get_clothing_suggestion
+from weather_advisor.utils import (
+    get_comfort_level,
+    get_regional_advice,
+    get_weather_emoji,
+)
+
+CITIES = ["Tokyo", "Osaka", "Beijing", "London", "Sydney", "Berlin", "Sapporo", "Seoul"]
+DESCS = ["clear sky", "小雨", "曇り", "light rain", "snow", "mist", "多云", "強風"]
+
+
+def rule_functions(city, temp, desc, lang):
+    return (
+        get_clothing_suggestion(temp, desc, lang),
+        get_comfort_level(temp, desc, lang),
+        get_weather_emoji(desc, temp),
+        get_regional_advice(city, temp, lang),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规则引擎查找表基准")
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # 温度保留一位小数，与 API 返回值相近
+    inputs = [
+        (
+            rng.choice(CITIES),
+            round(rng.uniform(-10, 40), 1),
+            rng.choice(DESCS),
+            rng.choice(("ja", "zh", "en")),
+        )
+        for _ in range(args.number)
+    ]
+
+    for label, fn in (("rule functions", rule_functions), ("lookup table", lookup_advice)):
+        start = time.perf_counter()
+        for city, temp, desc, lang in inputs:
+            fn(city, temp, desc, lang)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} {elapsed / args.number * 1e9:8.0f} ns/advice")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_decoding.py
+"""
+比较各 JSON 后端解码已录制响应的速度
+用法: python benchmarks/bench_decoding.py [--number 20000]
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.records import Observation
+
+PAYLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloads")
+
+
+def load_payload(name):
+    with open(os.path.join(PAYLOAD_DIR, name), "rb") as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 解码后端基准")
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    weather = load_payload("weather_tokyo.json")
+    group = load_payload("group_20.json")
+    ollama = load_payload("ollama_generate.json")
+
+    # 基线：改动前的做法（完整解析后再取字段）
+    cases = {
+        "baseline (json + dict)": {
+            "weather": lambda: Observation.from_payload(json.loads(weather)),
+            "group_20": lambda: [Observation.from_payload(p) for p in json.loads(group)["list"]],
+            "ollama": lambda: json.loads(ollama).get("response", ""),
+        }
+    }
+
+    import weather_advisor.decoding as decoding
+
+    for backend in ("json", "orjson", "msgspec"):
+        os.environ["WEATHER_ADVISOR_JSON"] = backend
+        decoding = importlib.reload(decoding)
+        if decoding.BACKEND != backend:
+            print(f"(跳过 {backend}: 未安装)")
+            continue
+        # 重新加载后模块属性会被替换，这里先取出当前后端的函数
+        cases[backend] = {
+            "weather": lambda f=decoding.decode_weather: f(weather),
+            "group_20": lambda f=decoding.decode_weather_list: f(group),
+            "ollama": lambda f=decoding.decode_ollama_response: f(ollama),
+        }
+
+    print(f"{'backend':<24}" + "".join(f"{name:>14}" for name in ("weather", "group_20", "ollama")))
+    for label, funcs in cases.items():
+        cells = []
+        for name in ("weather", "group_20", "ollama"):
+            seconds = timeit.timeit(funcs[name], number=args.number)
+            cells.append(f"{seconds / args.number * 1e6:11.2f} µs")
+        print(f"{label:<24}" + "".join(f"{c:>14}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_fast_model.py
+"""
+测量 fast 模式单次建议的耗时
+用法: python benchmarks/bench_fast_model.py [--corpus 50000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.clock import clock_for
+from weather_advisor.fast_model import FastModel
+from weather_advisor.history import HistoryEntry
+
+CITIES = ["Tokyo", "Osaka", "Sapporo", "Kyoto", "Fukuoka", "Sendai", "Nagoya", "Naha"]
+DESCS = ["晴れ", "曇り", "小雨", "雪", "霧", "強風", "雷雨", "曇り時々晴れ"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fast 模式基准")
+    parser.add_argument("--corpus", type=int, default=50000, help="历史建议条数")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    model = FastModel("ja", seed=0)
+    start = time.perf_counter()
+    for i in range(args.corpus):
+        model.add(
+            HistoryEntry(
+                1_700_000_000 + i * 600,
+                rng.choice(CITIES),
+                round(rng.uniform(-10, 38), 1),
+                rng.choice(DESCS),
+                "ja",
+                "ollama",
+                f"おすすめ {i % 5000}",
+            )
+        )
+    print(f"build   {time.perf_counter() - start:8.3f} s for {model.size} entries")
+
+    queries = [
+        (rng.choice(CITIES), round(rng.uniform(-10, 38), 1), rng.choice(DESCS),
+         clock_for(rng.randrange(24), rng.randrange(1, 13)))
+        for _ in range(args.queries)
+    ]
+    latencies = []
+    for city, temp, desc, clock in queries:
+        t0 = time.perf_counter()
+        model.suggest(city, temp, desc, clock)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    for q in (50, 90, 99):
+        print(f"p{q:<6} {latencies[int(q / 100 * len(latencies)) - 1] * 1000:8.3f} ms")
+    print(f"max     {latencies[-1] * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_geocode.py
+"""
+地理编码索引的性能测试：打开（内存映射）耗时、查找延迟、文件大小
+
+用法:
+    python benchmarks/bench_geocode.py --sizes 1000,100000,1000000 --queries 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.geocode import GeocodeIndex, Place, write_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="地理编码索引性能测试")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            places = {
+                f"city {i}": Place(f"City {i}", "JP", rng.uniform(-90, 90), rng.uniform(-180, 180))
+                for i in range(size)
+            }
+            path = os.path.join(tmp, f"geo-{size}.idx")
+            start = time.perf_counter()
+            write_index(path, places)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = GeocodeIndex(path)
+            opened = time.perf_counter() - start
+
+            # 一半命中、一半未命中
+            names = [f"City {rng.randrange(size * 2)}" for _ in range(args.queries)]
+            start = time.perf_counter()
+            hits = sum(index.lookup(name) is not None for name in names)
+            per_query = (time.perf_counter() - start) / args.queries
+            index.close()
+
+            print(
+                f"{size:>9} 条  文件 {os.path.getsize(path) / 1024:9.1f} KiB  生成 {build:6.2f}s  "
+                f"打开 {opened * 1e6:7.1f}us  查找 {per_query * 1e6:6.2f}us  命中 {hits / args.queries:.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# benchmarks/bench_prompt_builder.py
+"""
+比较提示词构建速度（次/秒）：
+- legacy:   改动前的实现（每次重建地域字典并格式化三种语言）
+- compiled: 预编译模板，输入各不相同（缓存未命中）
+- memo:     批量生成中常见的重复输入（缓存命中）
+用法: python benchmarks/bench_prompt_builder.py [--number 100000]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.clock import ClockContext, current_clock
+from weather_advisor.prompt_builder import build_prompt_parts, compile_prompt
+
+CITIES = ["Tokyo", "Osaka", "London", "Sydney", "Beijing", "Berlin", "New York", "Sapporo"]
+DESCS = ["晴れ", "小雨", "曇り", "light rain", "snow"]
+
+
+def legacy_build_enhanced_prompt(
+    city: str,
+    temp: float,
+    desc: str,
+    time_remark: str,
+    lang: str = "ja",
+    clock: Optional[ClockContext] = None,
+) -> str:
+    """
+    构建增强版AI提示词，包含个性化信息
+    """
+    # 确定时间段和季节
+    clock = clock or current_clock()
+    time_period = clock.period
+    season = clock.season
+
+    # 地域特色提示
+    regional_context = {
+        "tokyo": "high humidity area",
+        "osaka": "windy conditions common",
+        "kyoto": "temperature fluctuations due to basin location",
+        "london": "frequent light rain",
+        "paris": "cobblestone streets",
+        "new york": "windy between buildings",
+        "beijing": "dusty conditions and air quality concerns",
+        "shanghai": "high humidity and frequent rain",
+        "singapore": "extremely hot and humid year-round",
+    }
+
+    region_hint = ""
+    for city_key, context in regional_context.items():
+        if city_key in city.lower():
+            region_hint = f" Note: {city} is known for {context}."
+            break
+
+    prompts = {
+        "en": f"""You are a professional styling consultant with expertise in weather-appropriate fashion. 
+
+Current Context:
+- Location: {city}{region_hint}
+- Temperature: {temp}℃
+- Weather: {desc}
+- Time: {time_period} ({time_remark})
+- Season: {season}
+
+Provide ONE concise, practical clothing recommendation that considers:
+1. Temperature comfort and layering
+2. Weather protection needs
+3. Time-appropriate styling
+4. Seasonal fashion trends
+5. Regional climate characteristics
+
+Response should be specific, actionable, and under 25 words.""",
+        "zh": f"""你是专业的时尚造型顾问，专门提供适合天气的穿搭建议。
+
+当前情况：
+- 地点：{city}{region_hint}
+- 气温：{temp}℃
+- 天气：{desc}
+- 时间：{time_period}（{time_remark}）
+- 季节：{season}
+
+请提供一条简洁实用的穿衣建议，需要考虑：
+1. 温度舒适性和层次搭配
+2. 天气防护需求
+3. 时间段合适性
+4. 季节时尚趋势
+5. 地域气候特点
+
+回答要具体、可行，控制在25字以内。""",
+        "ja": f"""あなたは天候に適したファッションの専門スタイリストです。
+
+現在の状況：
+- 場所：{city}{region_hint}
+- 気温：{temp}℃
+- 天気：{desc}
+- 時間帯：{time_period}（{time_remark}）
+- 季節：{season}
+
+以下を考慮した簡潔で実用的な服装提案を1つお願いします：
+1. 気温による快適性と重ね着
+2. 天候に対する防護
+3. 時間帯に適したスタイル
+4. 季節のトレンド
+5. 地域の気候特性
+
+25文字以内で、具体的で実行可能な提案をしてください。""",
+    }
+
+    return prompts.get(lang, prompts["ja"])
+
+
+def run(label, build, inputs, clock):
+    start = time.perf_counter()
+    for city, temp, desc, lang in inputs:
+        build(city, temp, desc, "夜は冷え込むでしょう", lang, clock)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {len(inputs) / elapsed:12,.0f} builds/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词构建基准")
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    clock = current_clock()
+    langs = ("ja", "zh", "en")
+    # 每条输入的温度都不同，保证缓存不会命中
+    unique = [
+        (CITIES[i % len(CITIES)], i / 100, DESCS[i % len(DESCS)], langs[i % 3])
+        for i in range(args.number)
+    ]
+    # 温度保留整数，组合数远小于缓存容量
+    repeated = [
+        (CITIES[i % len(CITIES)], float(i % 30), DESCS[i % len(DESCS)], langs[i % 3])
+        for i in range(args.number)
+    ]
+
+    run("legacy", legacy_build_enhanced_prompt, unique, clock)
+    compile_prompt.cache_clear()
+    run("compiled", lambda *a: build_prompt_parts(*a).text, unique, clock)
+    compile_prompt.cache_clear()
+    run("memo", lambda *a: build_prompt_parts(*a).text, repeated, clock)
+    print(f"cache: {compile_prompt.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
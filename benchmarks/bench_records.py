@@ -0,0 +1,75 @@
+# benchmarks/bench_records.py
+"""
+测量每条记录的内存占用：原始 API 字典 vs Observation
+用法: python benchmarks/bench_records.py --count 1000000
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.records import Observation, iter_csv_observations
+
+# OpenWeatherMap /weather 的典型响应
+SAMPLE_PAYLOAD = {
+    "coord": {"lon": 139.6917, "lat": 35.6895},
+    "weather": [{"id": 500, "main": "Rain", "description": "小雨", "icon": "10d"}],
+    "base": "stations",
+    "main": {
+        "temp": 21.3,
+        "feels_like": 21.5,
+        "temp_min": 20.1,
+        "temp_max": 22.8,
+        "pressure": 1012,
+        "humidity": 78,
+    },
+    "visibility": 10000,
+    "wind": {"speed": 3.6, "deg": 170},
+    "clouds": {"all": 75},
+    "dt": 1718000000,
+    "sys": {"type": 2, "id": 2038398, "country": "JP", "sunrise": 1717962000, "sunset": 1718013000},
+    "timezone": 32400,
+    "id": 1850144,
+    "name": "Tokyo",
+    "cod": 200,
+}
+
+
+def measure(label, build, count):
+    gc.collect()
+    tracemalloc.start()
+    items = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {current / count:8.1f} bytes/record  ({current / 2**20:8.1f} MiB total)")
+    del items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记录类型内存占用基准")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    line = json.dumps(SAMPLE_PAYLOAD, ensure_ascii=False)
+    measure("raw payload dict", lambda n: [json.loads(line) for _ in range(n)], args.count)
+    measure(
+        "Observation.from_payload",
+        lambda n: [Observation.from_payload(json.loads(line)) for _ in range(n)],
+        args.count,
+    )
+
+    csv_text = "city,temp,desc,timezone,lat,lon\n" + "Tokyo,21.3,小雨,32400,35.6895,139.6917\n" * args.count
+    measure(
+        "CSV bulk -> Observation",
+        lambda n: list(iter_csv_observations(io.StringIO(csv_text))),
+        args.count,
+    )
+
+
+if __name__ == "__main__":
+    main()
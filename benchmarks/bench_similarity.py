@@ -0,0 +1,86 @@
+# benchmarks/bench_similarity.py
+"""
+相似建议检索的性能测试：KD 树索引 vs 逐条扫描
+
+用法:
+    python benchmarks/bench_similarity.py --sizes 1000,10000,50000 --queries 2000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.clock import clock_for
+from weather_advisor.history import HistoryEntry
+from weather_advisor.similarity import SimilarityIndex, feature_vector
+
+CITIES = ["Tokyo", "Osaka", "London", "Paris", "Beijing", "New York", "Sydney"]
+DESCS = ["晴れ", "曇り", "小雨", "雨", "雪", "霧"]
+CLOCK = clock_for(14, 10)
+
+
+def make_entries(count, rng):
+    now = time.time()
+    return [
+        HistoryEntry(
+            now - rng.uniform(0, 3600), rng.choice(CITIES), rng.uniform(-5, 35),
+            rng.choice(DESCS), "ja", "ollama", f"建议{i}",
+            rng.uniform(20, 100), rng.uniform(0, 12), CLOCK.period, CLOCK.season,
+        )
+        for i in range(count)
+    ]
+
+
+def linear_scan(entries, city, temp, desc, humidity, wind):
+    """对照实现：逐条比较同城市同天气的记录"""
+    query = feature_vector(temp, humidity, wind)
+    best, best_dist = None, 1.0
+    for e in entries:
+        if e.city != city or e.desc != desc:
+            continue
+        d = math.dist(feature_vector(e.temp, e.humidity, e.wind_speed), query)
+        if d <= best_dist:
+            best, best_dist = e, d
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="相似建议检索性能测试")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for size in args.sizes:
+        entries = make_entries(size, rng)
+        index = SimilarityIndex("ja")
+        start = time.perf_counter()
+        # 与启动时从数据库加载相同的批量路径
+        index._load(entries)
+        build = time.perf_counter() - start
+        queries = [
+            (rng.choice(CITIES), rng.uniform(-5, 35), rng.choice(DESCS), rng.uniform(20, 100), rng.uniform(0, 12))
+            for _ in range(args.queries)
+        ]
+
+        start = time.perf_counter()
+        hits = sum(index.nearest(c, t, d, h, w, CLOCK) is not None for c, t, d, h, w in queries)
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        for c, t, d, h, w in queries[: max(1, args.queries // 10)]:
+            linear_scan(entries, c, t, d, h, w)
+        scan = (time.perf_counter() - start) * 10
+
+        print(
+            f"n={size:<7} build {build * 1000:8.1f} ms  "
+            f"kd-tree {indexed / args.queries * 1e6:7.1f} us/query  "
+            f"scan {scan / args.queries * 1e6:9.1f} us/query  hit {hits / args.queries:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# benchmarks/load_test.py
+"""
+针对本地模拟服务器压测真实的网络路径，报告吞吐量和尾延迟
+
+场景：
+- cli:    每个请求启动一次 main.py（含解释器启动），--concurrency 个并发
+- stream: 启动一个长时间运行的 main.py --input-jsonl --output-jsonl，
+          同时最多 --depth 条记录在途，按输出行计算每条记录的延迟
+- http:   启动 weather_advisor.daemon，等全部城市完成首次查询后，
+          用 --concurrency 个连接请求 GET /advice
+
+用法:
+    python benchmarks/load_test.py cli --requests 50 --concurrency 4
+    python benchmarks/load_test.py cli --requests 50 --concurrency 4 --daemon
+    python benchmarks/load_test.py stream --requests 2000 --depth 8 --latency 0.02
+    python benchmarks/load_test.py http --requests 20000 --concurrency 16
+默认在进程内启动模拟服务器；也可以用 --stub-url 指向已运行的 stub_server.py
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from stub_server import StubServer, add_stub_arguments, config_from_args
+
+DEFAULT_CITIES = ["Tokyo", "Osaka", "London", "Sydney", "auto", "Beijing", "New York"]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def report(label: str, latencies: List[float], errors: int, elapsed: float) -> None:
+    values = sorted(latencies)
+    total = len(values) + errors
+    print(f"== {label} ==")
+    print(f"requests   {total}  (errors {errors})")
+    print(f"throughput {total / elapsed:8.1f} req/s  ({elapsed:.2f}s)")
+    for q in (50, 90, 99, 99.9):
+        print(f"p{q:<9} {percentile(values, q) * 1000:8.1f} ms")
+    if values:
+        print(f"max        {values[-1] * 1000:8.1f} ms")
+
+
+def child_env(stub_env: Dict[str, str], workdir: str, reuse: bool) -> Dict[str, str]:
+    """子进程环境：指向模拟服务器，配置和历史写到临时目录"""
+    config_path = os.path.join(workdir, "config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        # 默认关闭历史复用，保证每个请求都走到 AI 路径
+        json.dump({"history_reuse": reuse}, f)
+    env = dict(os.environ)
+    env.update(stub_env)
+    env.update(
+        {
+            "OPENWEATHER_API_KEY": env.get("OPENWEATHER_API_KEY") or "stub",
+            "OPENWEATHER_RATE_LIMIT": "1000000",
+            "WEATHER_ADVISOR_CONFIG": config_path,
+            "WEATHER_ADVISOR_HISTORY": os.path.join(workdir, "history.db"),
+            # 只在 --daemon 时才会有进程监听这个套接字
+            "WEATHER_ADVISOR_SOCKET": os.path.join(workdir, "advisor.sock"),
+            "PYTHONIOENCODING": "utf-8",
+        }
+    )
+    return env
+
+
+def start_advisor(env: Dict[str, str]) -> subprocess.Popen:
+    """启动 main.py --serve，等待套接字就绪"""
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "main.py"), "--serve"],
+        env=env,
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while not os.path.exists(env["WEATHER_ADVISOR_SOCKET"]):
+        if time.monotonic() > deadline or proc.poll() is not None:
+            raise RuntimeError("advisor daemon did not start")
+        time.sleep(0.05)
+    return proc
+
+
+def run_cli(args, env: Dict[str, str]) -> None:
+    command = [sys.executable, os.path.join(ROOT, "main.py"), "--ai-mode", args.ai_mode]
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        city = args.cities[i % len(args.cities)]
+        start = time.perf_counter()
+        proc = subprocess.run(
+            command + ["--city", city],
+            env=env,
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        elapsed = time.perf_counter() - start
+        # main() 在出错时只打印 ❌ 而不返回非零退出码
+        failed = proc.returncode != 0 or "❌".encode() in proc.stdout
+        with lock:
+            if failed:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+
+    advisor = start_advisor(env) if args.daemon else None
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            list(executor.map(one, range(args.requests)))
+        label = f"cli x{args.concurrency}" + (" (daemon)" if advisor else "")
+        report(label, latencies, errors, time.perf_counter() - start)
+    finally:
+        if advisor is not None:
+            advisor.terminate()
+            advisor.wait()
+
+
+def run_stream(args, env: Dict[str, str]) -> None:
+    command = [
+        sys.executable,
+        os.path.join(ROOT, "main.py"),
+        "--input-jsonl",
+        "--output-jsonl",
+        "--ai-mode",
+        args.ai_mode,
+    ]
+    proc = subprocess.Popen(
+        command,
+        env=env,
+        cwd=ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        bufsize=1,
+    )
+    in_flight = threading.Semaphore(args.depth)
+    # 输出与输入顺序一致，按顺序记录发送时间即可
+    sent: List[float] = []
+
+    def writer() -> None:
+        for i in range(args.requests):
+            in_flight.acquire()
+            sent.append(time.perf_counter())
+            proc.stdin.write(json.dumps({"city": args.cities[i % len(args.cities)]}) + "\n")
+            proc.stdin.flush()
+        proc.stdin.close()
+
+    latencies: List[float] = []
+    errors = 0
+    start = time.perf_counter()
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    for i, line in enumerate(proc.stdout):
+        now = time.perf_counter()
+        in_flight.release()
+        if "error" in json.loads(line):
+            errors += 1
+        else:
+            latencies.append(now - sent[i])
+    elapsed = time.perf_counter() - start
+    thread.join()
+    proc.wait()
+    report(f"stream depth={args.depth}", latencies, errors, elapsed)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_http(args, env: Dict[str, str]) -> None:
+    port = free_port()
+    cities = [city for city in args.cities if city != "auto"]
+    command = [
+        sys.executable, "-m", "weather_advisor.daemon", *cities,
+        "--port", str(port), "--ai-mode", args.ai_mode, "--workers", str(args.concurrency),
+    ]
+    proc = subprocess.Popen(command, env=env, cwd=ROOT, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        # 等待全部城市完成首次查询
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                status = requests.get(f"{base}/status", timeout=1).json()
+                if status["ready"] == len(cities):
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() > deadline or proc.poll() is not None:
+                raise RuntimeError("daemon did not become ready")
+            time.sleep(0.1)
+
+        latencies: List[float] = []
+        errors = 0
+        lock = threading.Lock()
+        local = threading.local()
+
+        def one(i: int) -> None:
+            nonlocal errors
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            start = time.perf_counter()
+            try:
+                ok = session.get(
+                    f"{base}/advice", params={"city": cities[i % len(cities)]}, timeout=10
+                ).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            list(executor.map(one, range(args.requests)))
+        report(f"http x{args.concurrency}", latencies, errors, time.perf_counter() - start)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="天气建议压测工具")
+    parser.add_argument("scenario", choices=["cli", "stream", "http"])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="cli 场景的并发进程数 / http 场景的连接数")
+    parser.add_argument("--depth", type=int, default=1, help="stream 场景的在途记录数")
+    parser.add_argument("--ai-mode", default="ollama", choices=["ollama", "openai", "fast", "off"])
+    parser.add_argument("--cities", type=lambda s: s.split(","), default=DEFAULT_CITIES)
+    parser.add_argument("--reuse", action="store_true", help="允许复用历史建议")
+    parser.add_argument("--daemon", action="store_true", help="cli 场景通过 main.py --serve 常驻进程执行")
+    parser.add_argument("--stub-url", help="使用已运行的模拟服务器")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server: Optional[StubServer] = None
+    if args.stub_url:
+        base = args.stub_url.rstrip("/")
+        stub_env = {
+            "OPENWEATHER_BASE_URL": base,
+            "OLLAMA_URL": base,
+            "OLLAMA_MODEL": args.model,
+            "IP_LOOKUP_URLS": f"{base}/ipapi/city/,{base}/ipinfo/city,{base}/ip-api/line?fields=city",
+        }
+    else:
+        server = StubServer(config_from_args(args)).start()
+        stub_env = server.env()
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            env = child_env(stub_env, workdir, args.reuse)
+            if args.scenario == "cli":
+                run_cli(args, env)
+            elif args.scenario == "http":
+                run_http(args, env)
+            else:
+                run_stream(args, env)
+    finally:
+        if server is not None:
+            print(f"stub requests: {server.request_counts}")
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
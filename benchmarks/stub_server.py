@@ -0,0 +1,436 @@
+# benchmarks/stub_server.py
+"""
+压测用的本地模拟服务器，协议与真实服务一致：
+- OpenWeatherMap  GET  /data/2.5/weather?q=&appid=&units=&lang=（或 lat=&lon= 代替 q=）
+                  GET  /geo/1.0/direct?q=&limit=&appid=
+                  GET  /data/2.5/air_pollution?lat=&lon=&appid=
+                  GET  /data/3.0/onecall?lat=&lon=&appid=&exclude=（只返回 current）
+- Ollama          GET  /api/tags
+                  POST /api/generate（stream 为 true 时按行输出 NDJSON；format 为 json 时返回多语言 JSON）
+- IP 定位         GET  /ipapi/city/  /ipinfo/city  /ip-api/line?fields=city
+
+用法: python benchmarks/stub_server.py --port 8765 --latency 0.05 --error-rate 0.01 --model-load 5
+然后设置（或直接使用 load_test.py，它会自动设置）：
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8765
+    OLLAMA_URL=http://127.0.0.1:8765
+    IP_LOOKUP_URLS=http://127.0.0.1:8765/ipapi/city/,http://127.0.0.1:8765/ipinfo/city,http://127.0.0.1:8765/ip-api/line?fields=city
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# 与 OpenWeatherMap 返回值相近的城市数据: (lat, lon, timezone)
+CITIES: Dict[str, tuple] = {
+    "tokyo": (35.6895, 139.6917, 32400),
+    "osaka": (34.6937, 135.5023, 32400),
+    "sapporo": (43.0642, 141.3469, 32400),
+    "beijing": (39.9042, 116.4074, 28800),
+    "shanghai": (31.2304, 121.4737, 28800),
+    "london": (51.5074, -0.1278, 0),
+    "new york": (40.7128, -74.0060, -14400),
+    "sydney": (-33.8688, 151.2093, 36000),
+}
+
+COUNTRIES = {"tokyo": "JP", "osaka": "JP", "sapporo": "JP", "beijing": "CN", "shanghai": "CN",
+             "london": "GB", "new york": "US", "sydney": "AU"}
+
+DESCRIPTIONS = ["晴天", "曇りがち", "小雨", "雪", "霧", "強風", "clear sky", "light rain"]
+
+SUGGESTION = "薄手のジャケットに折りたたみ傘を"
+# format=json 的请求（多语言建议）返回的内容
+MULTILANG_SUGGESTION = json.dumps(
+    {"ja": SUGGESTION, "zh": "薄外套加一把折叠伞", "en": "A light jacket and a folding umbrella"},
+    ensure_ascii=False,
+)
+
+
+@dataclass
+class StubConfig:
+    """
+    latency: 每个请求的基础延迟（秒），jitter 为额外的随机延迟上限
+    error_rate: 返回 503 的概率
+    model_load: 模型首次被请求时的加载时间（秒），加载期间的请求一起等待
+    gen_latency: 每次生成的推理时间（秒），stream 时平均分配到各个分片
+    ip_city: IP 定位返回的城市
+    multilang: 为 False 时忽略 format=json，模拟不遵守多语言格式的模型
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    model_load: float = 0.0
+    gen_latency: float = 0.2
+    model: str = "gemma:7b"
+    ip_city: str = "Tokyo"
+    multilang: bool = True
+    seed: Optional[int] = None
+
+
+class _ModelState:
+    """模拟 Ollama 的冷启动：首个请求触发加载，其余请求等待加载完成"""
+
+    def __init__(self, load_time: float):
+        self.load_time = load_time
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._loading = False
+
+    def ensure_loaded(self) -> None:
+        if self._loaded.is_set():
+            return
+        with self._lock:
+            start = not self._loading
+            self._loading = True
+        if start:
+            time.sleep(self.load_time)
+            self._loaded.set()
+        else:
+            self._loaded.wait()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # 压测时不输出访问日志
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def _delay_or_fail(self) -> bool:
+        """模拟网络延迟和随机故障，返回 False 表示已发送错误响应"""
+        cfg = self.server.config
+        delay = cfg.latency + (self.server.random() * cfg.jitter if cfg.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if cfg.error_rate and self.server.random() < cfg.error_rate:
+            self._send_json(503, {"cod": 503, "message": "stub: injected failure"})
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.count(url.path)
+        if not self._delay_or_fail():
+            return
+
+        if url.path == "/data/2.5/weather":
+            self._weather(query)
+        elif url.path == "/geo/1.0/direct":
+            self._geocode(query)
+        elif url.path == "/data/2.5/air_pollution":
+            self._air_pollution(query)
+        elif url.path == "/data/3.0/onecall":
+            self._onecall(query)
+        elif url.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": self.server.config.model}]})
+        elif url.path in ("/ipapi/city/", "/ipinfo/city", "/ip-api/line"):
+            self._send(200, f"{self.server.config.ip_city}\n".encode("utf-8"), "text/plain")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        self.server.count(url.path)
+        if url.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        if not self._delay_or_fail():
+            return
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        self._generate(request)
+
+    def _weather(self, query: Dict[str, str]) -> None:
+        if not query.get("appid"):
+            self._send_json(401, {"cod": 401, "message": "Invalid API key."})
+            return
+        name = query.get("q") or self._city_at(query) or ""
+        if name.lower() not in CITIES:
+            self._send_json(404, {"cod": "404", "message": "city not found"})
+            return
+        lat, lon, tz = CITIES[name.lower()]
+        # 同一城市在同一分钟内返回相同的天气，便于复现
+        h = zlib.crc32(f"{name.lower()}:{int(time.time() // 60)}".encode())
+        temp = round(-5 + (h % 400) / 10, 2)
+        if query.get("units") == "imperial":
+            temp = round(temp * 9 / 5 + 32, 2)
+        self._send_json(
+            200,
+            {
+                "coord": {"lon": lon, "lat": lat},
+                "weather": [
+                    {"id": 800, "main": "Stub", "description": DESCRIPTIONS[h % len(DESCRIPTIONS)], "icon": "01d"}
+                ],
+                "base": "stations",
+                "main": {
+                    "temp": temp,
+                    "feels_like": temp,
+                    "temp_min": temp - 1,
+                    "temp_max": temp + 1,
+                    "pressure": 1013,
+                    "humidity": 30 + h % 60,
+                },
+                "visibility": 10000,
+                "wind": {"speed": (h % 120) / 10, "deg": h % 360},
+                "clouds": {"all": h % 100},
+                "dt": int(time.time()),
+                "timezone": tz,
+                "id": h % 10_000_000,
+                "name": name,
+                "cod": 200,
+            },
+        )
+
+    @staticmethod
+    def _city_at(query: Dict[str, str]) -> Optional[str]:
+        """按坐标查询时找到对应的城市"""
+        try:
+            lat, lon = float(query["lat"]), float(query["lon"])
+        except (KeyError, ValueError):
+            return None
+        for name, (city_lat, city_lon, _) in CITIES.items():
+            if abs(city_lat - lat) < 0.1 and abs(city_lon - lon) < 0.1:
+                return name.title()
+        return None
+
+    def _geocode(self, query: Dict[str, str]) -> None:
+        if not query.get("appid"):
+            self._send_json(401, {"cod": 401, "message": "Invalid API key."})
+            return
+        name = query.get("q", "").split(",")[0].strip().lower()
+        if name not in CITIES:
+            self._send_json(200, [])
+            return
+        lat, lon, _ = CITIES[name]
+        self._send_json(
+            200, [{"name": name.title(), "lat": lat, "lon": lon, "country": COUNTRIES[name]}]
+        )
+
+    @staticmethod
+    def _coord_hash(query: Dict[str, str]) -> Optional[int]:
+        """同一坐标返回固定的数值"""
+        try:
+            lat, lon = float(query["lat"]), float(query["lon"])
+        except (KeyError, ValueError):
+            return None
+        return zlib.crc32(f"{lat:.2f},{lon:.2f}".encode())
+
+    def _air_pollution(self, query: Dict[str, str]) -> None:
+        if not query.get("appid"):
+            self._send_json(401, {"cod": 401, "message": "Invalid API key."})
+            return
+        h = self._coord_hash(query)
+        if h is None:
+            self._send_json(400, {"cod": "400", "message": "wrong latitude"})
+            return
+        pm2_5 = round((h % 1500) / 10, 2)
+        self._send_json(
+            200,
+            {
+                "coord": {"lon": float(query["lon"]), "lat": float(query["lat"])},
+                "list": [
+                    {
+                        "main": {"aqi": 1 + h % 5},
+                        "components": {"pm2_5": pm2_5, "pm10": round(pm2_5 * 1.4, 2)},
+                        "dt": int(time.time()),
+                    }
+                ],
+            },
+        )
+
+    def _onecall(self, query: Dict[str, str]) -> None:
+        if not query.get("appid"):
+            self._send_json(401, {"cod": 401, "message": "Invalid API key."})
+            return
+        h = self._coord_hash(query)
+        if h is None:
+            self._send_json(400, {"cod": "400", "message": "wrong latitude"})
+            return
+        self._send_json(
+            200,
+            {
+                "lat": float(query["lat"]),
+                "lon": float(query["lon"]),
+                "timezone_offset": 0,
+                "current": {"dt": int(time.time()), "uvi": round((h >> 8) % 110 / 10, 2)},
+            },
+        )
+
+    def _generate(self, request: dict) -> None:
+        cfg = self.server.config
+        if request.get("model") != cfg.model:
+            self._send_json(404, {"error": f"model '{request.get('model')}' not found"})
+            return
+        self.server.model_state.ensure_loaded()
+        multilang = request.get("format") == "json" and self.server.config.multilang
+        text = MULTILANG_SUGGESTION if multilang else SUGGESTION
+        tokens = list(text)
+        # 真实响应中的 context 数组很长，解码成本也应计入
+        context = list(range(len(request.get("prompt", "")) * 2))
+
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            step = cfg.gen_latency / max(1, len(tokens))
+            for token in tokens:
+                time.sleep(step)
+                self._chunk({"model": cfg.model, "response": token, "done": False})
+            self._chunk({"model": cfg.model, "response": "", "done": True, "context": context})
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(cfg.gen_latency)
+            self._send_json(
+                200,
+                {
+                    "model": cfg.model,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "response": text,
+                    "done": True,
+                    "context": context,
+                    "total_duration": int(cfg.gen_latency * 1e9),
+                },
+            )
+
+    def _chunk(self, data: dict) -> None:
+        line = json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    """可在测试或压测脚本中后台启动的模拟服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config
+        self.model_state = _ModelState(config.model_load)
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """让 weather_advisor 使用本服务器的环境变量"""
+        base = self.base_url
+        return {
+            "OPENWEATHER_BASE_URL": base,
+            "OLLAMA_URL": base,
+            "OLLAMA_MODEL": self.config.model,
+            "IP_LOOKUP_URLS": ",".join(
+                f"{base}{path}"
+                for path in ("/ipapi/city/", "/ipinfo/city", "/ip-api/line?fields=city")
+            ),
+        }
+
+    def reset(self, config: StubConfig) -> None:
+        """换用新的配置并清空计数和模型状态（测试之间复用同一个服务器）"""
+        with self._rng_lock:
+            self.config = config
+            self.model_state = _ModelState(config.model_load)
+            self._rng = random.Random(config.seed)
+            self._counts = {}
+
+    def random(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def count(self, path: str) -> None:
+        with self._rng_lock:
+            self._counts[path] = self._counts.get(path, 0) + 1
+
+    @property
+    def request_counts(self) -> Dict[str, int]:
+        with self._rng_lock:
+            return dict(self._counts)
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="stub-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """模拟服务器的公共命令行参数（load_test.py 复用）"""
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的概率")
+    parser.add_argument("--model-load", type=float, default=0.0, help="模型冷启动时间（秒）")
+    parser.add_argument("--gen-latency", type=float, default=0.2, help="每次生成的推理时间（秒）")
+    parser.add_argument("--model", default="gemma:7b")
+    parser.add_argument("--ip-city", default="Tokyo")
+    parser.add_argument("--seed", type=int)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        model_load=args.model_load,
+        gen_latency=args.gen_latency,
+        model=args.model,
+        ip_city=args.ip_city,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenWeatherMap / Ollama / IP 定位模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer(config_from_args(args), args.host, args.port)
+    print(f"🧪 模拟服务器已启动: {server.base_url}")
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,65 @@
 # main.py
+import sys
+
+if __name__ == "__main__":
+    # 常驻进程（python main.py --serve）运行时直接交给它处理，跳过下面的导入和冷启动
+    from weather_advisor.ipc import run_via_daemon
+
+    _exit_code = run_via_daemon(sys.argv[1:])
+    if _exit_code is not None:
+        sys.exit(_exit_code)
+
 import argparse
+import json
 import os
+import time
 from dotenv import load_dotenv
-from weather_advisor.advisor import get_weather, get_clothing_suggestion
+from weather_advisor.advice_table import lookup_advice
+from weather_advisor.advisor import get_observation
+from weather_advisor.environment import observe
 from weather_advisor.utils import (
     get_time_remark,
-    format_weather_tip,
     get_city_by_ip,
     normalize_city,
     get_time_greeting,
     get_seasonal_reminder,
-    get_regional_advice,
-    format_personalized_weather_display,
 )
-from weather_advisor.ai_suggester import get_ai_suggestion
+from weather_advisor.ai_suggester import apply_budget, get_ai_suggestion, get_multilang_suggestion
+from weather_advisor.clock import city_clock, clock_scope
+from weather_advisor.config import get_config_store
+from weather_advisor.deadline import DeadlineExceeded, deadline_scope, expired, stage_timeout
+from weather_advisor.history import HistoryEntry, get_history_store
+from weather_advisor.ipc import serve, stdout_to_stderr
+from weather_advisor.profiling import RequestSampler, profile_call
+from weather_advisor.records import Advice, Observation
+from weather_advisor.similarity import get_similarity_index, note_suggestion, reuse_modes
+from weather_advisor.usage import Budget, get_usage_ledger
 
+SUPPORTED_LANGS = ("ja", "zh", "en")
 
-def get_args():
+
+def parse_langs(value):
+    """
+    解析语言选择："ja"、"ja,en"、"all" 或列表，返回去重后的语言列表
+    含不支持的语言或类型不对时抛出 ValueError
+    """
+    if isinstance(value, str):
+        value = SUPPORTED_LANGS if value.strip().lower() == "all" else value.split(",")
+    elif not isinstance(value, (list, tuple)):
+        raise ValueError(f"语言应为字符串或列表: {value!r}")
+    langs = []
+    for lang in value:
+        lang = str(lang).strip().lower()
+        if lang not in SUPPORTED_LANGS:
+            raise ValueError(f"不支持的语言: {lang}（可选 {', '.join(SUPPORTED_LANGS)} 或 all）")
+        if lang not in langs:
+            langs.append(lang)
+    if not langs:
+        raise ValueError("未指定语言")
+    return langs
+
+
+def get_args(argv=None):
     """
     解析命令行参数，支持自定义城市查询和语言选择
     """
@@ -28,57 +71,80 @@ def get_args():
     )
     parser.add_argument(
         "--ai-mode",
-        choices=["ollama", "local", "openai", "off"],
+        choices=["ollama", "local", "openai", "fast", "off"],
         default="auto",  # 默认自动选择AI模式
-        help="AI 推荐模式（auto=自动选择, ollama=Ollama+Gemma, openai=OpenAI API, off=禁用AI）",
+        help="AI 推荐模式（auto=自动选择, ollama=Ollama+Gemma, openai=OpenAI API, fast=基于历史AI建议的快速检索, off=禁用AI）",
     )
     parser.add_argument(
-        "--lang", default="ja", choices=["ja", "zh", "en"], help="输出语言选择"
+        "--lang",
+        default="ja",
+        help="输出语言选择（ja/zh/en，可用逗号指定多种，all=全部；多种语言共用一次天气查询和 AI 请求）",
     )
     parser.add_argument("--verbose", "-v", action="store_true", help="显示详细信息")
     parser.add_argument("--config", action="store_true", help="显示配置文件信息")
+    parser.add_argument(
+        "--init-config", action="store_true", help="创建默认配置文件（已存在时不覆盖）"
+    )
+    parser.add_argument(
+        "--history", action="store_true", help="显示指定城市的历史建议"
+    )
+    parser.add_argument(
+        "--usage", action="store_true", help="显示 AI 调用的 token、费用和延迟统计"
+    )
+    parser.add_argument(
+        "--since", default="7d", help="历史/用量查询的时间范围（如 12h、7d，默认 7d）"
+    )
     parser.add_argument(
         "--no-ai", action="store_true", help="强制禁用AI模式，直接使用传统模式"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--input-jsonl",
+        action="store_true",
+        help="从标准输入逐行读取 JSONL 记录（城市或观测数据）",
+    )
+    parser.add_argument(
+        "--output-jsonl",
+        action="store_true",
+        help="每条结果输出一行紧凑 JSON，替代人类可读格式",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="作为常驻进程运行，之后的命令通过 Unix 套接字交给它执行",
+    )
+    parser.add_argument(
+        "--no-daemon", action="store_true", help="不使用常驻进程，在本进程内执行"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="对本次运行做性能分析（cProfile + 采样），结果写入 DIR；与 --serve 一起使用时按 --profile-rate 抽样",
+    )
+    parser.add_argument(
+        "--profile-rate",
+        type=float,
+        default=0.05,
+        help="常驻进程中被分析的请求比例（默认 0.05）",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=parse_duration,
+        default=None,
+        help="每个请求的总耗时上限（如 2s、1.5s）；到期后不再等待 AI，直接给出基础建议",
+    )
+    args = parser.parse_args(argv)
+    try:
+        args.langs = parse_langs(args.lang)
+    except ValueError as e:
+        parser.error(str(e))
+    # 提示信息等单语言输出使用第一种语言
+    args.lang = args.langs[0]
+    return args
 
 
 def load_user_preferences():
-    """加载用户偏好设置"""
-    import json
-    import os
-
-    config_file = os.path.expanduser("~/.weather_advisor_config.json")
-    default_config = {
-        "preferred_lang": "ja",
-        "default_city": "Tokyo",
-        "default_ai_mode": "ollama",  # 默认启用ollama
-        "ai_fallback_enabled": True,  # 启用AI失败回退
-        "show_seasonal_tips": True,
-        "show_regional_advice": True,
-        "preferred_greeting_style": "formal",
-        "ollama_model": "gemma:7b",
-        "ai_timeout": 30,  # AI请求超时时间
-    }
-
-    if os.path.exists(config_file):
-        try:
-            with open(config_file, "r", encoding="utf-8") as f:
-                user_config = json.load(f)
-                return {**default_config, **user_config}
-        except Exception as e:
-            print(f"⚠️ 配置文件读取失败，使用默认设置: {e}")
-            return default_config
-    else:
-        # 创建默认配置文件
-        try:
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(default_config, f, indent=2, ensure_ascii=False)
-            if os.getenv("DEBUG_MODE") == "True":
-                print(f"✅ 已创建默认配置文件: {config_file}")
-        except Exception as e:
-            print(f"⚠️ 无法创建配置文件: {e}")
-        return default_config
+    """加载用户偏好设置（带缓存，不会自动创建配置文件）"""
+    return get_config_store().get()
 
 
 def detect_available_ai_mode():
@@ -91,9 +157,11 @@ def detect_available_ai_mode():
     # 1. 检查Ollama是否可用
     try:
         ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-        response = requests.get(f"{ollama_url}/api/tags", timeout=3)
+        response = requests.get(f"{ollama_url}/api/tags", timeout=stage_timeout(3))
         if response.status_code == 200:
             return "ollama", True
+    except DeadlineExceeded:
+        return None, False
     except:
         pass
 
@@ -105,7 +173,10 @@ def detect_available_ai_mode():
     return None, False
 
 
-def try_ai_suggestion(city, temp, desc, time_remark, lang, ai_mode, verbose=False):
+def try_ai_suggestion(
+    city, temp, desc, time_remark, lang, ai_mode, verbose=False, clock=None,
+    aqi=None, uvi=None,
+):
     """
     尝试获取AI建议，包含重试逻辑
     返回: (suggestion, success, error_msg)
@@ -121,21 +192,26 @@ def try_ai_suggestion(city, temp, desc, time_remark, lang, ai_mode, verbose=Fals
         ai_mode = detected_mode
 
     if verbose:
-        mode_names = {"ollama": "Ollama (本地)", "openai": "OpenAI API"}
+        mode_names = {"ollama": "Ollama (本地)", "openai": "OpenAI API", "fast": "Fast (历史检索)"}
         print(f"🤖 尝试使用 {mode_names.get(ai_mode, ai_mode)} 模式...")
 
     try:
-        suggestion = get_ai_suggestion(city, temp, desc, time_remark, lang, ai_mode)
+        suggestion = get_ai_suggestion(
+            city, temp, desc, time_remark, lang, ai_mode, clock, aqi, uvi
+        )
         if suggestion and suggestion.strip():
             return suggestion.strip(), True, None
         else:
             return None, False, f"{ai_mode}模式返回空结果"
+    except DeadlineExceeded:
+        return None, False, f"{ai_mode}模式超过截止时间"
     except Exception as e:
         return None, False, f"{ai_mode}模式调用失败: {str(e)}"
 
 
 def display_ai_mode_result(
-    city, temp, desc, suggestion, time_remark, lang, ai_mode_used
+    city, temp, desc, suggestion, time_remark, lang, ai_mode_used, clock=None,
+    aqi=None, uvi=None,
 ):
     """AI模式结果显示"""
     separator = "─" * 35
@@ -164,7 +240,7 @@ def display_ai_mode_result(
     print(f"💡 {suggestion}")
 
     # 季节提醒
-    seasonal = get_seasonal_reminder(lang)
+    seasonal = get_seasonal_reminder(lang, clock)
     print(f"\n{separator}")
     seasonal_headers = {"ja": "季節のポイント", "zh": "季节要点", "en": "Seasonal Tips"}
     print(f"{seasonal['icon']} {seasonal_headers.get(lang, seasonal_headers['ja'])}")
@@ -172,7 +248,7 @@ def display_ai_mode_result(
     print(f"👔 {seasonal['clothing']}")
 
     # 地域建议
-    regional = get_regional_advice(city, temp, lang)
+    regional = lookup_advice(city, temp, desc, lang, aqi, uvi).regional
     print(f"\n{regional}")
 
     # 结尾
@@ -193,8 +269,8 @@ def handle_ai_failure(lang, error_msg, config):
     }
     print(fallback_messages.get(lang, fallback_messages["en"]))
 
-    # 如果配置允许，显示故障排除提示
-    if config.get("ai_fallback_enabled", True):
+    # 如果配置允许，显示故障排除提示（因截止时间放弃时 AI 服务本身没有问题）
+    if config.get("ai_fallback_enabled", True) and not expired():
         troubleshooting = {
             "ja": "\n💡 AI機能を有効にするには：\n   • Ollama: ollama serve を実行してください\n   • OpenAI: OPENAI_API_KEY 環境変数を設定してください",
             "zh": "\n💡 要启用AI功能：\n   • Ollama: 运行 ollama serve\n   • OpenAI: 设置 OPENAI_API_KEY 环境变量",
@@ -203,14 +279,18 @@ def handle_ai_failure(lang, error_msg, config):
         print(troubleshooting.get(lang, troubleshooting["en"]))
 
 
-def display_traditional_mode(city, temp, desc, time_remark, lang, is_fallback=False):
-    """传统模式显示"""
+def display_traditional_mode(
+    city, temp, desc, time_remark, lang, is_fallback=False, clock=None,
+    aqi=None, uvi=None, rules=None,
+):
+    """传统模式显示（rules 为调用方已查好的规则建议）"""
     # 问候
-    greeting = get_time_greeting(lang)
+    greeting = get_time_greeting(lang, clock)
     print(f"{greeting}\n")
 
-    # 获取传统建议
-    suggestion = get_clothing_suggestion(temp, desc, lang)
+    # 获取传统建议（查表）
+    rules = rules or lookup_advice(city, temp, desc, lang, aqi, uvi)
+    suggestion = rules.suggestion
 
     separator = "─" * 35
 
@@ -239,8 +319,8 @@ def display_traditional_mode(city, temp, desc, time_remark, lang, is_fallback=Fa
     print(f"\n💡 {suggestion}")
 
     # 季节和地域信息
-    seasonal = get_seasonal_reminder(lang)
-    regional = get_regional_advice(city, temp, lang)
+    seasonal = get_seasonal_reminder(lang, clock)
+    regional = rules.regional
 
     print(f"\n{separator}")
     print(f"{seasonal['icon']} {seasonal['tip']}")
@@ -336,13 +416,448 @@ def display_config_info(config, lang):
     print(f"👋 {labels['greeting']}: {config['preferred_greeting_style']}")
     print(f"⚙️ {labels['model']}: {config['ollama_model']}")
     print(f"⏱️ {labels['timeout']}: {config['ai_timeout']}s")
-    print(f"\n📁 {labels['config_file']}: ~/.weather_advisor_config.json")
+    print(f"\n📁 {labels['config_file']}: {get_config_store().path}")
+
+
+def resolve_city(raw_city, lang, verbose=False, ai_mode="", debug_mode=False):
+    """城市处理：留空或 auto 时通过 IP 自动检测，否则标准化城市名"""
+    if not raw_city or raw_city.lower() == "auto":
+        city = get_city_by_ip()
+        if verbose:
+            auto_detect_msg = {
+                "ja": f"🌐 自動検出された都市: {city}",
+                "zh": f"🌐 自动检测到城市: {city}",
+                "en": f"🌐 Auto-detected city: {city}",
+            }
+            print(auto_detect_msg.get(lang, auto_detect_msg["en"]))
+    else:
+        city = normalize_city(raw_city)
+
+    if verbose:
+        info_msg = {
+            "ja": f"🏙️ 使用都市：{city}\n🤖 AIモード：{ai_mode}\n🔧 モード：{'デバッグ' if debug_mode else '本番'}",
+            "zh": f"🏙️ 使用城市：{city}\n🤖 AI模式：{ai_mode}\n🔧 当前模式：{'调试' if debug_mode else '正式'}",
+            "en": f"🏙️ Using city: {city}\n🤖 AI mode: {ai_mode}\n🔧 Mode: {'Debug' if debug_mode else 'Production'}",
+        }
+        print(info_msg.get(lang, info_msg["en"]))
+
+    return city
+
+
+def iter_jsonl_records(stream):
+    """
+    从输入流逐行读取 JSONL 记录（惰性读取，内存占用与输入长度无关）
+    每行可以是 {"city": ...}，也可以附带观测数据 {"city", "temp", "desc"}
+    """
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield {"error": f"line {line_no}: invalid JSON ({e})"}
+            continue
+        if isinstance(record, str):
+            record = {"city": record}
+        if not isinstance(record, dict):
+            record = {"error": f"line {line_no}: record must be an object"}
+        yield record
+
+
+def find_history_advice(
+    city, temp, desc, lang, ai_mode, config, clock=None, humidity=None, wind_speed=None
+):
+    """
+    天气条件与近期记录相近时复用当时的 AI 建议，返回 HistoryEntry 或 None
+    ai_mode 为实际使用的模式，只复用同一模型生成的建议
+    """
+    if not (config.get("history_enabled", True) and config.get("history_reuse", False)):
+        return None
+    modes = reuse_modes(ai_mode)
+    if not modes:
+        return None
+    return get_similarity_index(lang).nearest(
+        city,
+        temp,
+        desc,
+        humidity,
+        wind_speed,
+        clock,
+        max_distance=config.get("history_reuse_distance", 1.0),
+        modes=modes,
+    )
+
+
+def resolve_ai_mode(ai_mode, config):
+    """auto 时检测可用的 AI 服务，再按 OpenAI 预算降级，返回实际使用的模式"""
+    if ai_mode == "auto":
+        detected_mode, is_available = detect_available_ai_mode()
+        if is_available:
+            ai_mode = detected_mode
+    return apply_budget(ai_mode, config)
+
+
+def record_history(
+    city, temp, desc, lang, mode, suggestion, config, clock=None, humidity=None, wind_speed=None
+):
+    """记录本次输出的建议（后台批量写入，不增加延迟）"""
+    if not suggestion or not config.get("history_enabled", True):
+        return
+    clock = clock or city_clock()
+    entry = HistoryEntry(
+        time.time(), city, temp, desc, lang, mode, suggestion,
+        humidity, wind_speed, clock.period, clock.season,
+    )
+    get_history_store().record(entry)
+    note_suggestion(entry)
+
+
+def try_multilang_suggestion(city, temp, desc, langs, ai_mode, verbose=False, clock=None, aqi=None, uvi=None):
+    """
+    一次请求获取多种语言的AI建议
+    返回: ({lang: suggestion}, error_msg)，结果中缺少的语言由调用方回退
+    """
+    if len(langs) == 1:
+        lang = langs[0]
+        suggestion, success, error_msg = try_ai_suggestion(
+            city, temp, desc, get_time_remark(lang, clock), lang, ai_mode, verbose, clock, aqi, uvi
+        )
+        return ({lang: suggestion} if success else {}), error_msg
+
+    if verbose:
+        print(f"🤖 尝试使用 {ai_mode} 模式（{', '.join(langs)} 一次生成）...")
+    try:
+        found = get_multilang_suggestion(city, temp, desc, langs, ai_mode, clock, aqi, uvi)
+    except DeadlineExceeded:
+        return {}, f"{ai_mode}模式超过截止时间"
+    except Exception as e:
+        return {}, f"{ai_mode}模式调用失败: {str(e)}"
+    missing = [lang for lang in langs if lang not in found]
+    return found, f"{ai_mode}模式未返回: {', '.join(missing)}" if missing else None
+
+
+def resolve_multilang_advice(
+    city, temp, desc, langs, ai_mode, config, verbose=False, clock=None,
+    humidity=None, wind_speed=None, aqi=None, uvi=None,
+):
+    """
+    运行建议流水线（AI 优先，失败时按配置回退到传统模式），单语言与多语言共用
+    历史记录中已有的语言直接复用，其余语言共用一次 AI 请求
+    返回: {lang: (suggestion, mode_used, error_msg, reused)}，mode_used 为 "rules" 表示传统模式，
+    reused 表示建议来自历史记录
+    """
+    def rules(lang, error_msg=None):
+        return lookup_advice(city, temp, desc, lang, aqi, uvi).suggestion, "rules", error_msg, False
+
+    # 自动检测并按 OpenAI 预算降级，历史复用按实际使用的模式匹配
+    if ai_mode != "off":
+        ai_mode = resolve_ai_mode(ai_mode, config)
+    if ai_mode == "off":
+        return {lang: rules(lang) for lang in langs}
+
+    results = {}
+    pending = []
+    for lang in langs:
+        reused = find_history_advice(
+            city, temp, desc, lang, ai_mode, config, clock, humidity, wind_speed
+        )
+        if reused is not None:
+            results[lang] = (reused.suggestion, reused.mode, None, True)
+        else:
+            pending.append(lang)
+    if not pending:
+        return results
+
+    if ai_mode == "auto":
+        # 检测不到可用的 AI 服务，不再重复探测
+        found, error_msg = {}, "未检测到可用的AI服务"
+    else:
+        found, error_msg = try_multilang_suggestion(
+            city, temp, desc, pending, ai_mode, verbose, clock, aqi, uvi
+        )
+    # 截止时间已到时总是给出基础建议（没有时间再重试）
+    fallback = config.get("ai_fallback_enabled", True) or expired()
+    for lang in pending:
+        if lang in found:
+            results[lang] = (found[lang], ai_mode, None, False)
+        elif fallback:
+            results[lang] = rules(lang, error_msg)
+        else:
+            results[lang] = (None, None, error_msg, False)
+    return results
+
+
+def observe_record(record, city, api_key, config=None):
+    """
+    取得记录对应的天气观测：记录自带 temp/desc 时直接使用，否则查询天气
+    配置启用 environment_data 时同时获取空气质量和紫外线
+    返回: (observation, error_msg)
+    """
+    if record.get("temp") is None or record.get("desc") is None:
+        if not api_key:
+            return None, "OPENWEATHER_API_KEY not set"
+        if (config or {}).get("environment_data", True):
+            obs = observe(city, api_key)
+        else:
+            obs = get_observation(city, api_key)
+        return obs, None if obs else "weather data unavailable"
+    try:
+        obs = Observation.from_record(record)
+    except (TypeError, ValueError) as e:
+        return None, f"invalid observation: {e}"
+    obs.city = city
+    return obs, None
+
+
+def advise_record(record, args, config, api_key):
+    """
+    处理一条 JSONL 记录，返回可直接序列化的结果字典列表（每种语言一个）
+    记录可用 "lang": "ja" / "ja,en" / "all" 或 "langs": [...] 指定语言
+    """
+    if "error" in record:
+        return [{"error": record["error"]}]
+
+    raw_city = record.get("city", "")
+    if not isinstance(raw_city, str):
+        return [{"error": f"city must be a string: {raw_city!r}"}]
+    try:
+        langs = parse_langs(record.get("langs", record.get("lang", args.langs)))
+    except ValueError as e:
+        return [{"city": raw_city, "error": str(e)}]
+    ai_mode = record.get("ai_mode", args.ai_mode)
+    if not isinstance(ai_mode, str):
+        return [{"city": raw_city, "error": f"ai_mode must be a string: {ai_mode!r}"}]
+    city = resolve_city(raw_city, langs[0])
+
+    # 所有语言共用一次天气查询
+    obs, error = observe_record(record, city, api_key, config)
+    if obs is None:
+        return [{"city": city, "error": error}]
+
+    # 按城市当地时区和半球计算时间段与季节
+    clock = city_clock(obs.timezone, obs.lat)
+    resolved = resolve_multilang_advice(
+        city, obs.temp, obs.desc, langs, ai_mode, config, clock=clock,
+        humidity=obs.humidity, wind_speed=obs.wind_speed, aqi=obs.aqi, uvi=obs.uvi,
+    )
+
+    results = []
+    for lang in langs:
+        suggestion, mode_used, error_msg, reused = resolved[lang]
+        if not reused:
+            record_history(
+                city, obs.temp, obs.desc, lang, mode_used, suggestion, config,
+                clock, obs.humidity, obs.wind_speed,
+            )
+        rules = lookup_advice(city, obs.temp, obs.desc, lang, obs.aqi, obs.uvi)
+        results.append(
+            Advice(
+                city=city,
+                lang=lang,
+                temp=obs.temp,
+                desc=obs.desc,
+                comfort=rules.comfort,
+                emoji=rules.emoji,
+                suggestion=suggestion,
+                ai_mode=mode_used,
+                ai_error=error_msg,
+                reused=reused,
+            ).to_dict()
+        )
+    return results
+
+
+def show_record(record, args, config, api_key, debug_mode=False):
+    """以人类可读格式显示一条记录的结果"""
+    if "error" in record:
+        print(f"⚠️ {record['error']}")
+        return
+
+    city = resolve_city(
+        record.get("city", ""), args.lang, args.verbose, args.ai_mode, debug_mode
+    )
+
+    # 获取天气数据
+    obs, error = observe_record(record, city, api_key, config)
+    if obs is None:
+        if record.get("temp") is not None and record.get("desc") is not None:
+            print(f"⚠️ {city}: {error}")
+            return
+        error_msg = {
+            "ja": "申し訳ありませんが、天気データを取得できませんでした。都市名を確認してください。",
+            "zh": "抱歉，无法获取天气数据。请检查城市名称。",
+            "en": "Sorry, unable to retrieve weather data. Please check the city name.",
+        }
+        print(error_msg.get(args.lang, error_msg["en"]))
+        return
+
+    # 整个请求共享同一个时间上下文（按城市当地时区），保证各部分输出一致
+    clock = city_clock(obs.timezone, obs.lat)
+    show_city_advice(
+        city, obs.temp, obs.desc, args.langs, args.ai_mode, config, args.verbose, clock,
+        obs.humidity, obs.wind_speed, obs.aqi, obs.uvi,
+    )
+
+
+def show_city_advice(
+    city, temp, desc, langs, ai_mode, config, verbose=False, clock=None,
+    humidity=None, wind_speed=None, aqi=None, uvi=None,
+):
+    """
+    显示单个城市的完整建议：默认尝试AI，失败则回退到传统模式
+    多种语言依次显示（共用一次天气查询和一次 AI 请求）
+    """
+    clock = clock or city_clock()
+    if ai_mode != "off":
+        # 显示加载提示
+        loading_messages = {
+            "ja": "🤖 AIスタイリストが最適なコーディネートを考案中...",
+            "zh": "🤖 AI造型师正在为您搭配最佳着装...",
+            "en": "🤖 AI stylist is creating your perfect outfit...",
+        }
+        print(loading_messages.get(langs[0], loading_messages["en"]))
+    resolved = resolve_multilang_advice(
+        city, temp, desc, langs, ai_mode, config, verbose, clock,
+        humidity, wind_speed, aqi, uvi,
+    )
+    for index, lang in enumerate(langs):
+        if index:
+            print("\n" + "─" * 40 + "\n")
+        suggestion, mode_used, error_msg, reused = resolved[lang]
+        time_remark = get_time_remark(lang, clock)
+        print(f"{get_time_greeting(lang, clock)}\n")
+        if mode_used is None:
+            # 不允许回退，直接显示错误
+            print(f"❌ AI建议获取失败：{error_msg}")
+            continue
+        if reused:
+            if verbose:
+                print("🕘 复用历史建议")
+        else:
+            record_history(
+                city, temp, desc, lang, mode_used, suggestion, config,
+                clock, humidity, wind_speed,
+            )
+        if mode_used != "rules":
+            display_ai_mode_result(
+                city, temp, desc, suggestion, time_remark, lang, mode_used, clock, aqi, uvi,
+            )
+        else:
+            if error_msg:
+                handle_ai_failure(lang, error_msg, config)
+            display_traditional_mode(
+                city, temp, desc, time_remark, lang, is_fallback=bool(error_msg), clock=clock,
+                aqi=aqi, uvi=uvi,
+            )
+
+
+def parse_duration(text):
+    """解析 30m / 12h / 7d 形式的时长，返回秒数"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
 
 
-def main():
+def record_deadline(record, default=None):
+    """记录自带的 deadline（秒数或 2s 形式）优先，否则使用 --deadline"""
+    value = record.get("deadline")
+    if value is None:
+        return default
+    try:
+        return float(value) if isinstance(value, (int, float)) else parse_duration(str(value))
+    except ValueError:
+        print(f"⚠️ 无效的 deadline: {value}", file=sys.stderr)
+        return default
+
+
+def display_history(city, lang, since_seconds):
+    """显示某城市的历史建议"""
+    titles = {
+        "ja": f"🕘 {city} の過去のアドバイス",
+        "zh": f"🕘 {city} 的历史建议",
+        "en": f"🕘 Past advice for {city}",
+    }
+    empty = {
+        "ja": "記録がありません",
+        "zh": "没有记录",
+        "en": "No records found",
+    }
+    entries = get_history_store().query(city, since=time.time() - since_seconds)
+
+    print(titles.get(lang, titles["en"]))
+    print("─" * 35)
+    if not entries:
+        print(empty.get(lang, empty["en"]))
+        return
+    for entry in entries:
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.ts))
+        print(f"{stamp} | 🌡️ {entry.temp}°C | {entry.desc} | {entry.mode.upper()} ({entry.lang})")
+        print(f"   💡 {entry.suggestion}")
+
+
+def display_usage(lang, since_seconds, config):
+    """显示 AI 调用的累计用量及预算"""
+    titles = {
+        "ja": "📊 AI 利用状況",
+        "zh": "📊 AI 用量统计",
+        "en": "📊 AI Usage",
+    }
+    ledger = get_usage_ledger()
+    if ledger is None:
+        return
+    print(titles.get(lang, titles["en"]))
+    print("─" * 35)
+    totals = ledger.totals(since=time.time() - since_seconds, mode="openai")
+    print(
+        f"OPENAI: {totals.calls} calls | "
+        f"tokens {totals.prompt_tokens} + {totals.completion_tokens} | "
+        f"${totals.cost:.4f} | avg {totals.avg_latency * 1000:.0f} ms"
+    )
+
+    budget = Budget.from_config(config)
+    if budget.limited:
+        used = ledger.totals(since=time.time() - budget.period, mode="openai")
+        hours = budget.period / 3600
+        if budget.max_tokens is not None:
+            print(f"🎯 tokens ({hours:g}h): {used.total_tokens} / {budget.max_tokens}")
+        if budget.max_cost is not None:
+            print(f"🎯 cost ({hours:g}h): ${used.cost:.4f} / ${budget.max_cost}")
+
+
+def serve_cli(args):
+    """常驻进程：预先加载配置和历史数据库，然后处理套接字请求"""
+    store = get_config_store()
+    store.watch()
+    get_history_store()
+    runner = run
+    if args.profile:
+        # 按比例抽样分析请求，每分钟最多几次，开销有上限
+        runner = RequestSampler(args.profile, args.profile_rate).wrap(run)
+    serve(runner)
+    store.stop()
+
+
+def main(argv=None):
     # 自动加载项目根目录下的 .env 文件
     load_dotenv()
 
+    argv = sys.argv[1:] if argv is None else argv
+    args = get_args(argv)
+
+    if args.serve:
+        serve_cli(args)
+        return
+    if args.profile:
+        profile_call(args.profile, advise_main, args, argv, label=args.city or "cli")
+        return
+    advise_main(args, argv)
+
+
+def advise_main(args, argv):
+    """执行一次命令行请求（参数已解析）"""
     # 加载用户配置
     config = load_user_preferences()
 
@@ -350,13 +865,12 @@ def main():
     api_key = os.getenv("OPENWEATHER_API_KEY")
     debug_mode = os.getenv("DEBUG_MODE", "False") == "True"
 
-    args = get_args()
-
     # 应用配置文件的默认值
     if not args.city:
         args.city = config.get("default_city", "Tokyo")
-    if args.lang == "ja" and not any("--lang" in arg for arg in os.sys.argv):
+    if args.lang == "ja" and not any("--lang" in arg for arg in argv):
         args.lang = config.get("preferred_lang", "ja")
+        args.langs = [args.lang]
 
     # AI模式处理：如果用户没有明确指定，使用配置文件的默认值
     if args.ai_mode == "auto" and not args.no_ai:
@@ -365,12 +879,28 @@ def main():
         args.ai_mode = "off"
 
     # 显示配置信息
+    if args.init_config:
+        store = get_config_store()
+        try:
+            if store.write_default():
+                print(f"✅ 已创建默认配置文件: {store.path}")
+            else:
+                print(f"ℹ️ 配置文件已存在: {store.path}")
+        except OSError as e:
+            print(f"⚠️ 无法创建配置文件: {e}")
+        return
     if args.config:
         display_config_info(config, args.lang)
         return
+    if args.history:
+        display_history(normalize_city(args.city), args.lang, parse_duration(args.since))
+        return
+    if args.usage:
+        display_usage(args.lang, parse_duration(args.since), config)
+        return
 
-    # 验证 API 密钥
-    if not api_key:
+    # 验证 API 密钥（JSONL 模式下按记录单独报告错误）
+    if not api_key and not (args.input_jsonl or args.output_jsonl):
         error_msg = {
             "ja": "❌ API キーが見つかりません。.env ファイルに OPENWEATHER_API_KEY を設定してください",
             "zh": "❌ 未找到 API 密钥，请在 .env 文件中设置 OPENWEATHER_API_KEY",
@@ -379,88 +909,56 @@ def main():
         print(error_msg.get(args.lang, error_msg["en"]))
         return
 
-    # 城市处理
-    if not args.city or args.city.lower() == "auto":
-        city = get_city_by_ip()
-        if args.verbose:
-            auto_detect_msg = {
-                "ja": f"🌐 自動検出された都市: {city}",
-                "zh": f"🌐 自动检测到城市: {city}",
-                "en": f"🌐 Auto-detected city: {city}",
-            }
-            print(auto_detect_msg.get(args.lang, auto_detect_msg["en"]))
+    if args.input_jsonl:
+        # 惰性读取标准输入，每次只处理一条记录
+        records = iter_jsonl_records(sys.stdin)
+        # 长时间运行：监视配置文件，修改后无需重启即可生效
+        get_config_store().watch()
     else:
-        city = normalize_city(args.city)
-
-    if args.verbose:
-        info_msg = {
-            "ja": f"🏙️ 使用都市：{city}\n🤖 AIモード：{args.ai_mode}\n🔧 モード：{'デバッグ' if debug_mode else '本番'}",
-            "zh": f"🏙️ 使用城市：{city}\n🤖 AI模式：{args.ai_mode}\n🔧 当前模式：{'调试' if debug_mode else '正式'}",
-            "en": f"🏙️ Using city: {city}\n🤖 AI mode: {args.ai_mode}\n🔧 Mode: {'Debug' if debug_mode else 'Production'}",
-        }
-        print(info_msg.get(args.lang, info_msg["en"]))
-
-    # 获取天气数据
-    temp, desc = get_weather(city, api_key)
-    if temp is None:
-        error_msg = {
-            "ja": "申し訳ありませんが、天気データを取得できませんでした。都市名を確認してください。",
-            "zh": "抱歉，无法获取天气数据。请检查城市名称。",
-            "en": "Sorry, unable to retrieve weather data. Please check the city name.",
-        }
-        print(error_msg.get(args.lang, error_msg["en"]))
-        return
-
-    time_remark = get_time_remark(args.lang)
-
-    # 显示个性化问候
-    greeting = get_time_greeting(args.lang)
-    print(f"{greeting}\n")
-
-    # 主要逻辑：默认尝试AI，失败则回退到传统模式
-    if args.ai_mode != "off":
-        # 显示加载提示
-        loading_messages = {
-            "ja": "🤖 AIスタイリストが最適なコーディネートを考案中...",
-            "zh": "🤖 AI造型师正在为您搭配最佳着装...",
-            "en": "🤖 AI stylist is creating your perfect outfit...",
-        }
-        print(loading_messages.get(args.lang, loading_messages["en"]))
-
-        # 尝试获取AI建议
-        suggestion, success, error_msg = try_ai_suggestion(
-            city, temp, desc, time_remark, args.lang, args.ai_mode, args.verbose
-        )
-
-        if success:
-            # AI成功
-            display_ai_mode_result(
-                city, temp, desc, suggestion, time_remark, args.lang, args.ai_mode
+        records = iter([{"city": args.city}])
+
+    for record in records:
+        if args.input_jsonl:
+            config = get_config_store().current
+        if args.output_jsonl:
+            # 流水线中的提示信息改写到 stderr，保证 stdout 只有 JSON
+            with stdout_to_stderr(), clock_scope(), deadline_scope(
+                record_deadline(record, args.deadline)
+            ):
+                try:
+                    results = advise_record(record, args, config, api_key)
+                except Exception as e:
+                    # 单条记录出错不影响后续记录
+                    results = [{"error": f"{type(e).__name__}: {e}"}]
+            # 每种语言输出一行
+            sys.stdout.write(
+                "".join(
+                    json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n"
+                    for result in results
+                )
             )
-            return
+            sys.stdout.flush()
         else:
-            # AI失败，处理回退
-            if config.get("ai_fallback_enabled", True):
-                handle_ai_failure(args.lang, error_msg, config)
-                display_traditional_mode(
-                    city, temp, desc, time_remark, args.lang, is_fallback=True
-                )
-            else:
-                # 不允许回退，直接显示错误
-                print(f"❌ AI建议获取失败：{error_msg}")
-                return
-    else:
-        # 直接使用传统模式
-        display_traditional_mode(
-            city, temp, desc, time_remark, args.lang, is_fallback=False
-        )
-
-
-if __name__ == "__main__":
+            with clock_scope(), deadline_scope(record_deadline(record, args.deadline)):
+                try:
+                    show_record(record, args, config, api_key, debug_mode)
+                except Exception as e:
+                    if not args.input_jsonl:
+                        raise
+                    # 单条记录出错不影响后续记录
+                    print(f"⚠️ {type(e).__name__}: {e}")
+
+
+def run(argv=None):
+    """执行一次命令行调用（常驻进程也通过它处理每个请求）"""
     try:
-        main()
+        main(argv)
     except KeyboardInterrupt:
         print("\n\n👋 さようなら！")
     except Exception as e:
         print(f"\n❌ 予期しないエラーが発生しました: {e}")
         print("詳細な情報が必要な場合は --verbose フラグを使用してください。")
+
+
+if __name__ == "__main__":
+    run()
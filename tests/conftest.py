@@ -0,0 +1,43 @@
+import sys
+import os
+
+import pytest
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+from stub_server import StubConfig, StubServer
+from weather_advisor import advisor, environment
+from weather_advisor.throttle import TokenBucket
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "stub_config(**fields): 本模块 / 用例使用的 StubConfig 字段"
+    )
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    server = StubServer(StubConfig()).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def stub(stub_server, request, monkeypatch):
+    """
+    整个测试会话共用一个模拟服务器，每个用例开始时按 stub_config 标记重置配置和计数，
+    并让 weather_advisor 指向它（不限流、清空环境数据缓存）
+    """
+    marker = request.node.get_closest_marker("stub_config")
+    stub_server.reset(StubConfig(**(marker.kwargs if marker else {})))
+    for key, value in stub_server.env().items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(advisor, "_weather_limiter", TokenBucket.per_minute(6000, capacity=100))
+    environment._air_cache.clear()
+    environment._uv_cache.clear()
+    environment._coords.clear()
+    return stub_server
@@ -0,0 +1,46 @@
+import sys
+import os
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.advice_table import TEMP_POINTS, lookup_advice
+from weather_advisor.advisor import get_clothing_suggestion
+from weather_advisor.utils import (
+    get_comfort_level,
+    get_regional_advice,
+    get_weather_emoji,
+)
+
+DESCS = [
+    "clear sky", "晴れ", "晴", "scattered clouds", "曇りがち", "多云",
+    "light rain", "小雨", "雨", "snow", "雪", "thunderstorm", "暴雨", "嵐",
+    "fog", "霧", "雾", "wind", "大风", "強風", "mist", "", "Sunny, Light Rain",
+    "cloudy with rain", "Heavy RAIN",
+]
+CITIES = [
+    "Tokyo", "tokyo-to", "Osaka", "Beijing", "New York", "Sydney", "Bangkok",
+    "Sapporo", "Chengdu", "Berlin", "", "Paris London",
+]
+
+
+def test_lookup_matches_rule_functions():
+    temps = [-40, -0.5, 0, 59.9, 60]
+    for point in TEMP_POINTS:
+        temps += [point - 0.01, point, point + 0.01, float(point)]
+    for lang in ("ja", "zh", "en", "fr"):
+        for city in CITIES:
+            for temp in temps:
+                for desc in DESCS:
+                    advice = lookup_advice(city, temp, desc, lang)
+                    assert advice.suggestion == get_clothing_suggestion(temp, desc, lang)
+                    assert advice.comfort == get_comfort_level(temp, desc, lang)
+                    assert advice.emoji == get_weather_emoji(desc, temp)
+                    assert advice.regional == get_regional_advice(city, temp, lang)
+
+
+def test_nan_temperature_falls_back():
+    nan = float("nan")
+    advice = lookup_advice("Tokyo", nan, "clear sky", "ja")
+    assert advice.suggestion == get_clothing_suggestion(nan, "clear sky", "ja")
+    assert advice.comfort == get_comfort_level(nan, "clear sky", "ja")
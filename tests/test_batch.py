@@ -0,0 +1,65 @@
+import sys
+import os
+import io
+import json
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from weather_advisor import batch
+from weather_advisor.batch import iter_observations, run_batch
+
+
+def make_input(count):
+    lines = [json.dumps({"city": f"City{i}", "temp": float(i), "desc": "晴れ"}) for i in range(count)]
+    lines.insert(3, "{not json")
+    lines.insert(7, json.dumps({"city": "NoTemp", "desc": "晴れ"}))
+    return "\n".join(lines) + "\n"
+
+
+def test_batch_keeps_input_order_and_skips_invalid_records(stub, monkeypatch, capsys):
+    created = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, max_workers=None):
+            created.append(max_workers)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", RecordingPool)
+    out = io.StringIO()
+    rows = iter_observations(io.StringIO(make_input(20)), "jsonl")
+    total = run_batch(rows, out, langs=("ja", "en"), workers=2, chunk_size=3, max_pending=2)
+
+    assert total == 20 and created == [2]
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    # 分片在多个进程中并行渲染，输出仍按输入顺序、每条观测按语言顺序排列
+    assert [(r["city"], r["lang"]) for r in results] == [
+        (f"City{i}", lang) for i in range(20) for lang in ("ja", "en")
+    ]
+    err = capsys.readouterr().err
+    assert "第 4 行" in err and "第 8 行" in err
+    # 批量渲染只使用规则引擎，不访问网络
+    assert sum(stub.request_counts.values()) == 0
+
+
+def test_batch_cli_writes_jsonl(stub, tmp_path):
+    src = tmp_path / "obs.jsonl"
+    src.write_text(make_input(5), encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, "-m", "weather_advisor.batch", str(src), "--langs", "zh", "--workers", "1"],
+        cwd=ROOT, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0
+    assert [json.loads(line)["city"] for line in result.stdout.splitlines()] == [
+        f"City{i}" for i in range(5)
+    ]
+    assert "已处理 5 条观测" in result.stderr
+
+
+def test_display_uses_measured_environment():
+    item = batch.render_advice("Tokyo", 28.0, "晴れ", "en", aqi=5, uvi=9.0)
+    # 完整显示中的地域提示与 regional 字段一致
+    assert item["regional"] in item["display"]
@@ -0,0 +1,99 @@
+import sys
+import os
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import weather_advisor.change_detect as change_detect
+from weather_advisor.change_detect import ChangeDetector, ChangeThresholds, refresh_cities
+from weather_advisor.records import Observation
+
+
+def test_change_reasons():
+    detector = ChangeDetector(ChangeThresholds(temp_delta=3.0, max_age=3600), path=None)
+    base = Observation("Tokyo", 16.0, "曇りがち")
+    assert detector.change_reason(base, now=0) == "new"
+    detector.update(base, {}, now=0)
+
+    assert detector.change_reason(Observation("Tokyo", 17.0, "曇り"), now=10) is None
+    assert detector.change_reason(Observation("Tokyo", 16.0, "曇り"), now=3600) == "expired"
+    assert detector.change_reason(Observation("Tokyo", 19.5, "曇り"), now=10) == "temp"
+    # 15°C 是规则引擎的阈值：温差小但跨过区间
+    assert detector.change_reason(Observation("Tokyo", 14.5, "曇り"), now=10) == "band"
+    assert detector.change_reason(Observation("Tokyo", 16.0, "曇り時々雨"), now=10) == "rain"
+    assert detector.change_reason(Observation("Tokyo", 16.0, "霧"), now=10) == "category"
+
+    relaxed = ChangeDetector(
+        ChangeThresholds(temp_delta=None, band=False, category=False), path=None
+    )
+    relaxed.update(base, {}, now=0)
+    assert relaxed.change_reason(Observation("Tokyo", 14.5, "霧"), now=10) is None
+
+
+def test_refresh_reuses_and_persists(monkeypatch, tmp_path):
+    weather = {"Tokyo": (16.0, "晴れ"), "Osaka": (20.0, "曇り")}
+    monkeypatch.setattr(
+        change_detect,
+        "observe",
+        lambda city, api_key: Observation(city, *weather[city]),
+    )
+    state = str(tmp_path / "state.json")
+
+    detector = ChangeDetector(path=state)
+    results = refresh_cities(["Tokyo", "Osaka"], ["ja"], "k", detector)
+    assert [(r.status, r.reason) for r in results] == [("recomputed", "new")] * 2
+    detector.save()
+
+    weather["Osaka"] = (20.0, "小雨")
+    detector = ChangeDetector(path=state)
+    results = refresh_cities(["Tokyo", "Osaka"], ["ja", "en"], "k", detector)
+    assert [(r.status, r.reason) for r in results] == [
+        ("recomputed", "lang"),
+        ("recomputed", "rain"),
+    ]
+    assert set(results[0].advice) == {"ja", "en"}
+
+    results = refresh_cities(["Tokyo", "Osaka"], ["ja", "en"], "k", detector)
+    assert [r.status for r in results] == ["reused", "reused"]
+    assert "雨具" in results[1].advice["ja"]["suggestion"]
+
+
+def test_refresh_does_not_rename_shared_observations(monkeypatch):
+    # 并发查询共享同一个观测对象（SingleFlight），接口返回的城市名不能被改写
+    shared = Observation("Tokyo Prefecture", 16.0, "晴れ")
+    monkeypatch.setattr(change_detect, "observe", lambda city, api_key: shared)
+    detector = ChangeDetector(path=None)
+    refresh_cities(["Tokyo"], ["ja"], "k", detector)
+    assert shared.city == "Tokyo Prefecture"
+    assert detector.states["Tokyo"].obs.city == "Tokyo"
+
+
+def test_refresh_regenerates_on_environment_change(monkeypatch):
+    current = {"aqi": 1}
+    monkeypatch.setattr(
+        change_detect,
+        "observe",
+        lambda city, api_key: Observation(city, 16.0, "晴れ", aqi=current["aqi"]),
+    )
+    detector = ChangeDetector(path=None)
+    refresh_cities(["Tokyo"], ["ja"], "k", detector)
+    assert refresh_cities(["Tokyo"], ["ja"], "k", detector)[0].status == "reused"
+    current["aqi"] = 5
+    assert refresh_cities(["Tokyo"], ["ja"], "k", detector)[0].reason == "environment"
+
+
+def test_rules_fallback_is_retried_on_next_refresh(monkeypatch):
+    monkeypatch.setattr(
+        change_detect, "observe", lambda city, api_key: Observation(city, 16.0, "晴れ")
+    )
+    replies = [None, "AI のおすすめ"]
+    monkeypatch.setattr(change_detect, "get_ai_suggestion", lambda *args: replies.pop(0))
+    detector = ChangeDetector(path=None)
+    first = refresh_cities(["Tokyo"], ["ja"], "k", detector, ai_mode="ollama")[0]
+    assert first.advice["ja"]["mode"] == "rules"
+    # 天气未变，但上次是回退结果：AI 恢复后立即重新生成
+    second = refresh_cities(["Tokyo"], ["ja"], "k", detector, ai_mode="ollama")[0]
+    assert (second.status, second.reason) == ("recomputed", "retry")
+    assert second.advice["ja"] == {"suggestion": "AI のおすすめ", "mode": "ollama"}
+    third = refresh_cities(["Tokyo"], ["ja"], "k", detector, ai_mode="ollama")[0]
+    assert third.status == "reused"
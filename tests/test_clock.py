@@ -0,0 +1,68 @@
+import sys
+import os
+import datetime
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.clock import CityClock, city_clock, clock_for, clock_scope, current_clock
+from weather_advisor.utils import (
+    get_time_greeting,
+    get_time_remark,
+    get_seasonal_reminder,
+)
+from weather_advisor.ai_suggester import build_enhanced_prompt
+
+
+def test_clock_tables():
+    assert clock_for(5, 1).period == "morning"
+    assert clock_for(11, 1).period == "morning"
+    assert clock_for(12, 1).period == "afternoon"
+    assert clock_for(18, 1).period == "evening"
+    assert clock_for(4, 1).period == "night"
+    assert clock_for(13, 1).remark_key == "noon"
+    assert clock_for(0, 1).remark_key == "late_night"
+    assert clock_for(0, 12).season == "winter"
+    assert clock_for(0, 4).season == "spring"
+    assert clock_for(0, 8).season == "summer"
+    assert clock_for(0, 10).season == "autumn"
+
+
+def test_current_clock_is_cached_per_hour():
+    now = datetime.datetime(2024, 7, 1, 9, 59)
+    assert current_clock(now) is current_clock(now.replace(minute=1))
+    assert current_clock(now) is not current_clock(now.replace(hour=10))
+
+
+def test_renderers_share_clock():
+    clock = clock_for(8, 4)
+    assert get_time_greeting("en", clock) == "Good morning! ☀️"
+    assert get_time_remark("en", clock).startswith("Morning")
+    assert get_seasonal_reminder("en", clock)["icon"] == "🌸"
+    prompt = build_enhanced_prompt("Tokyo", 18, "clear", "x", "en", clock)
+    assert "Time: morning" in prompt
+    assert "Season: spring" in prompt
+
+
+def test_city_clock_uses_offset_and_hemisphere():
+    # 2024-01-15 00:00 UTC
+    utc_now = 1705276800
+    clocks = CityClock(utc_now)
+    tokyo = clocks.get(9 * 3600, 35.7)
+    new_york = clocks.get(-5 * 3600, 40.7)
+    sydney = clocks.get(11 * 3600, -33.9)
+    assert (tokyo.hour, tokyo.season) == (9, "winter")
+    assert (new_york.hour, new_york.month) == (19, 1)
+    assert (sydney.hour, sydney.season) == (11, "summer")
+    assert clocks.get(9 * 3600, 35.0) is tokyo
+
+
+def test_clock_scope_shares_one_city_clock():
+    utc_now = 1705276800
+    with clock_scope(utc_now) as clocks:
+        assert city_clock(9 * 3600, 35.7) is clocks.get(9 * 3600, 35.7)
+        # 内层沿用外层的时刻
+        with clock_scope() as inner:
+            assert inner is clocks
+        assert city_clock(9 * 3600).hour == 9
+    assert city_clock(9 * 3600, utc_now=utc_now).hour == 9
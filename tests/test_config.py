@@ -0,0 +1,54 @@
+import sys
+import os
+import json
+import time
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.config import ConfigStore, DEFAULT_CONFIG, validate_config
+
+
+def test_missing_file_uses_defaults_without_writing(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    assert store.get() == DEFAULT_CONFIG
+    assert not path.exists()
+
+
+def test_validate_drops_invalid_values():
+    config = validate_config({"preferred_lang": "fr", "ai_timeout": 5, "extra": 1})
+    assert config["preferred_lang"] == "ja"
+    assert config["ai_timeout"] == 5
+    assert config["extra"] == 1
+
+
+def test_reload_on_change_and_cache_otherwise(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"default_city": "Osaka"}), encoding="utf-8")
+    store = ConfigStore(str(path))
+    first = store.get()
+    assert first["default_city"] == "Osaka"
+    assert store.get() is first
+
+    path.write_text(json.dumps({"default_city": "Kyoto!"}), encoding="utf-8")
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert store.get()["default_city"] == "Kyoto!"
+
+
+def test_bad_reload_keeps_last_good_config(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"default_city": "Osaka"}), encoding="utf-8")
+    store = ConfigStore(str(path))
+    store.get()
+    path.write_text("{broken", encoding="utf-8")
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert store.get()["default_city"] == "Osaka"
+
+
+def test_write_default_is_explicit(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    assert store.write_default()
+    assert json.loads(path.read_text(encoding="utf-8")) == DEFAULT_CONFIG
+    assert not store.write_default()
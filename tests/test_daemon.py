@@ -0,0 +1,147 @@
+import sys
+import os
+import json
+import threading
+import urllib.error
+import urllib.request
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.daemon import AdviceServer, PollPolicy, WeatherDaemon, quota_interval
+from weather_advisor.records import Observation
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeWeather:
+    """按城市返回预设的温度序列，None 表示查询失败"""
+
+    def __init__(self, temps):
+        self.temps = {city: list(values) for city, values in temps.items()}
+        self.calls = []
+
+    def __call__(self, city, api_key):
+        self.calls.append(city)
+        values = self.temps[city]
+        temp = values.pop(0) if len(values) > 1 else values[0]
+        return None if temp is None else Observation(city, temp, "晴れ")
+
+
+def make_daemon(weather, clock, **kwargs):
+    policy = PollPolicy(interval=600, min_interval=120, max_interval=3600, jitter=0.1)
+    return WeatherDaemon(
+        list(weather.temps), "key", policy=policy, rate_per_minute=600,
+        fetch=weather, clock=clock, seed=0, **kwargs,
+    )
+
+
+def test_initial_polls_are_spread_and_jittered():
+    clock = FakeClock()
+    weather = FakeWeather({f"City{i}": [20.0] for i in range(100)})
+    daemon = make_daemon(weather, clock)
+    starts = sorted(e.next_at - clock.now for e in daemon.entries.values())
+    # 100 个城市、600 次/分钟：10 秒内分散发起首次查询
+    assert 0 <= starts[0] and starts[-1] <= 10.0
+    assert len(set(starts)) == 100
+
+    clock.now += 10
+    assert daemon.run_pending() == 100
+    delays = [e.next_at - clock.now for e in daemon.entries.values()]
+    assert all(600 * 1.5 * 0.9 <= d <= 600 * 1.5 * 1.1 for d in delays)
+    assert len(set(delays)) > 90
+
+
+def test_interval_adapts_to_volatility_and_failures():
+    clock = FakeClock()
+    weather = FakeWeather({
+        "Stable": [20.0],
+        "Volatile": [10.0, 14.0, 9.0, 15.0, 10.0, 16.0],
+        "Broken": [None],
+    })
+    daemon = make_daemon(weather, clock)
+    for _ in range(5):
+        clock.now += 4000
+        daemon.run_pending()
+
+    stable, volatile, broken = (daemon.entries[k] for k in ("stable", "volatile", "broken"))
+    assert stable.interval == 3600
+    assert volatile.interval == 120
+    assert broken.failures == 5 and not broken.payloads
+    assert broken.next_at - clock.now <= 1800 * 1.1
+
+
+def test_quota_limits_minimum_interval():
+    assert quota_interval(3000, 60) == 3000
+    clock = FakeClock()
+    weather = FakeWeather({f"City{i}": [20.0] for i in range(50)})
+    daemon = WeatherDaemon(
+        list(weather.temps), "key", rate_per_minute=10, fetch=weather, clock=clock, seed=0
+    )
+    assert daemon.min_interval == 300
+
+
+def test_serves_advice_from_memory():
+    clock = FakeClock()
+    weather = FakeWeather({"Tokyo": [21.0], "Osaka": [5.0]})
+    daemon = make_daemon(weather, clock, langs=["ja", "en"])
+    clock.now += 10
+    daemon.run_pending()
+    daemon.entries["osaka"].published = None
+
+    server = AdviceServer(daemon, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with urllib.request.urlopen(f"{server.base_url}/advice?city=tokyo&lang=en") as resp:
+            data = json.loads(resp.read())
+        assert data["city"] == "Tokyo" and data["temp"] == 21.0 and data["suggestion"]
+        for path, status in (("/advice?city=Paris", 404), ("/advice?city=Osaka", 503)):
+            try:
+                urllib.request.urlopen(server.base_url + path)
+                raise AssertionError(path)
+            except urllib.error.HTTPError as e:
+                assert e.code == status
+        with urllib.request.urlopen(f"{server.base_url}/status") as resp:
+            assert json.loads(resp.read())["cities"] == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+    # 查询只发生在轮询中，HTTP 请求不会触发天气查询
+    assert len(weather.calls) == 2
+
+
+def test_publishes_latest_temperature_without_regenerating():
+    clock = FakeClock()
+    weather = FakeWeather({"Tokyo": [20.0, 20.4]})
+    daemon = make_daemon(weather, clock)
+    clock.now += 10
+    daemon.run_pending()
+    first = json.loads(daemon.payload("Tokyo", "ja"))
+    clock.now += 4000
+    daemon.run_pending()
+    second = json.loads(daemon.payload("Tokyo", "ja"))
+    # 变化很小：沿用原来的建议，但温度为最新观测
+    assert first["temp"] == 20.0 and second["temp"] == 20.4
+    assert second["suggestion"] == first["suggestion"]
+
+
+def test_generation_errors_count_as_failed_polls(monkeypatch):
+    clock = FakeClock()
+    weather = FakeWeather({"Tokyo": [20.0]})
+    daemon = make_daemon(weather, clock)
+
+    def broken(obs, langs):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(daemon, "_generate", broken)
+    clock.now += 10
+    daemon.run_pending()
+    entry = daemon.entries["tokyo"]
+    assert entry.failures == 1 and entry.published is None
@@ -0,0 +1,116 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import main
+from weather_advisor.advisor import get_observation
+from weather_advisor.ai_suggester import call_ollama_gemma
+from weather_advisor.deadline import (
+    DeadlineExceeded,
+    acquire_token,
+    deadline_scope,
+    remaining,
+    stage_timeout,
+    submit_with_deadline,
+)
+from weather_advisor.throttle import SingleFlight, TokenBucket
+
+pytestmark = pytest.mark.stub_config(gen_latency=2.0)
+
+
+def test_stage_timeout_shrinks_to_remaining_budget():
+    assert remaining() is None and stage_timeout(10) == 10
+    with deadline_scope(1.0):
+        assert 0.9 < stage_timeout(10) <= 1.0
+        assert stage_timeout(0.2) == 0.2
+        # 内层不能延长外层的截止时间
+        with deadline_scope(5.0):
+            assert remaining() <= 1.0
+        with deadline_scope(0.0):
+            with pytest.raises(DeadlineExceeded):
+                stage_timeout(10)
+    assert remaining() is None
+
+
+def test_deadline_follows_tasks_into_thread_pools():
+    with ThreadPoolExecutor(1) as pool:
+        with deadline_scope(2.0):
+            inherited = submit_with_deadline(pool, remaining).result()
+            plain = pool.submit(remaining).result()
+    assert 0 < inherited <= 2.0
+    assert plain is None
+
+
+def test_limiter_and_followers_respect_deadline():
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    acquire_token(bucket)
+    start = time.monotonic()
+    with deadline_scope(0.2):
+        with pytest.raises(DeadlineExceeded):
+            acquire_token(bucket)
+    assert time.monotonic() - start < 1.0
+
+    flight = SingleFlight()
+    gate = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", gate.wait, 5))
+    leader.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    with deadline_scope(0.2):
+        with pytest.raises(DeadlineExceeded):
+            flight.do("k", lambda: "follower")
+    assert time.monotonic() - start < 1.0
+    gate.set()
+    leader.join()
+
+
+def test_leader_deadline_is_not_shared_with_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def short_leader():
+        started.set()
+        time.sleep(0.1)
+        raise DeadlineExceeded()
+
+    leader = threading.Thread(target=lambda: pytest.raises(DeadlineExceeded, flight.do, "k", short_leader))
+    leader.start()
+    started.wait(1)
+    # 跟随方还有时间：发起方超时后自己重新请求
+    assert flight.do("k", lambda: "retried") == "retried"
+    leader.join()
+
+
+def test_slow_stages_are_cut_off(stub, capsys):
+    stub.config.latency = 0.5
+    start = time.perf_counter()
+    with deadline_scope(0.2):
+        assert get_observation("Tokyo", "stub-key") is None
+    assert time.perf_counter() - start < 0.45
+
+    stub.config.latency = 0.0
+    start = time.perf_counter()
+    with deadline_scope(0.3), pytest.raises(DeadlineExceeded):
+        call_ollama_gemma("prompt")
+    assert time.perf_counter() - start < 0.6
+
+
+def test_pipeline_returns_rule_advice_when_ai_misses_deadline(stub):
+    config = {"history_enabled": False, "ai_fallback_enabled": False}
+    start = time.perf_counter()
+    with deadline_scope(0.5):
+        suggestion, mode, error, reused = main.resolve_multilang_advice(
+            "Tokyo", 12.0, "小雨", ["ja"], "ollama", config
+        )["ja"]
+    assert time.perf_counter() - start < 0.9
+    assert mode == "rules" and suggestion and "截止时间" in error
+    assert main.record_deadline({"deadline": "1.5s"}) == 1.5
+    assert main.record_deadline({}, 2.0) == 2.0
@@ -0,0 +1,60 @@
+import sys
+import os
+import json
+
+import pytest
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from weather_advisor import decoding
+
+PAYLOAD_DIR = os.path.join(ROOT, "benchmarks", "payloads")
+
+msgspec_only = pytest.mark.skipif(decoding.msgspec is None, reason="msgspec 未安装")
+
+
+def read_payload(name):
+    with open(os.path.join(PAYLOAD_DIR, name), "rb") as f:
+        return f.read()
+
+
+def stdlib_decoders():
+    return decoding._make_dict_decoders(json.loads)
+
+
+@msgspec_only
+def test_msgspec_matches_stdlib():
+    decode_weather, decode_weather_list, decode_ollama_response = stdlib_decoders()
+    weather = read_payload("weather_tokyo.json")
+    assert decoding._msgspec_decode_weather(weather) == decode_weather(weather)
+    assert decoding._msgspec_decode_weather(weather, "東京") == decode_weather(weather, "東京")
+
+    group = read_payload("group_20.json")
+    assert decoding._msgspec_decode_weather_list(group) == decode_weather_list(group)
+
+    ollama = read_payload("ollama_generate.json")
+    assert decoding._msgspec_decode_ollama_response(ollama) == decode_ollama_response(ollama)
+
+
+@msgspec_only
+def test_msgspec_errors_match_stdlib_exception_types():
+    decode_weather, decode_weather_list, _ = stdlib_decoders()
+    # 缺少字段：两种实现都抛出 KeyError
+    missing = b'{"weather": [{"description": "rain"}]}'
+    with pytest.raises(KeyError):
+        decode_weather(missing)
+    with pytest.raises(KeyError):
+        decoding._msgspec_decode_weather(missing)
+    with pytest.raises(KeyError):
+        decoding._msgspec_decode_weather(b'{"main": {"temp": 1.0}, "weather": []}')
+    with pytest.raises(KeyError):
+        decoding._msgspec_decode_weather_list(b'{"list": [{"main": {}}]}')
+
+    # 不是合法的 JSON：ValueError
+    for decode in (decode_weather, decoding._msgspec_decode_weather):
+        with pytest.raises(ValueError):
+            decode(b"{oops")
+    with pytest.raises(ValueError):
+        decoding._msgspec_decode_ollama_response(b"[1")
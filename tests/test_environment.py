@@ -0,0 +1,105 @@
+import sys
+import os
+import subprocess
+import time
+
+import requests
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from weather_advisor import environment
+from weather_advisor.advice_table import lookup_advice
+from weather_advisor.advisor import get_observation
+from weather_advisor.ai_suggester import build_compact_prompt, build_enhanced_prompt
+from weather_advisor.environment import TTLCache, observe
+from weather_advisor.records import Observation
+
+
+def test_ttl_cache_expiry_and_failures():
+    now = [0.0]
+    cache = TTLCache(ttl=100, failure_ttl=10, max_size=2, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", None)
+    assert cache.get("a") == 1
+    # 失败结果也缓存，但过期更快
+    assert cache.get("b") is None
+    now[0] = 20
+    assert cache.get("b") is environment._MISSING
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("a") is environment._MISSING  # 超出容量淘汰最早的一项
+    now[0] = 200
+    assert cache.get("c") is environment._MISSING
+
+
+def test_observe_fetches_environment_concurrently(stub, monkeypatch):
+    # 首次查询从天气响应中取得坐标
+    obs = observe("Tokyo", "stub-key")
+    assert 1 <= obs.aqi <= 5 and obs.uvi >= 0
+    counts = stub.request_counts
+    assert counts["/data/2.5/air_pollution"] == 1 and counts["/data/3.0/onecall"] == 1
+
+    # 坐标已知后与天气查询同时发起：天气响应返回时环境数据的请求已经到达
+    stub.config.latency = 0.2
+    environment._air_cache.clear()
+    environment._uv_cache.clear()
+    seen = []
+
+    def weather_then_count(city, api_key, units="metric"):
+        result = get_observation(city, api_key, units)
+        seen.append(stub.request_counts["/data/2.5/air_pollution"])
+        return result
+
+    monkeypatch.setattr(environment, "get_observation", weather_then_count)
+    again = observe("Tokyo", "stub-key")
+    assert seen == [2]
+    assert (again.aqi, again.uvi) == (obs.aqi, obs.uvi)
+
+    # 缓存命中时不再请求
+    observe("Tokyo", "stub-key")
+    assert stub.request_counts["/data/2.5/air_pollution"] == 2
+
+
+def test_environment_failure_does_not_break_weather(stub, monkeypatch, capsys):
+    def unsubscribed(lat, lon, api_key):
+        response = requests.Response()
+        response.status_code = 401
+        raise requests.exceptions.HTTPError("401", response=response)
+
+    # 未订阅 One Call 时紫外线为 None，且不输出警告
+    monkeypatch.setattr(environment, "fetch_uv_index", unsubscribed)
+    obs = observe("Osaka", "stub-key")
+    assert obs.temp is not None and obs.aqi is not None and obs.uvi is None
+    assert "紫外线" not in capsys.readouterr().err
+
+
+def test_advice_and_prompts_use_environment():
+    plain = lookup_advice("Seoul", 20.0, "晴れ", "en")
+    measured = lookup_advice("Seoul", 20.0, "晴れ", "en", aqi=5, uvi=9.0)
+    assert measured.comfort == plain.comfort
+    assert measured.suggestion != plain.suggestion
+    assert "AQI 5" in measured.regional
+    assert lookup_advice("Seoul", 20.0, "晴れ", "en", aqi=None, uvi=None) == plain
+
+    prompt = build_enhanced_prompt("Tokyo", 20.0, "晴れ", "", "zh", aqi=4, uvi=7.26)
+    assert "AQI 4/5" in prompt and "7.3" in prompt
+    assert "AQI" not in build_enhanced_prompt("Tokyo", 20.0, "晴れ", "", "zh")
+    _, user = build_compact_prompt("Tokyo", 20.0, "晴れ", "", "en", uvi=3.0)
+    assert user.endswith("| UV 3.0")
+
+
+def test_observe_returns_a_copy_and_does_not_hold_exit(stub, monkeypatch):
+    # 天气结果被并发调用共享（SingleFlight），环境数据写在副本上
+    shared = Observation("Tokyo", 20.0, "晴れ", lat=35.68, lon=139.69)
+    monkeypatch.setattr(environment, "get_observation", lambda city, api_key, units="metric": shared)
+    obs = observe("Tokyo", "stub-key")
+    assert obs is not shared and obs.aqi is not None
+    assert shared.aqi is None and shared.uvi is None
+
+    # 后台未完成的环境请求不会拖住解释器退出
+    code = "from weather_advisor import environment; import time; environment._spawn(time.sleep, 5)"
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, timeout=30)
+    assert time.perf_counter() - start < 4
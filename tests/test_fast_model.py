@@ -0,0 +1,62 @@
+import sys
+import os
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.clock import clock_for
+from weather_advisor import fast_model
+from weather_advisor.fast_model import FastModel
+from weather_advisor.history import HistoryEntry, HistoryStore
+
+
+def entry(city, temp, desc, suggestion, mode="ollama", ts=1_700_000_000.0):
+    return HistoryEntry(ts, city, temp, desc, "ja", mode, suggestion)
+
+
+def test_nearest_suggestions_by_weather():
+    model = FastModel("ja", seed=1)
+    model.add(entry("Tokyo", 21.0, "晴れ", "薄手のシャツで爽やかに"))
+    model.add(entry("Osaka", 20.0, "晴れ", "軽いカーディガンを一枚"))
+    model.add(entry("Tokyo", 20.5, "小雨", "撥水ジャケットと傘を"))
+    model.add(entry("Sapporo", 2.0, "雪", "ダウンと手袋を"))
+    clock = clock_for(14, 10)
+
+    dry = {model.suggest("Tokyo", 20.8, "快晴", clock) for _ in range(50)}
+    assert dry == {"薄手のシャツで爽やかに", "軽いカーディガンを一枚"}
+    assert model.suggest("Kyoto", 19.0, "雨", clock) == "撥水ジャケットと傘を"
+    # 温差过大或降雨状态不同的记录不会被使用
+    assert model.suggest("Tokyo", 30.0, "晴れ", clock) is None
+    assert model.suggest("Sapporo", 2.0, "小雨", clock) is None
+
+
+def test_loads_only_llm_history(tmp_path):
+    store = HistoryStore(str(tmp_path / "h.db"), flush_interval=0.01)
+    store.record(entry("Tokyo", 15.0, "曇り", "ollama のおすすめ", ts=1.0))
+    store.record(entry("Tokyo", 15.0, "曇り", "規則のおすすめ", mode="rules", ts=2.0))
+    store.record(entry("Tokyo", 15.0, "曇り", "fast のおすすめ", mode="fast", ts=3.0))
+    store.flush()
+
+    model = FastModel("ja", store)
+    assert model.suggest("Tokyo", 15.0, "曇り", clock_for(9, 4)) == "ollama のおすすめ"
+    assert model.size == 1
+
+    store.record(entry("Tokyo", 15.5, "曇り", "openai のおすすめ", mode="openai", ts=4.0))
+    store.flush()
+    model.refresh(force=True)
+    assert model.size == 2
+    store.close()
+
+
+def test_candidate_limit_keeps_newest_across_buckets(monkeypatch):
+    monkeypatch.setattr(fast_model, "MAX_CANDIDATES", 3)
+    model = FastModel("ja", seed=1)
+    # 较暖的桶中是旧记录，最冷的桶中是最新的记录
+    for i in range(3):
+        model.add(entry("Tokyo", 15.0, "曇り", f"古いおすすめ{i}", ts=100.0 + i))
+    model.add(entry("Tokyo", 11.5, "曇り", "最新のおすすめ", ts=200.0))
+    model.add(entry("Tokyo", 15.2, "曇り", "途中のおすすめ", ts=150.0))
+    model.add(entry("Tokyo", 15.1, "曇り", "乱序のおすすめ", ts=120.0))
+
+    candidates = model._candidates(0, 13.0)
+    assert [doc.suggestion for doc in candidates] == ["最新のおすすめ", "途中のおすすめ", "乱序のおすすめ"]
@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from weather_advisor import environment, geocode
+from weather_advisor.advisor import get_observation
+from weather_advisor.geocode import (
+    GeocodeIndex,
+    Place,
+    geocode_key,
+    get_geocode_index,
+    resolve_places,
+    write_index,
+)
+
+
+def test_index_round_trip(tmp_path):
+    places = {f"city{i}": Place(f"City{i}", "JP", i / 100, -i / 100) for i in range(5000)}
+    places[geocode_key("Tokyo")] = Place("Tokyo", "JP", 35.6895, 139.6917)
+    places[geocode_key("São Paulo")] = Place("São Paulo", "BR", -23.55, -46.63)
+    path = str(tmp_path / "geo.idx")
+    write_index(path, places)
+
+    index = GeocodeIndex(path)
+    assert len(index) == 5002
+    assert index.lookup("city1234") == Place("City1234", "JP", 12.34, -12.34)
+    # 不区分大小写，常用别名先做映射
+    assert index.lookup("  TOKYO ").name == "Tokyo"
+    assert index.lookup("东京").lat == 35.6895
+    assert index.lookup("são paulo").country == "BR"
+    assert index.lookup("Atlantis") is None
+    assert dict(index.items()) == places
+    index.close()
+
+
+def test_shared_index_reloads_when_replaced(tmp_path, capsys):
+    path = str(tmp_path / "geo.idx")
+    assert get_geocode_index(path) is None
+    write_index(path, {"osaka": Place("Osaka", "JP", 34.69, 135.50)})
+    assert get_geocode_index(path).lookup("Osaka").lon == 135.50
+    write_index(path, {"kyoto": Place("Kyoto", "JP", 35.01, 135.77)})
+    assert get_geocode_index(path).lookup("Osaka") is None
+
+    bad = tmp_path / "bad.idx"
+    bad.write_bytes(b"not an index")
+    assert get_geocode_index(str(bad)) is None
+    assert "地理编码索引" in capsys.readouterr().err
+
+
+def test_resolve_and_query_by_coordinates(stub, tmp_path, monkeypatch):
+    places, failed = resolve_places(
+        ["Tokyo", "大阪", "Sydney", "Atlantis", "tokyo"], "stub-key", workers=4, rate_per_minute=6000
+    )
+    assert failed == ["Atlantis"]
+    # 同一名称只请求一次，标准名称也加入索引
+    assert stub.request_counts["/geo/1.0/direct"] == 4
+    assert places["osaka"].country == "JP" and places["sydney"].lat < 0
+
+    # 别名指向东京的坐标：只有按坐标查询天气才能成功
+    places["edo"] = places["tokyo"]
+    path = str(tmp_path / "geo.idx")
+    write_index(path, places)
+    monkeypatch.setattr(geocode, "GEOCODE_PATH", path)
+    obs = get_observation("Edo", "stub-key")
+    assert obs.city == "Edo" and obs.timezone == 32400
+    assert environment.known_coords("Edo") == (places["tokyo"].lat, places["tokyo"].lon)
+
+
+def test_refresh_keeps_existing_cities(stub, tmp_path, monkeypatch):
+    path = str(tmp_path / "geo.idx")
+    write_index(path, {
+        "sydney": Place("Sydney", "AU", 0.0, 0.0),
+        "atlantis": Place("Atlantis", "XX", 1.0, 1.0),
+    })
+    monkeypatch.setenv("OPENWEATHER_API_KEY", "stub-key")
+    monkeypatch.setattr(sys, "argv", ["geocode", "Tokyo", "--refresh", "-o", path, "--rate", "6000"])
+    geocode.main()
+
+    index = GeocodeIndex(path)
+    # 未在本次指定的城市也重新解析；解析失败的保留旧结果
+    assert index.lookup("Sydney").lat < 0
+    assert index.lookup("Tokyo").country == "JP"
+    assert index.lookup("Atlantis").country == "XX"
+    index.close()
+
+
+def test_worker_count_does_not_raise_burst(stub):
+    start = time.monotonic()
+    resolve_places(["Tokyo", "Osaka", "Sydney", "London"], "stub-key", workers=16, rate_per_minute=600)
+    # 每秒 10 个令牌、突发量 1：4 个请求至少需要 0.3 秒
+    assert time.monotonic() - start >= 0.28
@@ -0,0 +1,52 @@
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.history import HistoryEntry, HistoryStore
+
+
+def test_batched_writes_and_range_query(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval=0.05)
+    now = time.time()
+    for i in range(500):
+        city = "Osaka" if i % 2 else "Tokyo"
+        store.record(HistoryEntry(now - i * 60, city, 20.0, "晴れ", "ja", "rules", f"s{i}"))
+    store.flush()
+
+    recent = store.query("osaka", since=now - 3600)
+    assert len(recent) == 30
+    assert all(e.city == "Osaka" for e in recent)
+    assert recent[0].ts > recent[-1].ts
+    store.close()
+
+
+def test_iter_suggestions_pages_through_equal_timestamps(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval=0.05)
+    for i in range(7):
+        # 每两条共用一个时间戳，分页边界落在相同时间戳之间
+        store.record(HistoryEntry(100.0 + i // 2, "Tokyo", 20.0, "晴れ", "ja", "ollama", f"s{i}"))
+    store.record(HistoryEntry(101.0, "Tokyo", 20.0, "晴れ", "ja", "rules", "rules"))
+    store.flush()
+
+    entries = list(store.iter_suggestions("ja", ["ollama"], after=100.0, page_size=3))
+    assert [e.suggestion for e in entries] == ["s2", "s3", "s4", "s5", "s6"]
+    store.close()
+
+
+def test_unavailable_database_is_lazy_and_warns_once(tmp_path, capsys):
+    path = tmp_path / "missing" / "history.db"
+    store = HistoryStore(str(path), flush_interval=0.05)
+    # 创建时不访问文件系统
+    assert not path.parent.exists()
+    for i in range(3):
+        store.record(HistoryEntry(100.0 + i, "Tokyo", 20.0, "晴れ", "ja", "rules", "s"))
+    store.flush()
+    assert store.query("Tokyo") == []
+    assert list(store.iter_suggestions("ja", ["ollama"])) == []
+    store.close()
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert captured.err.count("历史记录数据库不可用") == 1
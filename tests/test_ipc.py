@@ -0,0 +1,99 @@
+import sys
+import os
+import threading
+import time
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from weather_advisor import ipc
+from weather_advisor.ipc import AdvisorServer, run_via_daemon, stdout_to_stderr
+
+release = threading.Event()
+
+
+def fake_runner(argv):
+    if "--fail" in argv:
+        sys.exit(2)
+    if "--slow" in argv:
+        print("slow start")
+        # 请求执行期间后台线程的输出不应进入任何请求
+        threading.Thread(target=lambda: print("background", file=sys.stderr)).start()
+        release.wait(5)
+    if "--json" in argv:
+        with stdout_to_stderr():
+            print("progress")
+        sys.stdout.write("{}\n")
+        return None
+    print("advice for " + " ".join(argv))
+    print("warning", file=sys.stderr)
+    return None
+
+
+@pytest.fixture
+def server(tmp_path):
+    srv = AdvisorServer(fake_runner, str(tmp_path / "wa.sock"))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_forwards_argv_and_output(server, capsys):
+    assert run_via_daemon(["--city", "Tokyo"], server.path) == 0
+    out, err = capsys.readouterr()
+    assert out == "advice for --city Tokyo\n"
+    assert err == "warning\n"
+    assert run_via_daemon(["--fail"], server.path) == 2
+
+
+def test_falls_back_to_local_execution(server, tmp_path, monkeypatch):
+    assert run_via_daemon(["--city", "Tokyo"], str(tmp_path / "missing.sock")) is None
+    assert run_via_daemon(["--input-jsonl"], server.path) is None
+    assert run_via_daemon(["--no-daemon"], server.path) is None
+    # --flag=值 和 argparse 的前缀缩写同样在本进程执行
+    assert run_via_daemon(["--profile=out"], server.path) is None
+    assert run_via_daemon(["--city", "Tokyo", "--prof", "out"], server.path) is None
+    assert run_via_daemon(["--input", "--output-jsonl"], server.path) is None
+    # 环境变量与常驻进程不一致时由客户端自行执行
+    monkeypatch.setenv("WEATHER_ADVISOR_HISTORY", str(tmp_path / "daemon.db"))
+    response = server.execute({"argv": [], "env": {"WEATHER_ADVISOR_HISTORY": "other.db"}})
+    assert "fallback" in response
+
+
+def test_replaces_stale_socket(tmp_path, server):
+    with pytest.raises(OSError):
+        AdvisorServer(fake_runner, server.path)
+    stale = tmp_path / "stale.sock"
+    stale.write_bytes(b"")
+    srv = AdvisorServer(fake_runner, str(stale))
+    assert oct(os.stat(stale).st_mode & 0o777) == oct(0o600)
+    srv.server_close()
+    assert not stale.exists()
+
+
+def test_requests_run_concurrently_with_separate_output(server):
+    release.clear()
+    slow = {}
+    thread = threading.Thread(target=lambda: slow.update(server.execute({"argv": ["--slow"]})))
+    thread.start()
+    time.sleep(0.1)
+    # 慢请求执行中，其他请求不需要等待，输出也不会混在一起
+    fast = server.execute({"argv": ["--json"]})
+    assert fast == {"stdout": "{}\n", "stderr": "progress\n", "code": 0}
+    release.set()
+    thread.join()
+    assert slow["stdout"] == "slow start\nadvice for --slow\n"
+    assert "background" not in slow["stderr"]
+
+
+def test_client_falls_back_when_daemon_does_not_answer(server, monkeypatch):
+    release.clear()
+    monkeypatch.setattr(ipc, "DAEMON_TIMEOUT", 0.2)
+    start = time.perf_counter()
+    assert run_via_daemon(["--slow"], server.path) is None
+    assert time.perf_counter() - start < 1.0
+    release.set()
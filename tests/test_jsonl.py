@@ -0,0 +1,87 @@
+import sys
+import os
+import io
+import json
+import subprocess
+
+import pytest
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import main
+
+pytestmark = pytest.mark.stub_config(gen_latency=0.0)
+
+
+def run_cli(stub, tmp_path, lines, *args, api_key="stub-key"):
+    env = dict(os.environ, **stub.env())
+    env.update(
+        HOME=str(tmp_path),
+        WEATHER_ADVISOR_HISTORY=str(tmp_path / "history.db"),
+        WEATHER_ADVISOR_NO_DAEMON="1",
+        OPENWEATHER_API_KEY=api_key,
+    )
+    return subprocess.run(
+        [sys.executable, "main.py", "--input-jsonl", "--output-jsonl", *args],
+        input="".join(line + "\n" for line in lines),
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+
+
+def test_iter_jsonl_records_reports_malformed_lines():
+    stream = io.StringIO('{"city": "Tokyo"}\n\n{oops\n"Osaka"\n[1, 2]\n')
+    records = list(main.iter_jsonl_records(stream))
+    assert records[0] == {"city": "Tokyo"}
+    assert records[1]["error"].startswith("line 3: invalid JSON")
+    assert records[2] == {"city": "Osaka"}
+    assert records[3] == {"error": "line 5: record must be an object"}
+
+
+def test_stdout_carries_one_json_object_per_record(stub, tmp_path):
+    lines = [
+        '{"city": "Tokyo"}',
+        "{oops",
+        '{"city": "Osaka", "temp": 30, "desc": "晴れ"}',
+        '{"city": "Nagoya", "temp": "hot", "desc": "晴れ"}',
+    ]
+    result = run_cli(stub, tmp_path, lines, "--ai-mode", "ollama")
+    assert result.returncode == 0
+    # 加载提示等信息全部写到 stderr，stdout 每行都是 JSON
+    results = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(results) == 4
+    assert results[0]["city"] == "Tokyo" and results[0]["ai_mode"] == "ollama"
+    assert results[1]["error"].startswith("line 2: invalid JSON")
+    assert results[2]["temp"] == 30 and results[2]["suggestion"]
+    assert results[3]["error"].startswith("invalid observation")
+    assert stub.request_counts["/data/2.5/weather"] == 1
+
+
+def test_bad_field_types_only_fail_their_own_record(stub, tmp_path):
+    lines = [
+        '{"city": "Tokyo", "langs": 5}',
+        '{"city": "Osaka", "temp": 12, "desc": 5}',
+        '{"city": 7}',
+        '{"city": "Kyoto", "temp": 1e999, "desc": "晴れ"}',
+        '{"city": "Nagoya", "temp": 20, "desc": "晴れ", "ai_mode": ["x"]}',
+        '{"city": "Sapporo", "temp": 5, "desc": "雪"}',
+    ]
+    result = run_cli(stub, tmp_path, lines, "--ai-mode", "off")
+    assert result.returncode == 0
+    results = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(results) == 6
+    assert [("error" in item) for item in results] == [True] * 5 + [False]
+    assert "语言" in results[0]["error"]
+    assert results[1]["error"].startswith("invalid observation")
+    assert "city" in results[2]["error"]
+    assert results[3]["error"].startswith("invalid observation")
+    assert "ai_mode" in results[4]["error"]
+    assert results[5]["city"] == "Sapporo" and results[5]["suggestion"]
+
+
+def test_records_without_api_key_report_errors(stub, tmp_path):
+    result = run_cli(stub, tmp_path, ['{"city": "Tokyo"}'], "--ai-mode", "off", api_key="")
+    assert [json.loads(line) for line in result.stdout.splitlines()] == [
+        {"city": "Tokyo", "error": "OPENWEATHER_API_KEY not set"}
+    ]
@@ -0,0 +1,71 @@
+import sys
+import os
+
+import pytest
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import main
+from weather_advisor.ai_suggester import parse_multilang_response
+from weather_advisor.change_detect import generate_advice_langs
+from weather_advisor.records import Observation
+
+
+def test_parse_langs_and_response():
+    assert main.parse_langs("all") == ["ja", "zh", "en"]
+    assert main.parse_langs("en, ja,en") == ["en", "ja"]
+    assert main.parse_langs(["zh"]) == ["zh"]
+    with pytest.raises(ValueError):
+        main.parse_langs("ja,fr")
+
+    raw = 'Here you go: {"ja": " 薄手のコート ", "zh": "", "en": 3}'
+    assert parse_multilang_response(raw, ["ja", "zh", "en"]) == {"ja": "薄手のコート"}
+    assert parse_multilang_response("not json", ["ja"]) == {}
+
+
+def test_all_languages_share_one_ai_request(stub):
+    config = {"history_enabled": False}
+    resolved = main.resolve_multilang_advice(
+        "Tokyo", 12.0, "小雨", ["ja", "zh", "en"], "ollama", config
+    )
+    assert stub.request_counts["/api/generate"] == 1
+    assert {lang: item[1] for lang, item in resolved.items()} == {
+        "ja": "ollama", "zh": "ollama", "en": "ollama",
+    }
+    assert resolved["en"][0].startswith("A light jacket")
+
+
+def test_missing_languages_fall_back_to_rules(stub):
+    obs = Observation(city="Tokyo", temp=12.0, desc="小雨")
+    # 单语言请求的响应不是 JSON：所有语言都回退到规则引擎，但仍只请求一次
+    stub.config.multilang = False
+    advice = generate_advice_langs(obs, ["ja", "en"], "ollama")
+    assert stub.request_counts["/api/generate"] == 1
+    assert [advice[lang]["mode"] for lang in ("ja", "en")] == ["rules", "rules"]
+    assert generate_advice_langs(obs, ["zh"], "off")["zh"]["mode"] == "rules"
+
+
+def test_history_lookup_uses_resolved_mode(stub, monkeypatch):
+    seen = []
+
+    def fake_history(city, temp, desc, lang, ai_mode, *args):
+        seen.append((lang, ai_mode))
+        return None
+
+    monkeypatch.setattr(main, "find_history_advice", fake_history)
+    resolved = main.resolve_multilang_advice("Tokyo", 12.0, "小雨", ["ja", "en"], "auto", {})
+    # auto 先解析为实际模式，再按该模式查找可复用的建议
+    assert seen == [("ja", "ollama"), ("en", "ollama")]
+    assert resolved["ja"][1] == "ollama"
+
+
+def test_single_language_display_probes_ai_once(stub, monkeypatch, capsys):
+    probes = []
+    monkeypatch.setattr(main, "detect_available_ai_mode", lambda: probes.append(1) or ("ollama", False))
+    main.show_city_advice("Tokyo", 12.0, "小雨", ["ja"], "auto", {"history_enabled": False})
+    # 检测不到 AI 时直接用传统模式，不再重复探测
+    assert probes == [1]
+    assert stub.request_counts.get("/api/generate", 0) == 0
+    assert "未检测到可用的AI服务" in capsys.readouterr().out
@@ -0,0 +1,97 @@
+import sys
+import os
+import gzip
+import threading
+import urllib.error
+import urllib.request
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.daemon import AdviceServer, WeatherDaemon
+from weather_advisor.output_cache import OutputCache, choose_encoding, make_rendered, not_modified
+from weather_advisor.records import Observation
+
+
+def test_conditional_requests_and_encoding_negotiation():
+    item = make_rendered(b"{}", "application/json", 1700000000.0)
+    assert item.etag.startswith('W/"')
+    assert not_modified(item, item.etag, None)
+    assert not_modified(item, f'"other", {item.etag[2:]}', None)
+    assert not not_modified(item, '"other"', item.last_modified)  # If-None-Match 优先
+    assert not_modified(item, None, item.last_modified)
+    assert not not_modified(item, None, "Tue, 14 Nov 2023 22:13:19 GMT")
+    assert not not_modified(item, None, "garbage")
+
+    available = {"gzip": b"..."}
+    assert choose_encoding("gzip, deflate", available) == "gzip"
+    assert choose_encoding("br;q=1.0, gzip;q=0", available) is None
+    assert choose_encoding("*", available) == "gzip"
+    assert choose_encoding(None, available) is None
+
+
+def test_cache_renders_once_and_precompresses_popular_entries():
+    renders = []
+    cache = OutputCache(max_entries=2, compress_after=2, min_size=10)
+
+    def render():
+        renders.append(1)
+        return b"x" * 100, "text/plain", 0.0
+
+    first = cache.get("a", render)
+    assert not first.encoded
+    assert cache.get("a", render) is first and len(renders) == 1
+    assert gzip.decompress(first.encoded["gzip"]) == first.body
+    cache.get("b", render)
+    cache.get("c", render)  # 超出容量，淘汰最久未使用的 a
+    cache.get("a", render)
+    assert len(renders) == 4 and len(cache) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_server_returns_304_and_gzip_for_repeated_requests():
+    now = [1000.0]
+    daemon = WeatherDaemon(
+        ["Tokyo"], "key", langs=["ja", "en"], seed=0,
+        fetch=lambda city, key: Observation(city, 18.0, "小雨", timezone=32400, lat=35.7),
+        clock=lambda: now[0],
+    )
+    now[0] += 10
+    assert daemon.run_pending() == 1
+    server = AdviceServer(daemon, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"{server.base_url}/advice?city=Tokyo&lang=en&format=text"
+    try:
+        with urllib.request.urlopen(url) as resp:
+            etag = resp.headers["ETag"]
+            body = resp.read()
+            assert resp.headers["Content-Type"].startswith("text/plain")
+            assert resp.headers.get("Content-Encoding") is None
+        assert "Tokyo" in body.decode("utf-8") and resp.headers["Last-Modified"]
+
+        request = urllib.request.Request(url, headers={"If-None-Match": etag})
+        try:
+            urllib.request.urlopen(request)
+            raise AssertionError("expected 304")
+        except urllib.error.HTTPError as e:
+            assert e.code == 304 and e.headers["ETag"] == etag
+
+        # 第二次请求后已预先压缩
+        request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+        with urllib.request.urlopen(request) as resp:
+            assert resp.headers["Content-Encoding"] == "gzip"
+            assert gzip.decompress(resp.read()) == body
+
+        json_url = f"{server.base_url}/advice?city=Tokyo&lang=ja"
+        with urllib.request.urlopen(json_url) as resp:
+            assert resp.headers["ETag"] != etag
+        try:
+            urllib.request.urlopen(json_url + "&format=xml")
+            raise AssertionError("expected 400")
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+    stats = daemon.status()["output_cache"]
+    assert stats["misses"] == 2 and stats["hits"] == 2 and stats["compressed"] == 1
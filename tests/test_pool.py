@@ -0,0 +1,67 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError
+
+import pytest
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import weather_advisor.pool as pool_module
+from weather_advisor.deadline import deadline_scope, remaining
+from weather_advisor.pool import AdvisorPool, PoolFullError
+
+
+def test_weather_calls_overlap(monkeypatch):
+    def fake_weather(city, api_key, units):
+        time.sleep(0.2)
+        return 20.0, city
+
+    monkeypatch.setattr(pool_module, "get_weather", fake_weather)
+    with AdvisorPool(api_key="k", io_workers=8) as pool:
+        start = time.monotonic()
+        futures = pool.map_weather([f"c{i}" for i in range(8)])
+        results = [f.result() for f in futures]
+    assert results == [(20.0, f"c{i}") for i in range(8)]
+    assert time.monotonic() - start < 0.6
+
+
+def test_timeout_and_cancel(monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(pool_module, "get_weather", lambda *a: gate.wait(2))
+    with AdvisorPool(api_key="k", io_workers=1) as pool:
+        slow = pool.submit_weather("a", timeout=0.05)
+        queued = pool.submit_weather("b")
+        with pytest.raises(TimeoutError):
+            slow.result()
+        assert queued.cancel()
+        with pytest.raises(CancelledError):
+            queued.result()
+        gate.set()
+
+
+def test_bounded_queue(monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(pool_module, "get_weather", lambda *a: gate.wait(2))
+    with AdvisorPool(api_key="k", io_workers=1, max_pending=2) as pool:
+        pool.submit_weather("a")
+        pool.submit_weather("b")
+        with pytest.raises(PoolFullError):
+            pool.submit_weather("c", block=False)
+        gate.set()
+
+
+def test_timeout_applies_inside_the_task(monkeypatch):
+    seen = []
+    monkeypatch.setattr(pool_module, "get_weather", lambda *a: seen.append(remaining()))
+    with AdvisorPool(api_key="k", io_workers=1) as pool:
+        pool.submit_weather("a", timeout=0.5).result()
+        # 请求的截止时间更早时以请求为准
+        with deadline_scope(0.2):
+            pool.submit_weather("b", timeout=5).result()
+        pool.submit_weather("c").result()
+    assert 0 < seen[0] <= 0.5
+    assert 0 < seen[1] <= 0.2
+    assert seen[2] is None
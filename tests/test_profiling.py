@@ -0,0 +1,84 @@
+import sys
+import os
+import pstats
+import threading
+import time
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.profiling import ProfileSession, RequestSampler, profile_call
+
+
+def wait_for_network():
+    time.sleep(0.1)  # 模拟阻塞在网络等待上
+    return "done"
+
+
+def test_session_writes_pstats_and_collapsed_stacks(tmp_path, capsys):
+    with ProfileSession(str(tmp_path), label="Tokyo / ja", interval=0.002) as session:
+        assert wait_for_network() == "done"
+    assert session.elapsed >= 0.1
+    pstats_path, collapsed_path, report_path = session.paths
+    assert all(os.path.exists(path) for path in session.paths)
+    assert "Tokyo_ja" in os.path.basename(pstats_path)
+
+    # 墙钟计时：sleep 的时间计入调用方
+    stats = pstats.Stats(pstats_path)
+    cumulative = {func[2]: row[3] for func, row in stats.stats.items()}
+    assert cumulative["wait_for_network"] >= 0.09
+
+    lines = open(collapsed_path, encoding="utf-8").read().splitlines()
+    leaf_counts = {}
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        leaf_counts[stack.split(";")[-1]] = leaf_counts.get(stack.split(";")[-1], 0) + int(count)
+    assert leaf_counts.get("test_profiling.py:wait_for_network", 0) >= 10
+    assert "🔬" in capsys.readouterr().err
+
+
+def test_request_sampler_bounds_profiled_requests(tmp_path):
+    calls = []
+    sampler = RequestSampler(str(tmp_path), rate=1.0, max_per_minute=2, seed=0)
+    runner = sampler.wrap(lambda argv: calls.append(argv) or 0)
+    assert [runner([str(i)]) for i in range(5)] == [0] * 5
+    assert len(calls) == 5
+    # 每分钟最多 2 次（令牌桶起始容量为 1）
+    assert sampler.profiled == 1
+    assert len(list(tmp_path.glob("*.pstats"))) == 1
+
+    never = RequestSampler(str(tmp_path / "none"), rate=0.0)
+    assert never.wrap(lambda: "ok")() == "ok"
+    assert not (tmp_path / "none").exists()
+    assert profile_call(str(tmp_path), sum, [1, 2], label="x") == 3
+
+
+def test_concurrent_sessions_do_not_collide(tmp_path):
+    errors = []
+
+    def profiled():
+        try:
+            profile_call(str(tmp_path), wait_for_network, label="t")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=profiled) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 依次分析，不会出现 “Another profiling tool is already active”
+    assert errors == []
+    assert len(list(tmp_path.glob("*.pstats"))) == 3
+
+    gate = threading.Event()
+    sampler = RequestSampler(str(tmp_path / "busy"), rate=1.0, max_per_minute=600)
+    runner = sampler.wrap(lambda: gate.wait(1))
+    first = threading.Thread(target=runner)
+    first.start()
+    time.sleep(0.15)  # 令牌已补充，只因已有分析而跳过
+    # 已有请求在分析中：并发的请求直接执行
+    assert sampler.wrap(lambda: "ok")() == "ok"
+    assert sampler.profiled == 1
+    gate.set()
+    first.join()
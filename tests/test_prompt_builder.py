@@ -0,0 +1,41 @@
+import sys
+import os
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.ai_suggester import build_enhanced_prompt
+from weather_advisor.clock import clock_for
+from weather_advisor.prompt_builder import build_prompt_parts, compile_prompt
+
+
+def test_static_prefix_and_variable_suffix():
+    clock = clock_for(8, 1)
+    tokyo = build_prompt_parts("Tokyo", 3.5, "雪", "朝は冷えます", "ja", clock)
+    berlin = build_prompt_parts("Berlin", 20, "晴れ 100%", "", "ja", clock)
+    assert tokyo.prefix == berlin.prefix
+    assert tokyo.text == tokyo.prefix + tokyo.suffix
+    assert "Tokyo is known for high humidity area" in tokyo.suffix
+    assert "- 気温：3.5℃" in tokyo.suffix
+    assert "Note:" not in berlin.suffix and "晴れ 100%" in berlin.suffix
+    assert f"- 時間帯：{clock.period}（朝は冷えます）" in tokyo.suffix
+
+
+def test_memo_and_language_fallback():
+    clock = clock_for(20, 7)
+    first = build_prompt_parts("Osaka", 28.0, "clear sky", "hot night", "en", clock)
+    assert build_prompt_parts("Osaka", 28.0, "clear sky", "hot night", "en", clock) is first
+    assert first.suffix.startswith("Current Context:")
+    assert (
+        build_enhanced_prompt("Osaka", 28.0, "clear sky", "x", "fr", clock)
+        == build_enhanced_prompt("Osaka", 28.0, "clear sky", "x", "ja", clock)
+    )
+
+
+def test_int_and_float_temperatures_render_the_same():
+    # 20 == 20.0 共用缓存键，先调用哪一个都不能改变输出
+    compile_prompt.cache_clear()
+    as_int = compile_prompt("Kobe", 20, "晴れ", "", "ja", "morning", "autumn")
+    as_float = compile_prompt("Kobe", 20.0, "晴れ", "", "ja", "morning", "autumn")
+    assert as_int is as_float and "- 気温：20.0℃" in as_int.suffix
+    assert build_prompt_parts("Kobe", 21, "晴れ", "", "ja", clock_for(8, 10)).suffix.count("21.0℃") == 1
@@ -0,0 +1,36 @@
+import sys
+import os
+import io
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.records import Advice, Observation, iter_csv_observations
+
+
+def test_from_payload_keeps_needed_fields():
+    payload = {
+        "coord": {"lon": 151.2, "lat": -33.9},
+        "weather": [{"description": "clear sky"}],
+        "main": {"temp": 25.1, "humidity": 40},
+        "wind": {"speed": 4.2},
+        "timezone": 36000,
+        "name": "Sydney",
+    }
+    obs = Observation.from_payload(payload)
+    assert obs == Observation("Sydney", 25.1, "clear sky", 36000, -33.9, 151.2, 40, 4.2)
+    assert not hasattr(obs, "__dict__")
+
+
+def test_csv_bulk_constructor_skips_bad_rows():
+    data = "desc,city,temp,lat\n晴れ,Tokyo,21,35.7\n雨,Osaka,bad,\n雪,Sapporo,-3,\n"
+    observations = list(iter_csv_observations(io.StringIO(data)))
+    assert [o.city for o in observations] == ["Tokyo", "Sapporo"]
+    assert observations[0].lat == 35.7
+    assert observations[1].lat is None
+
+
+def test_advice_to_dict_omits_empty_error():
+    advice = Advice("Tokyo", "en", 20.0, "clear", "😌", "☀️", "tee", "rules")
+    assert "ai_error" not in advice.to_dict()
+    assert advice.to_json().startswith('{"city":"Tokyo"')
@@ -0,0 +1,92 @@
+import sys
+import os
+import math
+import random
+import time
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.clock import clock_for
+from weather_advisor.history import HistoryEntry, HistoryStore
+from weather_advisor.similarity import KDTree, SimilarityIndex, reuse_modes
+
+CLOCK = clock_for(14, 10)
+
+
+def entry(city, temp, desc, suggestion, humidity=70.0, wind=2.0, mode="ollama", ts=None):
+    return HistoryEntry(
+        ts or time.time(), city, temp, desc, "ja", mode, suggestion,
+        humidity, wind, CLOCK.period, CLOCK.season,
+    )
+
+
+def test_kdtree_matches_brute_force():
+    rng = random.Random(7)
+    points = [(rng.uniform(0, 30), rng.uniform(0, 5), rng.uniform(0, 4)) for _ in range(500)]
+    tree = KDTree([(p, i) for i, p in enumerate(points)])
+    for _ in range(200):
+        q = (rng.uniform(0, 30), rng.uniform(0, 5), rng.uniform(0, 4))
+        expected = min(range(len(points)), key=lambda i: math.dist(points[i], q))
+        payload, distance = tree.nearest(q)
+        assert payload == expected
+        assert math.isclose(distance, math.dist(points[expected], q))
+    assert tree.nearest((100.0, 100.0, 100.0), max_distance=1.0) == (None, math.inf)
+
+
+def test_reuses_advice_for_similar_conditions():
+    index = SimilarityIndex("ja")
+    index.note(entry("Osaka", 21.3, "小雨", "折りたたみ傘と薄手のジャケット"))
+    index.note(entry("Osaka", 21.0, "晴れ", "半袖で十分"))
+
+    hit = index.nearest("Osaka", 21.6, "弱い雨", 72.0, 2.5, CLOCK)
+    assert hit is not None and hit.suggestion == "折りたたみ傘と薄手のジャケット"
+    # 温差过大、降雨状态不同、时间段不同、其他城市都不复用
+    assert index.nearest("Osaka", 26.0, "小雨", 70.0, 2.0, CLOCK) is None
+    assert index.nearest("Osaka", 21.3, "雪", 70.0, 2.0, CLOCK) is None
+    assert index.nearest("Osaka", 21.3, "小雨", 70.0, 2.0, clock_for(22, 10)) is None
+    assert index.nearest("Tokyo", 21.3, "小雨", 70.0, 2.0, CLOCK) is None
+
+
+def test_ignores_rules_and_expired_entries():
+    index = SimilarityIndex("ja", max_age=3600)
+    index.note(entry("Tokyo", 15.0, "曇り", "規則のおすすめ", mode="rules"))
+    index.note(entry("Tokyo", 15.0, "曇り", "古いおすすめ", ts=time.time() - 7200))
+    assert index.nearest("Tokyo", 15.0, "曇り", 70.0, 2.0, CLOCK) is None
+
+
+def test_only_reuses_advice_from_the_requested_model():
+    index = SimilarityIndex("ja")
+    index.note(entry("Tokyo", 15.0, "曇り", "ローカルのおすすめ", mode="local"))
+    assert reuse_modes("openai") == ("openai",) and reuse_modes("fast") == ()
+    assert index.nearest("Tokyo", 15.0, "曇り", 70.0, 2.0, CLOCK, modes=reuse_modes("openai")) is None
+    hit = index.nearest("Tokyo", 15.0, "曇り", 70.0, 2.0, CLOCK, modes=reuse_modes("ollama"))
+    assert hit is not None and hit.mode == "local"
+
+
+def test_refresh_skips_noted_entries(tmp_path):
+    store = HistoryStore(str(tmp_path / "h.db"), flush_interval=0.01)
+    index = SimilarityIndex("ja", store)
+    index.refresh(force=True)
+
+    noted = entry("Tokyo", 15.0, "曇り", "本プロセスのおすすめ")
+    store.record(noted)
+    index.note(noted)
+    store.record(entry("Kyoto", 10.0, "晴れ", "他プロセスのおすすめ"))
+    store.flush()
+    index.refresh(force=True)
+
+    assert index.size == 2
+    hit = index.nearest("Kyoto", 10.2, "晴れ", 70.0, 2.0, CLOCK)
+    assert hit is not None and hit.suggestion == "他プロセスのおすすめ"
+
+
+def test_refresh_prunes_expired_entries():
+    index = SimilarityIndex("ja", max_age=3600)
+    index.note(entry("Tokyo", 15.0, "曇り", "新しいおすすめ"))
+    for i in range(40):
+        index.note(entry("Osaka", 10.0 + i * 0.1, "晴れ", f"古いおすすめ{i}", ts=time.time() - 7200))
+    assert index.size == 41
+    index.refresh(force=True)
+    assert index.size == 1 and len(index._partitions) == 1
+    assert index.nearest("Tokyo", 15.0, "曇り", 70.0, 2.0, CLOCK) is not None
@@ -0,0 +1,32 @@
+import sys
+import os
+
+import pytest
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from weather_advisor.advisor import get_observation
+from weather_advisor.ai_suggester import call_ollama_gemma
+from weather_advisor.utils import get_city_by_ip
+
+pytestmark = pytest.mark.stub_config(gen_latency=0.0, ip_city="Osaka")
+
+
+def test_network_paths_use_stub(stub):
+    obs = get_observation("Sydney", "stub-key")
+    assert obs.city == "Sydney" and obs.lat < 0 and obs.timezone == 36000
+    assert call_ollama_gemma("hello")
+    assert get_city_by_ip() == "Osaka"
+    counts = stub.request_counts
+    assert counts["/data/2.5/weather"] == 1
+    assert counts["/api/generate"] == 1
+
+
+def test_injected_failures(stub):
+    stub.config.error_rate = 1.0
+    assert get_observation("Tokyo", "stub-key") is None
+    # 所有 IP 服务都失败时回退到默认城市
+    assert get_city_by_ip() == "Tokyo"
+    assert stub.request_counts["/ipinfo/city"] == 1
@@ -0,0 +1,67 @@
+import sys
+import os
+import threading
+import time
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_advisor.throttle import TokenBucket, SingleFlight
+
+
+def test_token_bucket_paces_callers():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        assert bucket.acquire()
+    # 第一个令牌立即可用，其余 5 个按 50/s 排队
+    assert time.monotonic() - start >= 0.09
+
+
+def test_token_bucket_timeout_does_not_consume():
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.acquire()
+    assert not bucket.acquire(timeout=0.01)
+    assert not bucket.acquire(timeout=0.01)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def slow_fetch(city):
+        calls.append(city)
+        gate.wait(1)
+        return city.upper()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("tokyo", slow_fetch, "tokyo")))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert calls == ["tokyo"]
+    assert results == ["TOKYO"] * 5
+
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    def boom():
+        raise ValueError("bad")
+
+    try:
+        flight.do("k", boom)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+    # 失败后 key 被释放，下一次调用重新执行
+    assert flight.do("k", lambda: 1) == 1
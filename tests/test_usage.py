@@ -0,0 +1,58 @@
+import sys
+import os
+from types import SimpleNamespace
+
+# 添加项目根目录到 Python 路径（解决模块导入问题）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import weather_advisor.ai_suggester as ai_suggester
+import weather_advisor.usage as usage_module
+from weather_advisor.ai_suggester import apply_budget, call_openai_api
+from weather_advisor.usage import Budget, CallUsage, UsageLedger
+
+
+class FakeClient:
+    created = 0
+
+    def __init__(self, api_key):
+        FakeClient.created += 1
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=40, completion_tokens=20),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=" 傘を持って "))],
+        )
+
+
+def test_ledger_totals_and_budget(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "h.db"))
+    ledger.record(CallUsage(1.0, "openai", "m", 100, 50, 0.5, 0.01))
+    ledger.record(CallUsage(2.0, "openai", "m", 10, 5, 0.1, 0.001))
+    totals = ledger.totals(mode="openai")
+    assert (totals.calls, totals.total_tokens) == (2, 165)
+    assert ledger.session.calls == 2
+
+    budget = Budget(max_tokens=100, period=1e12)
+    assert ledger.exceeded(budget) == "tokens"
+    assert ledger.exceeded(Budget(max_cost=1.0, period=1e12)) is None
+    assert ledger.exceeded(Budget()) is None
+
+
+def test_openai_client_reused_and_budget_downgrade(monkeypatch, tmp_path):
+    ledger = UsageLedger(str(tmp_path / "h.db"))
+    monkeypatch.setattr(usage_module, "_default_ledger", ledger)
+    monkeypatch.setattr(ai_suggester, "_openai_clients", {})
+    monkeypatch.setitem(sys.modules, "openai", SimpleNamespace(OpenAI=FakeClient))
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    FakeClient.created = 0
+
+    assert call_openai_api("prompt") == "傘を持って"
+    assert call_openai_api("prompt") == "傘を持って"
+    assert FakeClient.created == 1
+    assert ledger.totals(mode="openai").prompt_tokens == 80
+
+    config = {"openai_token_budget": 100, "openai_budget_fallback": "off"}
+    assert apply_budget("openai", config) == "off"
+    assert apply_budget("ollama", config) == "ollama"
+    assert apply_budget("openai", {"openai_token_budget": 1000}) == "openai"
@@ -0,0 +1,163 @@
+# weather_advisor/advice_table.py
+"""
+传统模式（规则引擎）的预计算查找表
+
+get_clothing_suggestion / get_comfort_level / get_weather_emoji / get_regional_advice
+的输出只取决于（温度区间, 是否下雨, 天气类别, 地域, 语言）这几个离散量。
+导入时枚举全部组合并调用原函数生成结果，运行时只需几次下标访问。
+"""
+import math
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from weather_advisor.advisor import CLOTHING_SUGGESTIONS, get_clothing_suggestion
+from weather_advisor.utils import (
+    REGIONAL_TIPS,
+    get_comfort_level,
+    get_regional_advice,
+    get_weather_emoji,
+)
+
+# 上述函数中出现的全部温度阈值（升序）
+# 区间编号：2i 表示 (P[i-1], P[i])，2i+1 表示恰好等于 P[i]
+TEMP_POINTS: Tuple[float, ...] = (5, 10, 12, 15, 18, 20, 22, 25, 28, 35)
+BAND_COUNT = 2 * len(TEMP_POINTS) + 1
+
+# 天气类别：与 get_weather_emoji 的判断顺序一致，最后一类表示未匹配
+WEATHER_CATEGORIES: Tuple[Tuple[str, ...], ...] = (
+    ("sunny", "晴", "clear"),
+    ("cloudy", "云", "曇"),
+    ("rain", "雨"),
+    ("snow", "雪"),
+    ("storm", "暴", "嵐"),
+    ("fog", "霧", "雾"),
+    ("wind", "风", "風"),
+)
+CATEGORY_COUNT = len(WEATHER_CATEGORIES) + 1
+
+# 每个类别的代表性描述，用于调用原函数生成表项
+_CATEGORY_SAMPLES = tuple(words[0] for words in WEATHER_CATEGORIES) + ("",)
+
+
+class RuleAdvice(NamedTuple):
+    """规则引擎对一次观测给出的全部结果"""
+
+    suggestion: str
+    comfort: str
+    emoji: str
+    regional: str
+
+
+def temp_band(temp: float) -> int:
+    """温度所在的区间编号"""
+    i = bisect_left(TEMP_POINTS, temp)
+    if i < len(TEMP_POINTS) and TEMP_POINTS[i] == temp:
+        return 2 * i + 1
+    return 2 * i
+
+
+def _band_temp(band: int) -> float:
+    """区间内的代表温度"""
+    i, exact = divmod(band, 2)
+    if exact:
+        return TEMP_POINTS[i]
+    if i == 0:
+        return TEMP_POINTS[0] - 1
+    if i == len(TEMP_POINTS):
+        return TEMP_POINTS[-1] + 1
+    return (TEMP_POINTS[i - 1] + TEMP_POINTS[i]) / 2
+
+
+@lru_cache(maxsize=1024)
+def weather_key(desc: str) -> int:
+    """天气描述 -> rain * CATEGORY_COUNT + 类别（rain 与 get_clothing_suggestion 的判断一致）"""
+    desc_lower = desc.lower()
+    rain = "rain" in desc_lower or "雨" in desc
+    for category, words in enumerate(WEATHER_CATEGORIES):
+        if any(word in desc_lower for word in words):
+            break
+    else:
+        category = CATEGORY_COUNT - 1
+    return rain * CATEGORY_COUNT + category
+
+
+@lru_cache(maxsize=1024)
+def region_index(city: str, lang: str) -> int:
+    """城市在该语言地域表中的下标，未匹配时为地域数"""
+    keys = list(REGIONAL_TIPS.get(lang, REGIONAL_TIPS["en"]))
+    city_lower = city.lower()
+    for i, key in enumerate(keys):
+        if key in city_lower:
+            return i
+    return len(keys)
+
+
+def build_lang_table(lang: str) -> List[List[RuleAdvice]]:
+    """
+    枚举一种语言的全部组合
+    返回 table[region][band * 2 * CATEGORY_COUNT + weather_key]
+    """
+    regions = list(REGIONAL_TIPS.get(lang, REGIONAL_TIPS["en"]))
+    # 未匹配地域时用一个不含任何地域关键字的城市名
+    region_cities = regions + [""]
+    table = []
+    for region_city in region_cities:
+        row = []
+        for band in range(BAND_COUNT):
+            temp = _band_temp(band)
+            regional = get_regional_advice(region_city, temp, lang)
+            for rain in (False, True):
+                for category in range(CATEGORY_COUNT):
+                    desc = _CATEGORY_SAMPLES[category]
+                    if rain and desc != "rain":
+                        desc = f"{desc} rain" if desc else "rain"
+                    row.append(
+                        RuleAdvice(
+                            suggestion=get_clothing_suggestion(temp, desc, lang),
+                            comfort=get_comfort_level(temp, desc, lang),
+                            emoji=get_weather_emoji(desc, temp),
+                            regional=regional,
+                        )
+                    )
+        table.append(row)
+    return table
+
+
+def build_advice_table() -> Dict[str, List[List[RuleAdvice]]]:
+    """为所有内置语言生成查找表"""
+    return {lang: build_lang_table(lang) for lang in CLOTHING_SUGGESTIONS}
+
+
+ADVICE_TABLE = build_advice_table()
+
+
+def lookup_advice(
+    city: str,
+    temp: float,
+    desc: str,
+    lang: str = "ja",
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> RuleAdvice:
+    """
+    查表得到规则引擎的结果；未内置的语言或 NaN 温度直接调用原函数
+    有实测空气质量 / 紫外线数据时，建议和地域提示按实测值重新生成（舒适度和 emoji 仍查表）
+    """
+    table = ADVICE_TABLE.get(lang)
+    if table is None or math.isnan(temp):
+        return RuleAdvice(
+            suggestion=get_clothing_suggestion(temp, desc, lang, aqi, uvi),
+            comfort=get_comfort_level(temp, desc, lang),
+            emoji=get_weather_emoji(desc, temp),
+            regional=get_regional_advice(city, temp, lang, aqi, uvi),
+        )
+    advice = table[region_index(city, lang)][
+        temp_band(temp) * 2 * CATEGORY_COUNT + weather_key(desc)
+    ]
+    if aqi is None and uvi is None:
+        return advice
+    return advice._replace(
+        suggestion=get_clothing_suggestion(temp, desc, lang, aqi, uvi),
+        regional=get_regional_advice(city, temp, lang, aqi, uvi),
+    )
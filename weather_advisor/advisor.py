@@ -1,75 +1,127 @@
 # weather_advisor/advisor.py
+import os
 import requests
 from typing import Tuple, Optional
+from weather_advisor.deadline import DeadlineExceeded, acquire_token, stage_timeout
+from weather_advisor.decoding import decode_weather
+from weather_advisor.geocode import lookup_place
+from weather_advisor.records import Observation
+from weather_advisor.throttle import TokenBucket, SingleFlight
+from weather_advisor.utils import air_level, uv_level
 
-def get_weather(city: str, api_key: str) -> Tuple[Optional[float], Optional[str]]:
+# OpenWeatherMap 免费版限制为 60 次/分钟，可通过环境变量调整
+_weather_limiter = TokenBucket.per_minute(int(os.getenv('OPENWEATHER_RATE_LIMIT', '60')))
+# 同一城市/单位的并发查询共享一次 HTTP 请求
+_weather_flight = SingleFlight()
+
+# 可通过 OPENWEATHER_BASE_URL 指向本地模拟服务器（压测用）
+DEFAULT_OPENWEATHER_BASE_URL = "http://api.openweathermap.org"
+
+
+def _fetch_weather(city: str, api_key: str, units: str) -> Observation:
+    """实际发起天气请求（已限流），异常交由调用方处理"""
+    base_url = os.getenv('OPENWEATHER_BASE_URL', DEFAULT_OPENWEATHER_BASE_URL)
+    url = f"{base_url.rstrip('/')}/data/2.5/weather"
+    # 预先解析过的城市按坐标查询（见 geocode.py），不经过名称解析
+    place = lookup_place(city)
+    location = {'lat': place.lat, 'lon': place.lon} if place else {'q': city}
+    params = {
+        **location,
+        'appid': api_key,
+        'units': units,  # 默认使用摄氏度
+        'lang': 'ja'  # 日语描述
+    }
+    
+    acquire_token(_weather_limiter)
+    response = requests.get(url, params=params, timeout=stage_timeout(10))
+    response.raise_for_status()
+    
+    # 只解码用到的字段
+    return decode_weather(response.content, city)
+
+def get_weather(city: str, api_key: str, units: str = 'metric') -> Tuple[Optional[float], Optional[str]]:
     """
     获取天气信息
     返回: (温度, 天气描述)
     """
+    obs = get_observation(city, api_key, units)
+    if obs is None:
+        return None, None
+    return obs.temp, obs.desc
+
+def get_observation(city: str, api_key: str, units: str = 'metric') -> Optional[Observation]:
+    """
+    获取完整的天气观测（含时区、坐标、湿度、风速）
+    失败时返回 None
+    """
     try:
-        url = f"http://api.openweathermap.org/data/2.5/weather"
-        params = {
-            'q': city,
-            'appid': api_key,
-            'units': 'metric',  # 使用摄氏度
-            'lang': 'ja'  # 日语描述
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        temp = data['main']['temp']
-        desc = data['weather'][0]['description']
-        
-        return temp, desc
+        return _weather_flight.do((city, units), _fetch_weather, city, api_key, units)
         
+    except DeadlineExceeded:
+        print("⏱️ 截止时间已到，跳过天气查询")
+        return None
     except requests.exceptions.RequestException as e:
         print(f"❌ 网络请求错误: {e}")
-        return None, None
+        return None
     except KeyError as e:
         print(f"❌ API响应格式错误: {e}")
-        return None, None
+        return None
     except Exception as e:
         print(f"❌ 获取天气数据失败: {e}")
-        return None, None
+        return None
 
-def get_clothing_suggestion(temp: float, desc: str, lang: str = 'ja') -> str:
+CLOTHING_SUGGESTIONS = {
+    'ja': {
+        'very_cold': 'ダウンジャケットやコート、手袋、マフラーをお忘れなく',
+        'cold': 'ジャケットやセーターで暖かく過ごしましょう',
+        'cool': '薄手のジャケットや長袖シャツがおすすめです',
+        'mild': '長袖シャツや軽いカーディガンが快適です',
+        'warm': '半袖シャツや薄手の服装で十分です',
+        'hot': '涼しい服装と日焼け対策をお忘れなく',
+        'rainy': '雨具をお持ちください',
+        'uv_high': '帽子とサングラスがあると安心です',
+        'uv_very_high': '薄手の長袖と帽子で紫外線を防ぎましょう',
+        'air_poor': 'マスクをお持ちください'
+    },
+    'zh': {
+        'very_cold': '建议穿羽绒服或大衣，别忘了手套和围巾',
+        'cold': '建议穿夹克或毛衣保暖',
+        'cool': '建议穿轻薄外套或长袖衬衫',
+        'mild': '长袖衬衫或轻薄开衫比较舒适',
+        'warm': '短袖衬衫或薄衣服就足够了',
+        'hot': '穿凉爽服装，注意防晒',
+        'rainy': '请携带雨具',
+        'uv_high': '建议戴帽子和太阳镜',
+        'uv_very_high': '建议穿薄长袖并戴帽子防晒',
+        'air_poor': '建议佩戴口罩'
+    },
+    'en': {
+        'very_cold': 'Wear a down jacket or coat, don\'t forget gloves and scarf',
+        'cold': 'A jacket or sweater will keep you warm',
+        'cool': 'A light jacket or long-sleeve shirt is recommended',
+        'mild': 'Long-sleeve shirt or light cardigan is comfortable',
+        'warm': 'Short-sleeve shirt or light clothing is sufficient',
+        'hot': 'Wear cool clothing and don\'t forget sun protection',
+        'rainy': 'Please bring rain gear',
+        'uv_high': 'A hat and sunglasses are a good idea',
+        'uv_very_high': 'Cover up with a light long-sleeve layer and a hat',
+        'air_poor': 'Bring a mask'
+    }
+}
+
+
+def get_clothing_suggestion(
+    temp: float,
+    desc: str,
+    lang: str = 'ja',
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> str:
     """
     根据温度和天气描述给出穿衣建议
+    aqi / uvi 为实测的空气质量等级和紫外线指数（可选）
     """
-    suggestions = {
-        'ja': {
-            'very_cold': 'ダウンジャケットやコート、手袋、マフラーをお忘れなく',
-            'cold': 'ジャケットやセーターで暖かく過ごしましょう',
-            'cool': '薄手のジャケットや長袖シャツがおすすめです',
-            'mild': '長袖シャツや軽いカーディガンが快適です',
-            'warm': '半袖シャツや薄手の服装で十分です',
-            'hot': '涼しい服装と日焼け対策をお忘れなく',
-            'rainy': '雨具をお持ちください'
-        },
-        'zh': {
-            'very_cold': '建议穿羽绒服或大衣，别忘了手套和围巾',
-            'cold': '建议穿夹克或毛衣保暖',
-            'cool': '建议穿轻薄外套或长袖衬衫',
-            'mild': '长袖衬衫或轻薄开衫比较舒适',
-            'warm': '短袖衬衫或薄衣服就足够了',
-            'hot': '穿凉爽服装，注意防晒',
-            'rainy': '请携带雨具'
-        },
-        'en': {
-            'very_cold': 'Wear a down jacket or coat, don\'t forget gloves and scarf',
-            'cold': 'A jacket or sweater will keep you warm',
-            'cool': 'A light jacket or long-sleeve shirt is recommended',
-            'mild': 'Long-sleeve shirt or light cardigan is comfortable',
-            'warm': 'Short-sleeve shirt or light clothing is sufficient',
-            'hot': 'Wear cool clothing and don\'t forget sun protection',
-            'rainy': 'Please bring rain gear'
-        }
-    }
-    
-    suggestion_set = suggestions.get(lang, suggestions['ja'])
+    suggestion_set = CLOTHING_SUGGESTIONS.get(lang, CLOTHING_SUGGESTIONS['ja'])
     
     # 温度分级判断
     if temp < 5:
@@ -88,5 +140,12 @@ def get_clothing_suggestion(temp: float, desc: str, lang: str = 'ja') -> str:
     # 天气特殊情况处理
     if 'rain' in desc.lower() or '雨' in desc:
         suggestion += f"。{suggestion_set['rainy']}"
+
+    # 实测紫外线和空气质量
+    uv = uv_level(uvi)
+    if uv:
+        suggestion += f"。{suggestion_set['uv_very_high' if uv == 2 else 'uv_high']}"
+    if air_level(aqi) == 2:
+        suggestion += f"。{suggestion_set['air_poor']}"
     
     return suggestion
\ No newline at end of file
@@ -2,112 +2,120 @@
 import argparse
 import os
 import json
-import datetime
-from typing import Optional
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+from weather_advisor.clock import ClockContext, current_clock
+from weather_advisor.config import get_config_store
+from weather_advisor.deadline import DeadlineExceeded, expired, stage_timeout
+from weather_advisor.decoding import decode_ollama_response
+from weather_advisor.fast_model import fast_suggestion
+from weather_advisor.prompt_builder import build_prompt_parts, regional_context
+from weather_advisor.usage import Budget, CallUsage, estimate_cost, get_usage_ledger
+from weather_advisor.utils import get_time_remark
+
+# 精简版提示词的固定指令部分（作为 system 消息，每次调用完全相同）
+COMPACT_SYSTEM_PROMPTS = {
+    "en": "You are a weather-aware stylist. Give ONE specific outfit tip under 25 words, "
+    "considering temperature, weather protection, time of day, season and local climate.",
+    "zh": "你是天气穿搭顾问。综合气温、天气防护、时间段、季节和地域气候，给出一条具体的穿衣建议，25字以内。",
+    "ja": "天候に詳しいスタイリストとして、気温・天候・時間帯・季節・地域の気候を踏まえた具体的な服装提案を1つ、25文字以内で答えてください。",
+}
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful and concise clothing advisor."
+
+# 一次请求生成多种语言的建议（结果为以语言代码为键的 JSON）
+MULTILANG_SYSTEM_PROMPT = (
+    "You are a weather-aware stylist. Give ONE specific outfit tip considering temperature, "
+    "weather protection, time of day, season and local climate, and write that same tip in "
+    "each of these languages: {names}. Keep each under 25 words (25 characters for Japanese "
+    "and Chinese). Reply with a JSON object only, keyed by language code: {example}"
+)
+LANG_NAMES = {"ja": "Japanese", "zh": "Simplified Chinese", "en": "English"}
 
 
 def build_enhanced_prompt(
-    city: str, temp: float, desc: str, time_remark: str, lang: str = "ja"
+    city: str,
+    temp: float,
+    desc: str,
+    time_remark: str,
+    lang: str = "ja",
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
 ) -> str:
     """
     构建增强版AI提示词，包含个性化信息
+    固定前缀 + 可变后缀，相同输入直接返回缓存结果（见 prompt_builder）
     """
-    current_hour = datetime.datetime.now().hour
-    month = datetime.datetime.now().month
-
-    # 确定时间段和季节
-    if 5 <= current_hour <= 11:
-        time_period = "morning"
-    elif 12 <= current_hour <= 17:
-        time_period = "afternoon"
-    elif 18 <= current_hour <= 23:
-        time_period = "evening"
-    else:
-        time_period = "night"
-
-    if month in [12, 1, 2]:
-        season = "winter"
-    elif month in [3, 4, 5]:
-        season = "spring"
-    elif month in [6, 7, 8]:
-        season = "summer"
-    else:
-        season = "autumn"
-
-    # 地域特色提示
-    regional_context = {
-        "tokyo": "high humidity area",
-        "osaka": "windy conditions common",
-        "kyoto": "temperature fluctuations due to basin location",
-        "london": "frequent light rain",
-        "paris": "cobblestone streets",
-        "new york": "windy between buildings",
-        "beijing": "dusty conditions and air quality concerns",
-        "shanghai": "high humidity and frequent rain",
-        "singapore": "extremely hot and humid year-round",
-    }
+    return build_prompt_parts(city, temp, desc, time_remark, lang, clock, aqi, uvi).text
 
-    region_hint = ""
-    for city_key, context in regional_context.items():
-        if city_key in city.lower():
-            region_hint = f" Note: {city} is known for {context}."
-            break
-
-    prompts = {
-        "en": f"""You are a professional styling consultant with expertise in weather-appropriate fashion. 
-
-Current Context:
-- Location: {city}{region_hint}
-- Temperature: {temp}℃
-- Weather: {desc}
-- Time: {time_period} ({time_remark})
-- Season: {season}
-
-Provide ONE concise, practical clothing recommendation that considers:
-1. Temperature comfort and layering
-2. Weather protection needs
-3. Time-appropriate styling
-4. Seasonal fashion trends
-5. Regional climate characteristics
-
-Response should be specific, actionable, and under 25 words.""",
-        "zh": f"""你是专业的时尚造型顾问，专门提供适合天气的穿搭建议。
-
-当前情况：
-- 地点：{city}{region_hint}
-- 气温：{temp}℃
-- 天气：{desc}
-- 时间：{time_period}（{time_remark}）
-- 季节：{season}
-
-请提供一条简洁实用的穿衣建议，需要考虑：
-1. 温度舒适性和层次搭配
-2. 天气防护需求
-3. 时间段合适性
-4. 季节时尚趋势
-5. 地域气候特点
-
-回答要具体、可行，控制在25字以内。""",
-        "ja": f"""あなたは天候に適したファッションの専門スタイリストです。
-
-現在の状況：
-- 場所：{city}{region_hint}
-- 気温：{temp}℃
-- 天気：{desc}
-- 時間帯：{time_period}（{time_remark}）
-- 季節：{season}
-
-以下を考慮した簡潔で実用的な服装提案を1つお願いします：
-1. 気温による快適性と重ね着
-2. 天候に対する防護
-3. 時間帯に適したスタイル
-4. 季節のトレンド
-5. 地域の気候特性
-
-25文字以内で、具体的で実行可能な提案をしてください。""",
-    }
 
-    return prompts.get(lang, prompts["ja"])
+def build_compact_prompt(
+    city: str,
+    temp: float,
+    desc: str,
+    time_remark: str,
+    lang: str = "ja",
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> Tuple[str, str]:
+    """
+    构建精简版提示词（按 token 计费的 OpenAI 使用）
+    返回: (system, user)。固定指令放在 system 中，user 只包含本次的天气信息
+    """
+    clock = clock or current_clock()
+    context = regional_context(city)
+    location = f"{city} ({context})" if context else city
+    user = f"{location} | {temp}℃ {desc} | {clock.period} ({time_remark}) | {clock.season}"
+    if aqi is not None:
+        user += f" | AQI {aqi}/5"
+    if uvi is not None:
+        user += f" | UV {round(uvi, 1)}"
+    return COMPACT_SYSTEM_PROMPTS.get(lang, COMPACT_SYSTEM_PROMPTS["ja"]), user
+
+
+def build_multilang_prompt(
+    city: str,
+    temp: float,
+    desc: str,
+    langs: Sequence[str],
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> Tuple[str, str]:
+    """
+    构建多语言提示词，返回: (system, user)
+    天气信息只写一次（英文），要求模型按语言代码返回 JSON
+    """
+    clock = clock or current_clock()
+    names = ", ".join(f"{lang} ({LANG_NAMES.get(lang, lang)})" for lang in langs)
+    example = json.dumps({lang: "..." for lang in langs})
+    _, user = build_compact_prompt(
+        city, temp, desc, get_time_remark("en", clock), "en", clock, aqi, uvi
+    )
+    return MULTILANG_SYSTEM_PROMPT.format(names=names, example=example), user
+
+
+def parse_multilang_response(raw: Optional[str], langs: Sequence[str]) -> Dict[str, str]:
+    """从模型输出中取出各语言的建议；格式不对或缺少的语言不包含在结果中"""
+    if not raw:
+        return {}
+    start, end = raw.find("{"), raw.rfind("}")
+    if start < 0 or end <= start:
+        return {}
+    try:
+        data = json.loads(raw[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {
+        lang: data[lang].strip()
+        for lang in langs
+        if isinstance(data.get(lang), str) and data[lang].strip()
+    }
 
 
 def build_prompt(
@@ -120,10 +128,22 @@ def build_prompt(
     return build_enhanced_prompt(city, temp, desc, time_remark, lang)
 
 
-def call_ollama_gemma(prompt: str) -> Optional[str]:
+def _ai_timeout(timeout: Optional[float]) -> float:
+    """AI 请求的超时：默认为配置的 ai_timeout，且不超过请求剩余的时间"""
+    if timeout is None:
+        timeout = get_config_store().current.get("ai_timeout", 30)
+    return stage_timeout(timeout)
+
+
+def call_ollama_gemma(
+    prompt: str, timeout: Optional[float] = None, json_mode: bool = False
+) -> Optional[str]:
     """
     调用 Ollama + Gemma 模型
+    json_mode 为 True 时要求模型输出 JSON（多语言建议）
+    请求截止时间已过时抛出 DeadlineExceeded
     """
+    timeout = _ai_timeout(timeout)
     try:
         import requests
         import json
@@ -147,17 +167,20 @@ def call_ollama_gemma(prompt: str) -> Optional[str]:
                 "stop": ["\n\n", "。。", ".."],  # 防止过长回答
             },
         }
+        if json_mode:
+            data["format"] = "json"
+            # JSON 中可能出现换行和连续标点，不使用停止词
+            del data["options"]["stop"]
 
         # 发送请求到 Ollama
         response = requests.post(
             f"{ollama_url}/api/generate",
             json=data,
-            timeout=30,  # 本地模型可能需要较长时间
+            timeout=timeout,  # 本地模型可能需要较长时间
         )
 
         if response.status_code == 200:
-            result = response.json()
-            suggestion = result.get("response", "").strip()
+            suggestion = decode_ollama_response(response.content).strip()
 
             if suggestion:
                 # 清理可能的格式问题
@@ -179,6 +202,8 @@ def call_ollama_gemma(prompt: str) -> Optional[str]:
         print(f"   下载模型: ollama pull {os.getenv('OLLAMA_MODEL', 'gemma:7b')}")
         return None
     except requests.exceptions.Timeout:
+        if expired():
+            raise DeadlineExceeded()
         print("❌ Ollama 请求超时，模型可能正在加载中...")
         return None
     except Exception as e:
@@ -186,32 +211,60 @@ def call_ollama_gemma(prompt: str) -> Optional[str]:
         return None
 
 
-def call_openai_api(prompt: str) -> Optional[str]:
+_openai_clients: Dict[str, Any] = {}
+_openai_lock = threading.Lock()
+
+
+def _get_openai_client(api_key: str):
+    """按 API 密钥复用 OpenAI 客户端（共享 HTTP 连接池）"""
+    client = _openai_clients.get(api_key)
+    if client is None:
+        import openai
+
+        with _openai_lock:
+            client = _openai_clients.get(api_key)
+            if client is None:
+                client = openai.OpenAI(api_key=api_key)
+                _openai_clients[api_key] = client
+    return client
+
+
+def call_openai_api(
+    prompt: str,
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+    timeout: Optional[float] = None,
+    max_tokens: int = 100,
+) -> Optional[str]:
     """
-    调用 OpenAI API
+    调用 OpenAI API，并记录 token 用量、估算费用和延迟
+    请求截止时间已过时抛出 DeadlineExceeded
     """
+    timeout = _ai_timeout(timeout)
     try:
-        import openai
-
         openai_api_key = os.getenv("OPENAI_API_KEY")
         if not openai_api_key:
             print("❌ 未找到 OpenAI API 密钥，请设置 OPENAI_API_KEY 环境变量")
             return None
 
-        client = openai.OpenAI(api_key=openai_api_key)
+        client = _get_openai_client(openai_api_key)
+        model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 
+        start = time.perf_counter()
         response = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+            model=model,
             messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful and concise clothing advisor.",
-                },
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt},
             ],
-            max_tokens=100,
+            max_tokens=max_tokens,
             temperature=0.7,
+            timeout=timeout,
         )
+        latency = time.perf_counter() - start
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            record_usage("openai", model, usage.prompt_tokens, usage.completion_tokens, latency)
 
         suggestion = response.choices[0].message.content.strip()
         return suggestion
@@ -220,10 +273,43 @@ def call_openai_api(prompt: str) -> Optional[str]:
         print("❌ 未安装 openai 库，请运行: pip install openai")
         return None
     except Exception as e:
+        if expired():
+            raise DeadlineExceeded() from e
         print(f"❌ OpenAI API 调用失败: {e}")
         return None
 
 
+def record_usage(
+    mode: str, model: str, prompt_tokens: int, completion_tokens: int, latency: float
+) -> None:
+    """把一次调用的用量写入账本"""
+    ledger = get_usage_ledger()
+    if ledger is None:
+        return
+    cost = estimate_cost(prompt_tokens, completion_tokens, get_config_store().current)
+    ledger.record(
+        CallUsage(time.time(), mode, model, prompt_tokens, completion_tokens, latency, cost)
+    )
+
+
+def apply_budget(ai_mode: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    OpenAI 预算用完时返回降级后的模式（ollama 或 off），否则原样返回
+    """
+    if ai_mode != "openai":
+        return ai_mode
+    budget = Budget.from_config(config or get_config_store().current)
+    if not budget.limited:
+        return ai_mode
+    ledger = get_usage_ledger()
+    exceeded = ledger.exceeded(budget) if ledger else None
+    if exceeded is None:
+        return ai_mode
+    item = "token" if exceeded == "tokens" else "费用"
+    print(f"⚠️ OpenAI {item}预算已用完，切换到 {budget.fallback} 模式")
+    return budget.fallback
+
+
 def get_ai_suggestion(
     city: str,
     temp: float,
@@ -231,29 +317,74 @@ def get_ai_suggestion(
     time_remark: str,
     lang: str = "ja",
     ai_mode: str = "ollama",
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
 ) -> Optional[str]:
     """
     获取AI建议
+    aqi / uvi 为实测的空气质量等级和紫外线指数（可选），会写入提示词
     """
-    prompt = build_enhanced_prompt(city, temp, desc, time_remark, lang)
+    ai_mode = apply_budget(ai_mode)
 
     if ai_mode == "ollama" or ai_mode == "local":  # 兼容原有的 'local' 参数
+        prompt = build_enhanced_prompt(city, temp, desc, time_remark, lang, clock, aqi, uvi)
         return call_ollama_gemma(prompt)
     elif ai_mode == "openai":
-        return call_openai_api(prompt)
+        system_prompt, prompt = build_compact_prompt(
+            city, temp, desc, time_remark, lang, clock, aqi, uvi
+        )
+        return call_openai_api(prompt, system_prompt)
+    elif ai_mode == "fast":  # 基于历史 LLM 建议的检索，毫秒级
+        return fast_suggestion(city, temp, desc, lang, clock)
+    elif ai_mode == "off":  # 预算用完后降级为传统模式
+        return None
     else:
         print(f"❌ 不支持的AI模式: {ai_mode}")
         return None
 
 
+def get_multilang_suggestion(
+    city: str,
+    temp: float,
+    desc: str,
+    langs: Sequence[str],
+    ai_mode: str = "ollama",
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> Dict[str, str]:
+    """
+    一次请求获取多种语言的AI建议，返回 {lang: suggestion}
+    模型没有给出（或格式不对）的语言不包含在结果中，由调用方回退
+    """
+    ai_mode = apply_budget(ai_mode)
+    clock = clock or current_clock()
+
+    if ai_mode == "fast":  # 本地检索，逐语言查询即可
+        found = {lang: fast_suggestion(city, temp, desc, lang, clock) for lang in langs}
+        return {lang: s for lang, s in found.items() if s}
+    if ai_mode not in ("ollama", "local", "openai"):
+        if ai_mode != "off":
+            print(f"❌ 不支持的AI模式: {ai_mode}")
+        return {}
+
+    system_prompt, prompt = build_multilang_prompt(city, temp, desc, langs, clock, aqi, uvi)
+    if ai_mode == "openai":
+        raw = call_openai_api(prompt, system_prompt, max_tokens=80 * len(langs))
+    else:
+        raw = call_ollama_gemma(f"{system_prompt}\n\n{prompt}", json_mode=True)
+    return parse_multilang_response(raw, langs)
+
+
 def parse_args():
     """命令行参数解析（用于独立测试）"""
     parser = argparse.ArgumentParser(description="AI 服装建议工具")
     parser.add_argument(
         "--ai-mode",
         default="ollama",
-        choices=["ollama", "local", "openai"],
-        help="AI模式选择 (ollama=本地Ollama+Gemma, openai=OpenAI API)",
+        choices=["ollama", "local", "openai", "fast"],
+        help="AI模式选择 (ollama=本地Ollama+Gemma, openai=OpenAI API, fast=历史建议检索)",
     )
     parser.add_argument("--city", default="Tokyo")
     parser.add_argument("--lang", default="ja", choices=["ja", "zh", "en"])
@@ -0,0 +1,172 @@
+# weather_advisor/batch.py
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO
+
+from weather_advisor.advice_table import lookup_advice
+from weather_advisor.clock import ClockContext, CityClock, current_clock
+from weather_advisor.records import (
+    Observation,
+    iter_csv_observations,
+    iter_jsonl_observations,
+)
+from weather_advisor.utils import (
+    get_seasonal_reminder,
+    get_time_remark,
+    format_personalized_weather_display,
+)
+
+SUPPORTED_LANGS = ("ja", "zh", "en")
+
+def iter_observations(stream: TextIO, fmt: str = "jsonl") -> Iterator[Observation]:
+    """
+    逐行读取天气观测数据（CSV 或 JSONL），不会一次性载入整个文件
+    每条记录需要包含 city / temp / desc 三个字段，
+    可选的 timezone（OpenWeatherMap 返回的 UTC 偏移秒数）/ lat 用于计算当地时间段和季节
+    """
+    if fmt == "csv":
+        return iter_csv_observations(stream)
+    return iter_jsonl_observations(stream)
+
+
+def render_advice(
+    city: str,
+    temp: float,
+    desc: str,
+    lang: str,
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> Dict[str, object]:
+    """为单个（观测, 语言）组合生成完整的本地化建议"""
+    clock = clock or current_clock()
+    rules = lookup_advice(city, temp, desc, lang, aqi, uvi)
+    suggestion = rules.suggestion
+    seasonal = get_seasonal_reminder(lang, clock)
+    time_remark = get_time_remark(lang, clock)
+    return {
+        "city": city,
+        "lang": lang,
+        "temp": temp,
+        "desc": desc,
+        "comfort": rules.comfort,
+        "suggestion": suggestion,
+        "regional": rules.regional,
+        "seasonal": seasonal["tip"],
+        "display": format_personalized_weather_display(
+            city, temp, desc, suggestion, time_remark, lang, clock, aqi, uvi
+        ),
+    }
+
+
+def _render_chunk(rows: List[Observation], langs: Sequence[str], utc_now: float) -> str:
+    """工作进程入口：渲染一批记录，返回拼接好的 JSONL 文本"""
+    # 整个批次共用同一个时间基准（各分片结果一致），分片内每个时区只计算一次
+    clocks = CityClock(utc_now)
+    lines = []
+    for obs in rows:
+        clock = clocks.get(obs.timezone, obs.lat)
+        for lang in langs:
+            lines.append(
+                json.dumps(
+                    render_advice(obs.city, obs.temp, obs.desc, lang, clock, obs.aqi, obs.uvi),
+                    ensure_ascii=False,
+                )
+            )
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _chunks(rows: Iterable[Observation], size: int) -> Iterator[List[Observation]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(
+    rows: Iterable[Observation],
+    out: TextIO,
+    langs: Sequence[str] = SUPPORTED_LANGS,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    max_pending: Optional[int] = None,
+) -> int:
+    """
+    将观测数据分片交给进程池渲染，并按输入顺序流式写出
+    同时在途的分片数量有上限，内存占用与输入规模无关
+    返回: 处理的观测条数
+    """
+    workers = workers or os.cpu_count() or 1
+    # 每个进程保留几片待处理任务，避免进程空等
+    max_pending = max_pending or workers * 4
+    pending: deque = deque()
+    total = 0
+    utc_now = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(rows, chunk_size):
+            total += len(chunk)
+            pending.append(pool.submit(_render_chunk, chunk, tuple(langs), utc_now))
+            if len(pending) >= max_pending:
+                out.write(pending.popleft().result())
+        while pending:
+            out.write(pending.popleft().result())
+
+    out.flush()
+    return total
+
+
+def parse_args():
+    """命令行参数解析"""
+    parser = argparse.ArgumentParser(description="批量生成多语言穿衣建议")
+    parser.add_argument("input", help="观测数据文件（CSV 或 JSONL，- 表示标准输入）")
+    parser.add_argument("--output", "-o", default="-", help="输出 JSONL 文件（默认标准输出）")
+    parser.add_argument(
+        "--format", choices=["csv", "jsonl"], help="输入格式（默认根据扩展名判断）"
+    )
+    parser.add_argument(
+        "--langs",
+        default=",".join(SUPPORTED_LANGS),
+        help="输出语言，逗号分隔（默认 ja,zh,en）",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每个分片的记录数")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    fmt = args.format or ("csv" if args.input.endswith(".csv") else "jsonl")
+    langs = [lang for lang in args.langs.split(",") if lang in SUPPORTED_LANGS]
+    if not langs:
+        print("❌ 未指定有效的输出语言", file=sys.stderr)
+        return
+
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        total = run_batch(
+            iter_observations(src, fmt),
+            dst,
+            langs=langs,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+        )
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"✅ 已处理 {total} 条观测 × {len(langs)} 种语言", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
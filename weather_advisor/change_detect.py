@@ -0,0 +1,329 @@
+# weather_advisor/change_detect.py
+"""
+增量建议：定时运行时只为天气有明显变化的城市重新生成建议
+
+每个城市保存「上次生成建议时」的观测和各语言的建议（保存在 JSON 状态文件中，
+跨进程有效）。新观测与其相比满足任一条件才重新生成，否则直接复用：
+- 温差达到 temp_delta
+- 温度跨过规则引擎的阈值区间
+- 开始/停止下雨
+- 天气类别变化（晴、云、雨、雪……）
+- 建议已超过 max_age 秒
+与上次生成时而不是上次轮询时比较，缓慢累积的变化同样会触发重新生成。
+
+用法: python -m weather_advisor.change_detect Tokyo Osaka --langs ja,en --ai-mode ollama
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, List, Optional, Sequence
+
+from weather_advisor.advice_table import CATEGORY_COUNT, lookup_advice, temp_band, weather_key
+from weather_advisor.ai_suggester import get_ai_suggestion, get_multilang_suggestion
+from weather_advisor.clock import city_clock, clock_scope
+from weather_advisor.environment import observe
+from weather_advisor.records import Observation
+from weather_advisor.utils import air_level, get_time_remark, normalize_city, uv_level
+
+STATE_PATH = os.getenv(
+    "WEATHER_ADVISOR_STATE", os.path.expanduser("~/.weather_advisor_state.json")
+)
+
+SUPPORTED_LANGS = ("ja", "zh", "en")
+
+
+@dataclass(slots=True)
+class ChangeThresholds:
+    """判断天气是否「明显变化」的条件，设为 None/False 表示不检查该项"""
+
+    temp_delta: Optional[float] = 3.0
+    band: bool = True
+    rain: bool = True
+    category: bool = True
+    environment: bool = True  # 空气质量 / 紫外线等级变化
+    max_age: Optional[float] = 6 * 3600
+
+
+@dataclass(slots=True)
+class CityState:
+    """上次生成建议时的观测，以及各语言的建议 {lang: {"suggestion", "mode"}}"""
+
+    obs: Observation
+    ts: float
+    advice: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class RefreshResult:
+    """一个城市本轮的处理结果，status 为 recomputed / reused / failed"""
+
+    city: str
+    status: str
+    reason: Optional[str] = None
+    advice: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+
+class ChangeDetector:
+    """按城市保存基准观测并判断新观测是否需要重新生成建议"""
+
+    def __init__(
+        self,
+        thresholds: Optional[ChangeThresholds] = None,
+        path: Optional[str] = STATE_PATH,
+    ):
+        self.thresholds = thresholds or ChangeThresholds()
+        self.path = path
+        self.states: Dict[str, CityState] = {}
+        if path:
+            self.load()
+
+    def load(self) -> None:
+        """读取状态文件，不存在或损坏时从空状态开始"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.states = {
+                city: CityState(Observation(**item["obs"]), item["ts"], item["advice"])
+                for city, item in data.get("cities", {}).items()
+            }
+        except FileNotFoundError:
+            self.states = {}
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"⚠️ 状态文件读取失败，将重新生成全部建议: {e}", file=sys.stderr)
+            self.states = {}
+
+    def save(self) -> None:
+        """原子写回状态文件"""
+        if not self.path:
+            return
+        data = {
+            "cities": {
+                city: {"obs": asdict(state.obs), "ts": state.ts, "advice": state.advice}
+                for city, state in self.states.items()
+            }
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def change_reason(self, obs: Observation, now: Optional[float] = None) -> Optional[str]:
+        """返回需要重新生成的原因；变化不明显时返回 None"""
+        state = self.states.get(obs.city)
+        if state is None:
+            return "new"
+        t = self.thresholds
+        prev = state.obs
+        now = time.time() if now is None else now
+        if t.max_age is not None and now - state.ts >= t.max_age:
+            return "expired"
+        if t.temp_delta is not None and abs(obs.temp - prev.temp) >= t.temp_delta:
+            return "temp"
+        if t.band and temp_band(obs.temp) != temp_band(prev.temp):
+            return "band"
+        old_rain, old_category = divmod(weather_key(prev.desc), CATEGORY_COUNT)
+        new_rain, new_category = divmod(weather_key(obs.desc), CATEGORY_COUNT)
+        if t.rain and old_rain != new_rain:
+            return "rain"
+        if t.category and old_category != new_category:
+            return "category"
+        if t.environment and (
+            air_level(obs.aqi) != air_level(prev.aqi) or uv_level(obs.uvi) != uv_level(prev.uvi)
+        ):
+            return "environment"
+        return None
+
+    def pending_langs(self, city: str, langs: Sequence[str], ai_mode: str = "off") -> List[str]:
+        """
+        天气未变时仍需（重新）生成建议的语言：缺少的，
+        以及 AI 模式下因 AI 失败回退到规则引擎的（每次刷新都重试 AI，不等到过期）
+        """
+        advice = self.states[city].advice
+        return [
+            lang
+            for lang in langs
+            if lang not in advice or (ai_mode != "off" and advice[lang].get("mode") == "rules")
+        ]
+
+    def update(
+        self, obs: Observation, advice: Dict[str, Dict[str, str]], now: Optional[float] = None
+    ) -> None:
+        """以新观测为基准保存建议"""
+        self.states[obs.city] = CityState(obs, time.time() if now is None else now, advice)
+
+
+def generate_advice(obs: Observation, lang: str, ai_mode: str = "off") -> Dict[str, str]:
+    """为一个观测生成建议，AI 失败时回退到规则引擎"""
+    if ai_mode != "off":
+        clock = city_clock(obs.timezone, obs.lat)
+        suggestion = get_ai_suggestion(
+            obs.city, obs.temp, obs.desc, get_time_remark(lang, clock), lang, ai_mode, clock,
+            obs.aqi, obs.uvi,
+        )
+        if suggestion and suggestion.strip():
+            return {"suggestion": suggestion.strip(), "mode": ai_mode}
+    rules = lookup_advice(obs.city, obs.temp, obs.desc, lang, obs.aqi, obs.uvi)
+    return {"suggestion": rules.suggestion, "mode": "rules"}
+
+
+def generate_advice_langs(
+    obs: Observation, langs: Sequence[str], ai_mode: str = "off"
+) -> Dict[str, Dict[str, str]]:
+    """
+    为一个观测生成多种语言的建议
+    AI 模式下只发一次多语言请求，模型没有给出的语言回退到规则引擎
+    """
+    if ai_mode == "off" or len(langs) == 1:
+        return {lang: generate_advice(obs, lang, ai_mode) for lang in langs}
+    clock = city_clock(obs.timezone, obs.lat)
+    suggestions = get_multilang_suggestion(
+        obs.city, obs.temp, obs.desc, langs, ai_mode, clock, obs.aqi, obs.uvi
+    )
+    return {
+        lang: {"suggestion": suggestions[lang], "mode": ai_mode}
+        if lang in suggestions
+        else generate_advice(obs, lang, "off")
+        for lang in langs
+    }
+
+
+def refresh_cities(
+    cities: Sequence[str],
+    langs: Sequence[str],
+    api_key: str,
+    detector: ChangeDetector,
+    ai_mode: str = "off",
+    workers: int = 4,
+    force: bool = False,
+) -> List[RefreshResult]:
+    """
+    查询各城市天气（含空气质量和紫外线），只为变化明显（或缺少某语言建议）的城市重新生成建议
+    天气查询并行进行，建议生成按城市顺序进行（本地模型一次只处理一个请求）
+    """
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        observations = list(pool.map(lambda c: observe(c, api_key), cities))
+
+    now = time.time()
+    results = []
+    # 本轮所有城市共用同一时刻计算当地时间
+    with clock_scope(now):
+        for city, obs in zip(cities, observations):
+            if obs is None:
+                results.append(RefreshResult(city, "failed", "weather data unavailable"))
+                continue
+            # 观测对象可能被并发查询共享（SingleFlight），不要原地修改
+            obs = replace(obs, city=city)
+            reason = "forced" if force else detector.change_reason(obs, now)
+            if reason is None:
+                state = detector.states[city]
+                pending = detector.pending_langs(city, langs, ai_mode)
+                if not pending:
+                    results.append(RefreshResult(city, "reused", None, state.advice))
+                    continue
+                # 天气未变，只补齐新增的语言、重试回退的语言，基准观测保持不变
+                retry = any(lang in state.advice for lang in pending)
+                state.advice.update(generate_advice_langs(state.obs, pending, ai_mode))
+                results.append(
+                    RefreshResult(city, "recomputed", "retry" if retry else "lang", state.advice)
+                )
+                continue
+            advice = generate_advice_langs(obs, langs, ai_mode)
+            detector.update(obs, advice, now)
+            results.append(RefreshResult(city, "recomputed", reason, advice))
+    return results
+
+
+REASON_LABELS = {
+    "new": "首次",
+    "forced": "强制",
+    "expired": "已过期",
+    "temp": "温差",
+    "band": "温度区间",
+    "rain": "降雨",
+    "category": "天气类别",
+    "environment": "空气质量/紫外线",
+    "lang": "新增语言",
+    "retry": "重试 AI",
+}
+
+
+def print_report(results: List[RefreshResult]) -> None:
+    """输出重新生成与复用的城市"""
+    for r in results:
+        if r.status == "recomputed":
+            print(f"🔄 {r.city}: 重新生成（{REASON_LABELS.get(r.reason, r.reason)}）")
+        elif r.status == "reused":
+            print(f"♻️ {r.city}: 复用上次建议")
+        else:
+            print(f"❌ {r.city}: {r.reason}")
+        for lang, item in r.advice.items():
+            print(f"   [{lang}] {item['suggestion']}")
+    recomputed = sum(r.status == "recomputed" for r in results)
+    reused = sum(r.status == "reused" for r in results)
+    print(f"\n📊 重新生成 {recomputed} / 复用 {reused} / 失败 {len(results) - recomputed - reused}")
+
+
+def parse_args():
+    """命令行参数解析"""
+    parser = argparse.ArgumentParser(description="只为天气有明显变化的城市重新生成建议")
+    parser.add_argument("cities", nargs="+", help="城市名")
+    parser.add_argument("--langs", default="ja", help="建议语言，逗号分隔（默认 ja）")
+    parser.add_argument(
+        "--ai-mode", default="off", choices=["ollama", "local", "openai", "fast", "off"]
+    )
+    parser.add_argument("--state", default=STATE_PATH, help="状态文件路径")
+    parser.add_argument("--temp-delta", type=float, default=3.0, help="触发重新生成的温差（°C）")
+    parser.add_argument("--max-age", type=float, default=6.0, help="建议最长复用时间（小时）")
+    parser.add_argument("--no-band", action="store_true", help="不检查温度区间变化")
+    parser.add_argument("--no-rain", action="store_true", help="不检查降雨变化")
+    parser.add_argument("--no-category", action="store_true", help="不检查天气类别变化")
+    parser.add_argument("--force", action="store_true", help="忽略状态，全部重新生成")
+    parser.add_argument("--json", action="store_true", help="每个城市输出一行 JSON")
+    return parser.parse_args()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args = parse_args()
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        print("❌ 未找到 API 密钥，请在 .env 文件中设置 OPENWEATHER_API_KEY", file=sys.stderr)
+        sys.exit(1)
+    langs = [lang for lang in args.langs.split(",") if lang in SUPPORTED_LANGS]
+    if not langs:
+        print("❌ 未指定有效的输出语言", file=sys.stderr)
+        sys.exit(1)
+
+    thresholds = ChangeThresholds(
+        temp_delta=args.temp_delta if args.temp_delta > 0 else None,
+        band=not args.no_band,
+        rain=not args.no_rain,
+        category=not args.no_category,
+        max_age=args.max_age * 3600 if args.max_age > 0 else None,
+    )
+    detector = ChangeDetector(thresholds, args.state)
+    cities = [normalize_city(city) for city in args.cities]
+    # JSON 模式下把过程提示改写到 stderr，保证 stdout 只有 JSON
+    quiet = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext()
+    with quiet:
+        results = refresh_cities(
+            cities, langs, api_key, detector, args.ai_mode, force=args.force
+        )
+    detector.save()
+
+    if args.json:
+        for r in results:
+            print(json.dumps(asdict(r), ensure_ascii=False, separators=(",", ":")))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# weather_advisor/clock.py
+import contextvars
+import datetime
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+
+def _greeting_period(hour: int) -> str:
+    if 5 <= hour <= 11:
+        return "morning"
+    elif 12 <= hour <= 17:
+        return "afternoon"
+    elif 18 <= hour <= 23:
+        return "evening"
+    return "night"
+
+
+def _remark_period(hour: int) -> str:
+    if 5 <= hour <= 7:
+        return "early_morning"
+    elif 8 <= hour <= 11:
+        return "morning"
+    elif 12 <= hour <= 13:
+        return "noon"
+    elif 14 <= hour <= 17:
+        return "afternoon"
+    elif 18 <= hour <= 20:
+        return "evening"
+    elif 21 <= hour <= 23:
+        return "night"
+    return "late_night"
+
+
+def _season(month: int) -> str:
+    if month in [12, 1, 2]:
+        return "winter"
+    elif month in [3, 4, 5]:
+        return "spring"
+    elif month in [6, 7, 8]:
+        return "summer"
+    return "autumn"
+
+
+# 预先计算的查找表：按小时 / 月份直接索引
+PERIOD_BY_HOUR: Tuple[str, ...] = tuple(_greeting_period(h) for h in range(24))
+REMARK_BY_HOUR: Tuple[str, ...] = tuple(_remark_period(h) for h in range(24))
+SEASON_BY_MONTH: Tuple[str, ...] = ("",) + tuple(_season(m) for m in range(1, 13))
+
+
+@dataclass(frozen=True)
+class ClockContext:
+    """
+    一次请求内共享的时间上下文
+    问候语、时间提示、季节提醒和 AI 提示词都从同一个对象读取，
+    避免各自调用 datetime.now() 在整点附近得出不一致的结果
+    """
+
+    hour: int
+    month: int
+    period: str  # 问候用时间段: morning / afternoon / evening / night
+    remark_key: str  # 时间提示用的细分时间段
+    season: str
+
+
+@lru_cache(maxsize=None)
+def clock_for(hour: int, month: int, southern: bool = False) -> ClockContext:
+    """
+    按（小时, 月份, 半球）返回时间上下文，结果只有 24×12×2 种，全部缓存
+    南半球的季节与北半球相差半年
+    """
+    season_month = (month + 5) % 12 + 1 if southern else month
+    return ClockContext(
+        hour=hour,
+        month=month,
+        period=PERIOD_BY_HOUR[hour],
+        remark_key=REMARK_BY_HOUR[hour],
+        season=SEASON_BY_MONTH[season_month],
+    )
+
+
+def current_clock(now: Optional[datetime.datetime] = None) -> ClockContext:
+    """
+    返回当前时间上下文
+    长时间运行的模式中同一小时内始终返回同一个缓存对象
+    """
+    if now is None:
+        t = time.localtime()
+        return clock_for(t.tm_hour, t.tm_mon)
+    return clock_for(now.hour, now.month)
+
+
+class CityClock:
+    """
+    以同一时刻为基准，按城市的 UTC 偏移和纬度计算当地时间上下文
+    OpenWeatherMap 返回的 timezone 字段即 UTC 偏移秒数；
+    同一时刻下每个（偏移, 半球）只计算一次，批量处理上千城市时几乎都是查表
+    """
+
+    def __init__(self, utc_now: Optional[float] = None):
+        self.utc_now = time.time() if utc_now is None else utc_now
+        # 未提供时区时使用本机时区
+        self.local_offset = time.localtime(self.utc_now).tm_gmtoff
+        self._cache: Dict[Tuple[int, bool], ClockContext] = {}
+
+    def get(
+        self, tz_offset: Optional[int] = None, lat: Optional[float] = None
+    ) -> ClockContext:
+        offset = self.local_offset if tz_offset is None else int(tz_offset)
+        southern = lat is not None and lat < 0
+        key = (offset, southern)
+        clock = self._cache.get(key)
+        if clock is None:
+            t = time.gmtime(self.utc_now + offset)
+            clock = clock_for(t.tm_hour, t.tm_mon, southern)
+            self._cache[key] = clock
+        return clock
+
+
+# 当前运行（一次命令行请求、一条 JSONL 记录、一轮刷新）共用的 CityClock
+_run_clock: contextvars.ContextVar[Optional[CityClock]] = contextvars.ContextVar(
+    "weather_advisor_clock", default=None
+)
+
+
+@contextmanager
+def clock_scope(utc_now: Optional[float] = None) -> Iterator[CityClock]:
+    """
+    在 with 块内共用同一个 CityClock：各处看到同一个“现在”，每个时区只计算一次
+    外层已有时沿用外层（指定 utc_now 时除外）
+    """
+    outer = _run_clock.get()
+    if outer is not None and utc_now is None:
+        yield outer
+        return
+    clocks = CityClock(utc_now)
+    token = _run_clock.set(clocks)
+    try:
+        yield clocks
+    finally:
+        _run_clock.reset(token)
+
+
+def city_clock(
+    tz_offset: Optional[int] = None,
+    lat: Optional[float] = None,
+    utc_now: Optional[float] = None,
+) -> ClockContext:
+    """返回某个城市当前的时间上下文，在 clock_scope() 内复用同一个 CityClock"""
+    if utc_now is None:
+        clocks = _run_clock.get()
+        if clocks is not None:
+            return clocks.get(tz_offset, lat)
+    return CityClock(utc_now).get(tz_offset, lat)
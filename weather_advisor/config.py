@@ -0,0 +1,186 @@
+# weather_advisor/config.py
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+CONFIG_PATH = os.getenv(
+    "WEATHER_ADVISOR_CONFIG", os.path.expanduser("~/.weather_advisor_config.json")
+)
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "preferred_lang": "ja",
+    "default_city": "Tokyo",
+    "default_ai_mode": "ollama",  # 默认启用ollama
+    "ai_fallback_enabled": True,  # 启用AI失败回退
+    "show_seasonal_tips": True,
+    "show_regional_advice": True,
+    "preferred_greeting_style": "formal",
+    "ollama_model": "gemma:7b",
+    "ai_timeout": 30,  # AI请求超时时间
+    "history_enabled": True,  # 记录每次输出的建议
+    "history_reuse": False,  # 天气条件相近时复用同一 AI 模式的历史建议（默认关闭）
+    "history_reuse_distance": 1.0,  # 复用的相似度阈值（1.0 ≈ 温差 1.5°C）
+    "environment_data": True,  # 同时获取空气质量和紫外线（与天气查询并发）
+    "openai_token_budget": None,  # 预算周期内 OpenAI 的 token 上限（None 表示不限）
+    "openai_cost_budget": None,  # 预算周期内 OpenAI 的费用上限（美元）
+    "openai_budget_hours": 24,  # 预算周期（小时）
+    "openai_budget_fallback": "ollama",  # 超出预算后改用 ollama、fast 或 off（传统模式）
+    "openai_prompt_price": 0.0005,  # 输入单价（美元 / 1K token）
+    "openai_completion_price": 0.0015,  # 输出单价（美元 / 1K token）
+}
+
+# 各配置项的合法取值（None 表示只检查类型）
+_CHOICES = {
+    "preferred_lang": ("ja", "zh", "en"),
+    "default_ai_mode": ("auto", "ollama", "local", "openai", "fast", "off"),
+    "openai_budget_fallback": ("ollama", "fast", "off"),
+}
+
+# 默认值为 None 的数值项：允许 None 或正数
+_OPTIONAL_NUMBERS = ("openai_token_budget", "openai_cost_budget")
+
+
+def validate_config(user_config: Any) -> Dict[str, Any]:
+    """
+    校验用户配置并与默认值合并
+    类型或取值不合法的项会被忽略（使用默认值）并给出警告，未知项原样保留
+    """
+    if not isinstance(user_config, dict):
+        raise ValueError("配置文件顶层必须是 JSON 对象")
+
+    config = dict(DEFAULT_CONFIG)
+    for key, value in user_config.items():
+        default = DEFAULT_CONFIG.get(key)
+        if key in _OPTIONAL_NUMBERS:
+            if value is not None and (
+                not isinstance(value, (int, float))
+                or isinstance(value, bool)
+                or value <= 0
+            ):
+                print(f"⚠️ 配置项 {key}={value!r} 无效，使用默认值", file=sys.stderr)
+                continue
+        elif default is not None:
+            if isinstance(default, bool):
+                valid = isinstance(value, bool)
+            elif isinstance(default, (int, float)):
+                valid = (
+                    isinstance(value, (int, float))
+                    and not isinstance(value, bool)
+                    and value > 0
+                )
+            else:
+                valid = isinstance(value, type(default))
+            if valid and key in _CHOICES:
+                valid = value in _CHOICES[key]
+            if not valid:
+                print(f"⚠️ 配置项 {key}={value!r} 无效，使用默认值", file=sys.stderr)
+                continue
+        config[key] = value
+    return config
+
+
+class ConfigStore:
+    """
+    配置文件的只读缓存
+    - 仅在文件的 mtime/大小变化时重新解析和校验
+    - 从不自动写文件，需要时显式调用 write_default()
+    - watch() 在长时间运行的模式中后台轮询文件，变化时原子替换配置
+    """
+
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[float, int]] = None
+        self._config: Dict[str, Any] = dict(DEFAULT_CONFIG)
+        self._loaded = False
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _file_stamp(self) -> Optional[Tuple[float, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def get(self) -> Dict[str, Any]:
+        """返回当前配置；文件有变化时重新加载"""
+        stamp = self._file_stamp()
+        if self._loaded and stamp == self._stamp:
+            return self._config
+        with self._lock:
+            if not self._loaded or stamp != self._stamp:
+                self._reload(stamp)
+        return self._config
+
+    @property
+    def current(self) -> Dict[str, Any]:
+        """不检查文件，直接返回最近一次加载的配置（配合 watch() 使用）"""
+        return self._config if self._loaded else self.get()
+
+    def _reload(self, stamp: Optional[Tuple[float, int]]) -> None:
+        if stamp is None:
+            config = dict(DEFAULT_CONFIG)
+        else:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    config = validate_config(json.load(f))
+            except Exception as e:
+                # 首次加载失败使用默认值，热重载失败则保留上一份有效配置
+                if not self._loaded:
+                    print(f"⚠️ 配置文件读取失败，使用默认设置: {e}", file=sys.stderr)
+                    config = dict(DEFAULT_CONFIG)
+                else:
+                    print(f"⚠️ 配置文件读取失败，保留当前设置: {e}", file=sys.stderr)
+                    self._stamp = stamp
+                    return
+        # 整体替换引用，读取方不会看到半更新的配置
+        self._config = config
+        self._stamp = stamp
+        self._loaded = True
+
+    def write_default(self, overwrite: bool = False) -> bool:
+        """显式创建默认配置文件，返回是否写入"""
+        if os.path.exists(self.path) and not overwrite:
+            return False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(DEFAULT_CONFIG, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        return True
+
+    def watch(self, interval: float = 2.0) -> None:
+        """启动后台线程监视配置文件，变化时热重载"""
+        if self._watcher is not None:
+            return
+        self.get()
+
+        def _loop():
+            while not self._stop.wait(interval):
+                self.get()
+
+        self._watcher = threading.Thread(
+            target=_loop, name="config-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop(self) -> None:
+        """停止后台监视"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._stop.clear()
+
+
+_default_store: Optional[ConfigStore] = None
+
+
+def get_config_store() -> ConfigStore:
+    """返回进程内共享的默认配置存储"""
+    global _default_store
+    if _default_store is None:
+        _default_store = ConfigStore()
+    return _default_store
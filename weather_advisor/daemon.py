@@ -0,0 +1,559 @@
+# weather_advisor/daemon.py
+"""
+常驻服务：持续轮询一组城市的天气，并通过 HTTP 从内存中返回建议
+
+调度：
+- 按「下次刷新时间」排序的优先队列（heapq），到期的城市交给有界线程池查询
+- 每次排期在间隔上加 ±jitter 的随机抖动，启动时把首次查询分散开，避免同时请求
+- 自适应间隔：两次轮询之间温度或天气类别明显变化时间隔减半，稳定时逐步放宽，
+  查询失败时指数退避
+- 最短间隔不低于「城市数 ÷ OpenWeatherMap 配额」，长期请求速率不超过配额
+  （advisor 中的令牌桶仍是最终的硬限制）
+建议只在天气相对上次生成时明显变化时重新生成（复用 change_detect 的判断），
+生成结果预先编码为 JSON，HTTP 请求直接返回内存中的字节串。
+文本格式按需渲染，两种格式都经 output_cache 缓存并支持 ETag / 304 和 gzip 预压缩。
+
+接口：
+    GET /advice?city=Tokyo&lang=ja               单个城市的建议（JSON）
+    GET /advice?city=Tokyo&lang=ja&format=text   完整的人类可读建议
+    GET /status                                  调度状态
+
+用法: python -m weather_advisor.daemon Tokyo Osaka --cities-file cities.txt --port 8080 --langs ja,en
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+from urllib.parse import parse_qs, urlsplit
+
+from weather_advisor.advice_table import lookup_advice, weather_key
+from weather_advisor.advisor import get_observation
+from weather_advisor.change_detect import ChangeDetector, ChangeThresholds, generate_advice_langs
+from weather_advisor.clock import ClockContext, city_clock
+from weather_advisor.environment import CALLS_PER_OBSERVE, observe
+from weather_advisor.output_cache import OutputCache, Rendered, choose_encoding, not_modified
+from weather_advisor.records import Observation
+from weather_advisor.utils import format_personalized_weather_display, get_time_remark, normalize_city
+
+SUPPORTED_LANGS = ("ja", "zh", "en")
+FORMATS = ("json", "text")
+JSON_TYPE = "application/json; charset=utf-8"
+TEXT_TYPE = "text/plain; charset=utf-8"
+
+
+@dataclass(slots=True)
+class PollPolicy:
+    """
+    轮询间隔策略（秒）
+    volatile_temp: 两次轮询之间温差达到该值（或天气类别变化）视为天气不稳定
+    """
+
+    interval: float = 600.0
+    min_interval: float = 120.0
+    max_interval: float = 3600.0
+    jitter: float = 0.1
+    speedup: float = 0.5
+    slowdown: float = 1.5
+    volatile_temp: float = 1.0
+    max_backoff: float = 1800.0
+
+
+class Published(NamedTuple):
+    """一次发布的建议（整体替换，读取方无需加锁）"""
+
+    version: int
+    obs: Observation  # 生成建议时的观测
+    advice: Dict[str, Dict[str, str]]
+    ts: float
+    # 语言 -> 预先编码好的 JSON 响应
+    payloads: Dict[str, bytes]
+
+
+@dataclass(slots=True)
+class CityEntry:
+    """一个城市的调度状态和最新结果"""
+
+    city: str
+    interval: float
+    next_at: float = 0.0
+    obs: Optional[Observation] = None
+    updated_at: Optional[float] = None
+    polls: int = 0
+    failures: int = 0
+    published: Optional[Published] = None
+
+    @property
+    def payloads(self) -> Dict[str, bytes]:
+        return self.published.payloads if self.published is not None else {}
+
+
+def quota_interval(city_count: int, rate_per_minute: float) -> float:
+    """在配额内轮询全部城市一遍所需的时间（秒）"""
+    return city_count * 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+
+
+def is_volatile(prev: Optional[Observation], obs: Observation, policy: PollPolicy) -> bool:
+    """与上次轮询相比温度或天气类别变化明显"""
+    if prev is None:
+        return False
+    return (
+        abs(obs.temp - prev.temp) >= policy.volatile_temp
+        or weather_key(obs.desc) != weather_key(prev.desc)
+    )
+
+
+def encode_payload(obs: Observation, lang: str, item: Dict[str, str], ts: float) -> bytes:
+    """一个城市一种语言的 HTTP 响应体"""
+    rules = lookup_advice(obs.city, obs.temp, obs.desc, lang, obs.aqi, obs.uvi)
+    data = {
+        "city": obs.city,
+        "lang": lang,
+        "temp": obs.temp,
+        "desc": obs.desc,
+        "comfort": rules.comfort,
+        "emoji": rules.emoji,
+        "suggestion": item["suggestion"],
+        "ai_mode": item["mode"],
+        "aqi": obs.aqi,
+        "uvi": obs.uvi,
+        "updated_at": round(ts, 3),
+    }
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def render_text(obs: Observation, lang: str, item: Dict[str, str], clock: ClockContext) -> bytes:
+    """一个城市一种语言的完整文本建议（问候、时间提示、季节和地域提示随时钟分段变化）"""
+    text = format_personalized_weather_display(
+        obs.city, obs.temp, obs.desc, item["suggestion"], get_time_remark(lang, clock), lang, clock,
+        obs.aqi, obs.uvi,
+    )
+    return (text + "\n").encode("utf-8")
+
+
+class WeatherDaemon:
+    """
+    多城市轮询调度器
+    fetch / clock 可替换（测试时使用假的天气源和时钟）
+    """
+
+    def __init__(
+        self,
+        cities: Sequence[str],
+        api_key: str,
+        langs: Sequence[str] = ("ja",),
+        ai_mode: str = "off",
+        policy: Optional[PollPolicy] = None,
+        workers: int = 8,
+        rate_per_minute: float = 60.0,
+        detector: Optional[ChangeDetector] = None,
+        fetch: Optional[Callable[[str, str], Optional[Observation]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        seed: Optional[int] = None,
+        output_cache: Optional[OutputCache] = None,
+    ):
+        self.api_key = api_key
+        self.langs = list(langs)
+        self.ai_mode = ai_mode
+        self.policy = policy or PollPolicy()
+        self.workers = max(1, workers)
+        self.detector = detector or ChangeDetector(ChangeThresholds(), path=None)
+        self._fetch = fetch or get_observation
+        self._clock = clock
+        self._rng = random.Random(seed)
+
+        # 配额决定的最短间隔
+        unique = list(dict.fromkeys(cities))
+        self.quota_interval = quota_interval(len(unique), rate_per_minute)
+        self.min_interval = max(self.policy.min_interval, self.quota_interval)
+        base = min(max(self.policy.interval, self.min_interval), self.policy.max_interval)
+        if base < self.quota_interval:
+            print(
+                f"⚠️ {len(unique)} 个城市超出配额能支持的最长间隔，实际刷新间隔约 {self.quota_interval:.0f} 秒",
+                file=sys.stderr,
+            )
+
+        self.entries: Dict[str, CityEntry] = {}
+        self._heap: List[tuple] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # 本地模型一次只处理一个请求，AI 生成串行进行
+        self._generate_lock = threading.Lock()
+        self._versions = itertools.count(1)
+        self.output_cache = output_cache or OutputCache()
+
+        now = self._clock()
+        # 首次查询分散在按配额轮询一遍所需的时间内
+        spread = max(self.quota_interval, 1.0)
+        for city in unique:
+            entry = CityEntry(city, base)
+            state = self.detector.states.get(city)
+            if state is not None:
+                # 状态文件中已有建议：立即可用，按正常间隔排期
+                self._publish(entry, state.obs, state.advice, time.time())
+                entry.next_at = now + self._rng.uniform(0, base)
+            else:
+                entry.next_at = now + self._rng.uniform(0, spread)
+            self.entries[city.lower()] = entry
+            self._push(entry)
+
+    # ---- 调度 ----
+
+    def _push(self, entry: CityEntry) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (entry.next_at, self._seq, entry.city.lower()))
+
+    def _jittered(self, interval: float) -> float:
+        j = self.policy.jitter
+        return interval * self._rng.uniform(1 - j, 1 + j) if j else interval
+
+    def _reschedule(self, entry: CityEntry, ok: bool, volatile: bool) -> None:
+        p = self.policy
+        if not ok:
+            backoff = max(self.min_interval, entry.interval) * 2 ** min(entry.failures - 1, 10)
+            delay = min(p.max_backoff, backoff)
+        else:
+            factor = p.speedup if volatile else p.slowdown
+            entry.interval = min(p.max_interval, max(self.min_interval, entry.interval * factor))
+            delay = entry.interval
+        entry.next_at = self._clock() + self._jittered(delay)
+        with self._cond:
+            self._push(entry)
+            self._inflight -= 1
+            self._cond.notify()
+
+    def poll(self, key: str) -> None:
+        """查询一个城市并更新建议，完成后重新排期"""
+        entry = self.entries[key]
+        ok = volatile = False
+        try:
+            obs = self._fetch(entry.city, self.api_key)
+            if obs is not None:
+                # 观测对象可能被并发查询共享（SingleFlight），不要原地修改
+                obs = replace(obs, city=entry.city)
+                volatile = is_volatile(entry.obs, obs, self.policy)
+                self._update(entry, obs)
+                # 建议生成或发布失败时按失败处理（退避重试）
+                ok = True
+        except Exception as e:
+            print(f"⚠️ {entry.city} 刷新失败: {e}", file=sys.stderr)
+        finally:
+            entry.polls += 1
+            entry.failures = 0 if ok else entry.failures + 1
+            self._reschedule(entry, ok, volatile)
+
+    def _update(self, entry: CityEntry, obs: Observation) -> None:
+        detector = self.detector
+        reason = detector.change_reason(obs)
+        if reason is None:
+            state = detector.states[entry.city]
+            # 缺少的语言，以及上次 AI 失败回退到规则引擎的语言
+            missing = detector.pending_langs(entry.city, self.langs, self.ai_mode)
+            if missing:
+                state.advice.update(self._generate(state.obs, missing))
+            entry.obs = obs
+            # 基准观测只用于变化检测；响应中给出最新的观测值
+            published = entry.published
+            if missing or published is None or published.obs != obs:
+                self._publish(entry, obs, state.advice, time.time())
+            return
+        advice = self._generate(obs, self.langs)
+        now = time.time()
+        detector.update(obs, advice, now)
+        entry.obs = obs
+        self._publish(entry, obs, advice, now)
+
+    def _generate(self, obs: Observation, langs: Sequence[str]) -> Dict[str, Dict[str, str]]:
+        if self.ai_mode == "off":
+            return generate_advice_langs(obs, langs, "off")
+        with self._generate_lock:
+            return generate_advice_langs(obs, langs, self.ai_mode)
+
+    def _publish(self, entry: CityEntry, obs: Observation, advice, ts: float) -> None:
+        # 整体替换，读取方无需加锁；版本号变化后旧的缓存条目不再命中
+        payloads = {lang: encode_payload(obs, lang, item, ts) for lang, item in advice.items()}
+        entry.published = Published(next(self._versions), obs, dict(advice), ts, payloads)
+        entry.updated_at = ts
+        if entry.obs is None:
+            entry.obs = obs
+
+    def run_pending(self) -> int:
+        """在当前线程中处理所有已到期的城市（测试和单次运行用），返回处理数量"""
+        count = 0
+        now = self._clock()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            self._inflight += 1
+            self.poll(key)
+            count += 1
+        return count
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                if not self._heap or self._inflight >= self.workers:
+                    self._cond.wait(timeout=1.0)
+                    continue
+                wait = self._heap[0][0] - self._clock()
+                if wait > 0:
+                    self._cond.wait(timeout=min(wait, 1.0))
+                    continue
+                _, _, key = heapq.heappop(self._heap)
+                self._inflight += 1
+            self._pool.submit(self.poll, key)
+
+    def start(self) -> "WeatherDaemon":
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="poll")
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    # ---- 查询 ----
+
+    def payload(self, city: str, lang: str) -> Optional[bytes]:
+        """返回预先编码的建议；城市未知或尚未完成首次查询时返回 None"""
+        entry = self.entries.get(normalize_city(city).lower())
+        if entry is None:
+            return None
+        return entry.payloads.get(lang)
+
+    def rendered(self, city: str, lang: str, fmt: str = "json") -> Optional[Rendered]:
+        """
+        返回缓存的响应（含 ETag 和压缩版本）；城市未知或尚未完成首次查询时返回 None
+        缓存键：城市、观测版本、语言、建议模式，文本格式另加时钟分段
+        """
+        entry = self.entries.get(normalize_city(city).lower())
+        published = entry.published if entry is not None else None
+        if published is None or lang not in published.payloads:
+            return None
+        item = published.advice[lang]
+        if fmt == "json":
+            key = (entry.city, published.version, lang, item["mode"], None, fmt)
+            return self.output_cache.get(
+                key, lambda: (published.payloads[lang], JSON_TYPE, published.ts)
+            )
+        obs = published.obs
+        clock = city_clock(obs.timezone, obs.lat)
+        bucket = (clock.period, clock.remark_key, clock.season)
+        key = (entry.city, published.version, lang, item["mode"], bucket, fmt)
+        # 时钟分段变化后内容随之变化，以渲染时刻作为修改时间
+        return self.output_cache.get(
+            key, lambda: (render_text(obs, lang, item, clock), TEXT_TYPE, time.time())
+        )
+
+    def knows(self, city: str) -> bool:
+        return normalize_city(city).lower() in self.entries
+
+    def status(self) -> dict:
+        entries = list(self.entries.values())
+        with self._cond:
+            queued, inflight = len(self._heap), self._inflight
+            next_due = self._heap[0][0] - self._clock() if self._heap else None
+        return {
+            "cities": len(entries),
+            "ready": sum(1 for e in entries if e.payloads),
+            "polls": sum(e.polls for e in entries),
+            "failing": sum(1 for e in entries if e.failures),
+            "queued": queued,
+            "inflight": inflight,
+            "next_due": None if next_due is None else round(max(0.0, next_due), 3),
+            "min_interval": round(self.min_interval, 3),
+            "output_cache": self.output_cache.stats(),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "AdviceServer"
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，关闭 Nagle 避免与延迟 ACK 叠加出约 40ms 的等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # 高并发时不输出访问日志
+        pass
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", JSON_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_validators(self, item: Rendered) -> None:
+        self.send_header("ETag", item.etag)
+        self.send_header("Last-Modified", item.last_modified)
+        # 允许缓存，但每次使用前重新验证
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def _send_rendered(self, item: Rendered) -> None:
+        headers = self.headers
+        if not_modified(item, headers.get("If-None-Match"), headers.get("If-Modified-Since")):
+            self.send_response(304)
+            self._send_validators(item)
+            self.end_headers()
+            return
+        encoding = choose_encoding(headers.get("Accept-Encoding"), item.encoded)
+        body = item.encoded[encoding] if encoding else item.body
+        self.send_response(200)
+        self.send_header("Content-Type", item.content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self._send_validators(item)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: dict) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        daemon = self.server.daemon
+        if url.path == "/advice":
+            city = query.get("city", "")
+            lang = query.get("lang", daemon.langs[0])
+            fmt = query.get("format", "json")
+            if fmt not in FORMATS:
+                self._send_json(400, {"error": f"unsupported format: {fmt}"})
+                return
+            item = daemon.rendered(city, lang, fmt)
+            if item is not None:
+                self._send_rendered(item)
+            elif not daemon.knows(city):
+                self._send_json(404, {"error": f"unknown city: {city}"})
+            elif lang not in daemon.langs:
+                self._send_json(404, {"error": f"unsupported lang: {lang}"})
+            else:
+                self._send_json(503, {"error": "not ready"})
+        elif url.path == "/status":
+            self._send_json(200, daemon.status())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+class AdviceServer(ThreadingHTTPServer):
+    """从 WeatherDaemon 的内存结果返回建议的 HTTP 服务"""
+
+    daemon_threads = True
+
+    def __init__(self, daemon: WeatherDaemon, host: str = "127.0.0.1", port: int = 8080):
+        super().__init__((host, port), _Handler)
+        self.daemon = daemon
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def read_cities(args) -> List[str]:
+    """命令行和 --cities-file（每行一个城市，# 开头为注释）中的城市"""
+    cities = list(args.cities)
+    if args.cities_file:
+        with open(args.cities_file, "r", encoding="utf-8") as f:
+            cities.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return [normalize_city(city) for city in cities]
+
+
+def parse_args():
+    """命令行参数解析"""
+    parser = argparse.ArgumentParser(description="持续轮询多个城市并通过 HTTP 提供建议")
+    parser.add_argument("cities", nargs="*", help="城市名")
+    parser.add_argument("--cities-file", help="城市列表文件（每行一个）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--langs", default="ja", help="建议语言，逗号分隔（默认 ja）")
+    parser.add_argument(
+        "--ai-mode", default="off", choices=["ollama", "local", "openai", "fast", "off"]
+    )
+    parser.add_argument("--interval", type=float, default=600.0, help="基础刷新间隔（秒）")
+    parser.add_argument("--min-interval", type=float, default=120.0, help="最短刷新间隔（秒）")
+    parser.add_argument("--max-interval", type=float, default=3600.0, help="最长刷新间隔（秒）")
+    parser.add_argument("--jitter", type=float, default=0.1, help="间隔随机抖动比例（默认 ±10%%）")
+    parser.add_argument("--workers", type=int, default=8, help="并发查询数")
+    parser.add_argument("--state", help="状态文件路径（重启后立即提供上次的建议）")
+    parser.add_argument(
+        "--environment", action="store_true", help="同时获取空气质量和紫外线（额外的 API 请求）"
+    )
+    return parser.parse_args()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args = parse_args()
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        print("❌ 未找到 API 密钥，请在 .env 文件中设置 OPENWEATHER_API_KEY", file=sys.stderr)
+        sys.exit(1)
+    cities = read_cities(args)
+    if not cities:
+        print("❌ 未指定城市", file=sys.stderr)
+        sys.exit(1)
+    langs = [lang for lang in args.langs.split(",") if lang in SUPPORTED_LANGS]
+    if not langs:
+        print("❌ 未指定有效的输出语言", file=sys.stderr)
+        sys.exit(1)
+
+    policy = PollPolicy(
+        interval=args.interval,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        jitter=args.jitter,
+    )
+    detector = ChangeDetector(ChangeThresholds(), path=args.state)
+    rate = float(os.getenv("OPENWEATHER_RATE_LIMIT", "60"))
+    if args.environment:
+        # 每次轮询最多还有空气质量和紫外线两个请求，按最坏情况分配配额
+        rate /= CALLS_PER_OBSERVE
+    daemon = WeatherDaemon(
+        cities,
+        api_key,
+        langs,
+        args.ai_mode,
+        policy,
+        workers=args.workers,
+        rate_per_minute=rate,
+        detector=detector,
+        fetch=observe if args.environment else None,
+    ).start()
+    server = AdviceServer(daemon, args.host, args.port)
+    # SIGTERM 与 Ctrl+C 一样正常退出并保存状态
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🌐 {len(daemon.entries)} 个城市，服务地址 {server.base_url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        detector.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# weather_advisor/deadline.py
+"""
+请求级截止时间
+
+main.py --deadline 2s（JSONL 记录中的 "deadline" 字段、常驻进程中每个请求自己的参数）
+通过 deadline_scope() 为整个请求设置一个截止时间，保存在 contextvar 中。
+各阶段（IP 定位、天气、空气质量、Ollama 探测与生成、OpenAI）用 stage_timeout(默认值)
+取得本次调用的超时：默认值与剩余时间中较小的一个（限流等待用 acquire_token()）；截止时间已过时抛出 DeadlineExceeded，
+不再发起新请求，调用方改用手头已有的结果（例如规则引擎的建议）。
+
+线程池中的任务需要用 submit_with_deadline() 提交才能继承截止时间。
+"""
+import contextvars
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+MIN_TIMEOUT = 0.05  # 剩余时间不足时视为已到期（秒）
+
+# time.monotonic() 下的截止时刻，None 表示不限
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "weather_advisor_deadline", default=None
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """请求的截止时间已过"""
+
+    def __init__(self, message: str = "deadline exceeded"):
+        super().__init__(message)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """在 with 块内限定总耗时；外层已有更早的截止时间时以外层为准，seconds 为 None 时不限"""
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + max(0.0, seconds)
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """剩余秒数（可能为负）；没有截止时间时返回 None"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left < MIN_TIMEOUT
+
+
+def stage_timeout(default: float) -> float:
+    """本阶段可用的超时秒数；截止时间已过时抛出 DeadlineExceeded"""
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_TIMEOUT:
+        raise DeadlineExceeded()
+    return min(default, left)
+
+
+def acquire_token(limiter: Any) -> None:
+    """在剩余时间内从限流器取得令牌，等不到时抛出 DeadlineExceeded"""
+    left = remaining()
+    if left is None:
+        limiter.acquire()
+    elif left < MIN_TIMEOUT or not limiter.acquire(timeout=left):
+        raise DeadlineExceeded()
+
+
+def submit_with_deadline(executor: Executor, fn: Callable[..., Any], *args: Any) -> Future:
+    """提交到线程池，任务在提交时的上下文（含截止时间）中运行"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
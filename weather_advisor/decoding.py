@@ -0,0 +1,153 @@
+# weather_advisor/decoding.py
+"""
+服务端响应解码层
+优先使用 msgspec（直接解码为只含所需字段的结构体），其次 orjson，最后标准库 json。
+可通过环境变量 WEATHER_ADVISOR_JSON=msgspec|orjson|json 强制指定后端
+"""
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from weather_advisor.records import Observation
+
+try:
+    import msgspec
+except ImportError:  # 可选依赖
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+
+def _pick_backend() -> str:
+    available = {
+        "msgspec": msgspec is not None,
+        "orjson": orjson is not None,
+        "json": True,
+    }
+    forced = os.getenv("WEATHER_ADVISOR_JSON")
+    if forced in available and available[forced]:
+        return forced
+    for name in ("msgspec", "orjson", "json"):
+        if available[name]:
+            return name
+    return "json"
+
+
+BACKEND = _pick_backend()
+
+
+if msgspec is not None:
+    # 只声明用到的字段，其余字段在解码时直接跳过，不会创建 Python 对象
+
+    class _Main(msgspec.Struct):
+        temp: float
+        humidity: Optional[float] = None
+
+    class _Condition(msgspec.Struct):
+        description: str
+
+    class _Coord(msgspec.Struct):
+        lat: Optional[float] = None
+        lon: Optional[float] = None
+
+    class _Wind(msgspec.Struct):
+        speed: Optional[float] = None
+
+    class _WeatherPayload(msgspec.Struct):
+        main: _Main
+        weather: List[_Condition]
+        coord: Optional[_Coord] = None
+        wind: Optional[_Wind] = None
+        timezone: Optional[int] = None
+        name: str = ""
+
+    class _GroupPayload(msgspec.Struct):
+        list: List[_WeatherPayload]
+
+    class _OllamaPayload(msgspec.Struct):
+        response: str = ""
+
+    _weather_decoder = msgspec.json.Decoder(_WeatherPayload)
+    _group_decoder = msgspec.json.Decoder(_GroupPayload)
+    _ollama_decoder = msgspec.json.Decoder(_OllamaPayload)
+    _any_decoder = msgspec.json.Decoder()
+
+    def _observation_from_struct(p: "_WeatherPayload", city: Optional[str]) -> Observation:
+        coord = p.coord or _Coord()
+        return Observation(
+            city=city or p.name,
+            temp=p.main.temp,
+            desc=p.weather[0].description,
+            timezone=p.timezone,
+            lat=coord.lat,
+            lon=coord.lon,
+            humidity=p.main.humidity,
+            wind_speed=p.wind.speed if p.wind else None,
+        )
+
+
+def _msgspec_decode_weather(raw: bytes, city: Optional[str] = None) -> Observation:
+    """解码 /data/2.5/weather 响应，格式不合法时抛出 ValueError / KeyError"""
+    try:
+        p = _weather_decoder.decode(raw)
+    except msgspec.ValidationError as e:
+        raise KeyError(str(e)) from e
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+    if not p.weather:
+        raise KeyError("weather")
+    return _observation_from_struct(p, city)
+
+
+def _msgspec_decode_weather_list(raw: bytes) -> List[Observation]:
+    """解码包含 list 字段的响应（/group 等批量接口）"""
+    try:
+        group = _group_decoder.decode(raw)
+    except msgspec.ValidationError as e:
+        raise KeyError(str(e)) from e
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+    return [_observation_from_struct(p, None) for p in group.list]
+
+
+def _msgspec_decode_ollama_response(raw: bytes) -> str:
+    """
+    解码 Ollama /api/generate 非流式响应，只取 response 字段
+    （完整响应中的 context 数组通常有上千个整数）
+    """
+    try:
+        return _ollama_decoder.decode(raw).response
+    except msgspec.MsgspecError as e:
+        raise ValueError(str(e)) from e
+
+
+def _make_dict_decoders(loads: Callable[[bytes], Any]):
+    """基于通用 loads 的实现（orjson / 标准库 json）"""
+
+    def decode_weather(raw: bytes, city: Optional[str] = None) -> Observation:
+        return Observation.from_payload(loads(raw), city)
+
+    def decode_weather_list(raw: bytes) -> List[Observation]:
+        data: Dict[str, Any] = loads(raw)
+        return [Observation.from_payload(item) for item in data["list"]]
+
+    def decode_ollama_response(raw: bytes) -> str:
+        return loads(raw).get("response", "")
+
+    return decode_weather, decode_weather_list, decode_ollama_response
+
+
+# 导入时绑定所选后端的实现，调用时没有额外分支
+if BACKEND == "msgspec":
+    loads: Callable[[bytes], Any] = _any_decoder.decode
+    decode_weather = _msgspec_decode_weather
+    decode_weather_list = _msgspec_decode_weather_list
+    decode_ollama_response = _msgspec_decode_ollama_response
+else:
+    loads = orjson.loads if BACKEND == "orjson" else json.loads
+    decode_weather, decode_weather_list, decode_ollama_response = _make_dict_decoders(
+        loads
+    )
@@ -0,0 +1,240 @@
+# weather_advisor/environment.py
+"""
+空气质量与紫外线数据
+
+- 空气质量：OpenWeatherMap /data/2.5/air_pollution（AQI 1~5，另取 PM2.5）
+- 紫外线：One Call /data/3.0/onecall 的 current.uvi（需要单独订阅，未开通时返回 401，
+  失败结果同样缓存一段时间，不会每次都重新请求）
+两者都按坐标查询，分别带 TTL 缓存（空气质量每小时更新一次，紫外线变化更快）。
+
+observe() 代替 get_observation 使用：已知城市坐标时两个请求与天气查询同时发起，
+天气返回后最多再等待 ENV_GRACE 秒，未完成的请求在后台继续并写入缓存，下次直接命中。
+后台请求运行在守护线程上，单次运行的命令行不会在退出时等待它们。
+坐标来自离线地理编码索引（geocode.py）；索引中没有的城市需要先从天气响应中取得坐标，
+之后进程内记住。
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+from weather_advisor import advisor
+from weather_advisor.advisor import DEFAULT_OPENWEATHER_BASE_URL, get_observation
+from weather_advisor.deadline import DeadlineExceeded, acquire_token, remaining, stage_timeout
+from weather_advisor.decoding import loads
+from weather_advisor.geocode import lookup_place
+from weather_advisor.records import Observation
+from weather_advisor.throttle import SingleFlight
+
+AIR_TTL = 3600.0  # 空气质量缓存时间（秒）
+UV_TTL = 1800.0  # 紫外线缓存时间（秒）
+FAILURE_TTL = 600.0  # 查询失败后多久再重试（秒）
+ENV_GRACE = 0.25  # 天气返回后最多再等待的时间（秒）
+REQUEST_TIMEOUT = 5
+CALLS_PER_OBSERVE = 3  # observe() 最多发起的请求数（天气 + 空气质量 + 紫外线）
+
+_env_flight = SingleFlight()
+
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class AirQuality:
+    """aqi 为 OpenWeatherMap 的 1（良好）~ 5（很差）等级"""
+
+    aqi: int
+    pm2_5: Optional[float] = None
+
+
+class TTLCache:
+    """带过期时间的线程安全缓存；值为 None 表示查询失败，按 failure_ttl 过期"""
+
+    def __init__(
+        self,
+        ttl: float,
+        failure_ttl: float = FAILURE_TTL,
+        max_size: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._data: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """返回缓存值；不存在或已过期时返回 _MISSING"""
+        item = self._data.get(key)
+        if item is None or item[0] <= self._clock():
+            return _MISSING
+        return item[1]
+
+    def set(self, key: Any, value: Any) -> None:
+        ttl = self.ttl if value is not None else self.failure_ttl
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.max_size:
+                # 按插入顺序淘汰最早的一项
+                del self._data[next(iter(self._data))]
+            self._data[key] = (self._clock() + ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_air_cache = TTLCache(AIR_TTL)
+_uv_cache = TTLCache(UV_TTL)
+
+# 城市 -> 坐标（坐标不会变化，进程内一直保留）
+_coords: Dict[str, Tuple[float, float]] = {}
+
+def _spawn(fn: Callable[..., Any], *args: Any) -> Future:
+    """
+    在守护线程中执行 fn（继承当前上下文，含截止时间），返回 Future
+    不使用 ThreadPoolExecutor：解释器退出时会等待其工作线程，慢请求会拖住命令行的退出
+    """
+    future: Future = Future()
+    context = contextvars.copy_context()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(fn, *args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="environment", daemon=True).start()
+    return future
+
+
+def remember_coords(city: str, lat: float, lon: float) -> None:
+    _coords[city.lower()] = (lat, lon)
+
+
+def known_coords(city: str) -> Optional[Tuple[float, float]]:
+    """进程内记住的坐标，其次是离线地理编码索引"""
+    coords = _coords.get(city.lower())
+    if coords is None:
+        place = lookup_place(city)
+        if place is not None:
+            coords = _coords[city.lower()] = (place.lat, place.lon)
+    return coords
+
+
+def _get_json(path: str, params: Dict[str, Any]) -> Any:
+    base_url = os.getenv("OPENWEATHER_BASE_URL", DEFAULT_OPENWEATHER_BASE_URL)
+    # 与天气查询使用同一个 API 密钥，共用 OPENWEATHER_RATE_LIMIT 的配额
+    acquire_token(advisor._weather_limiter)
+    response = requests.get(
+        f"{base_url.rstrip('/')}{path}", params=params, timeout=stage_timeout(REQUEST_TIMEOUT)
+    )
+    response.raise_for_status()
+    return loads(response.content)
+
+
+def fetch_air_quality(lat: float, lon: float, api_key: str) -> AirQuality:
+    """查询空气质量（不使用缓存），失败时抛出异常"""
+    data = _get_json("/data/2.5/air_pollution", {"lat": lat, "lon": lon, "appid": api_key})
+    item = data["list"][0]
+    components = item.get("components") or {}
+    return AirQuality(int(item["main"]["aqi"]), components.get("pm2_5"))
+
+
+def fetch_uv_index(lat: float, lon: float, api_key: str) -> float:
+    """查询当前紫外线指数（不使用缓存），失败时抛出异常"""
+    data = _get_json(
+        "/data/3.0/onecall",
+        {"lat": lat, "lon": lon, "appid": api_key, "exclude": "minutely,hourly,daily,alerts"},
+    )
+    return float(data["current"]["uvi"])
+
+
+def _cached(cache: TTLCache, label: str, fetch, lat: float, lon: float, api_key: str):
+    key = (round(lat, 2), round(lon, 2))
+    value = cache.get(key)
+    if value is not _MISSING:
+        return value
+
+    def load():
+        try:
+            result = fetch(lat, lon, api_key)
+        except requests.exceptions.HTTPError as e:
+            # 401/403 表示 API 密钥未开通该接口，不提示
+            if e.response is None or e.response.status_code not in (401, 403):
+                print(f"⚠️ {label}数据获取失败: {e}", file=sys.stderr)
+            result = None
+        except (requests.exceptions.RequestException, KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"⚠️ {label}数据获取失败: {e}", file=sys.stderr)
+            result = None
+        cache.set(key, result)
+        return result
+
+    # 同一坐标的并发查询只发一次请求
+    try:
+        return _env_flight.do((label, key), load)
+    except DeadlineExceeded:
+        # 本次请求没有时间了，不算查询失败，也不缓存
+        return None
+
+
+def get_air_quality(lat: float, lon: float, api_key: str) -> Optional[AirQuality]:
+    """带缓存的空气质量，失败时返回 None"""
+    return _cached(_air_cache, "空气质量", fetch_air_quality, lat, lon, api_key)
+
+
+def get_uv_index(lat: float, lon: float, api_key: str) -> Optional[float]:
+    """带缓存的紫外线指数，失败时返回 None"""
+    return _cached(_uv_cache, "紫外线", fetch_uv_index, lat, lon, api_key)
+
+
+def _submit(lat: float, lon: float, api_key: str) -> Tuple[Future, Future]:
+    return (
+        _spawn(get_air_quality, lat, lon, api_key),
+        _spawn(get_uv_index, lat, lon, api_key),
+    )
+
+
+def observe(city: str, api_key: str, units: str = "metric") -> Optional[Observation]:
+    """
+    获取天气观测，并附加空气质量（aqi）和紫外线指数（uvi）
+    环境数据获取失败或未及时返回时对应字段为 None，不影响天气结果
+    返回新的观测对象：天气查询的结果可能被并发调用共享（SingleFlight），不能原地修改
+    """
+    coords = known_coords(city)
+    futures = _submit(coords[0], coords[1], api_key) if coords else None
+    obs = get_observation(city, api_key, units)
+    if obs is None:
+        return None
+    if obs.lat is not None and obs.lon is not None:
+        remember_coords(city, obs.lat, obs.lon)
+        if futures is None:
+            futures = _submit(obs.lat, obs.lon, api_key)
+    if futures is None:
+        return obs
+
+    # 不超过请求剩余的时间
+    left = remaining()
+    grace = ENV_GRACE if left is None else max(0.0, min(ENV_GRACE, left))
+    deadline = time.monotonic() + grace
+    air_future, uv_future = futures
+    aqi = uvi = None
+    try:
+        air = air_future.result(timeout=max(0.0, deadline - time.monotonic()))
+        aqi = air.aqi if air is not None else None
+    except FutureTimeout:
+        pass
+    try:
+        uvi = uv_future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        pass
+    return replace(obs, aqi=aqi, uvi=uvi)
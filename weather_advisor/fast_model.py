@@ -0,0 +1,192 @@
+# weather_advisor/fast_model.py
+"""
+fast 模式：基于历史 LLM 建议的检索模型（毫秒级，纯 CPU）
+
+从历史记录中取出 Ollama / OpenAI 生成过的建议，按（降雨, 温度桶）建立分桶索引。
+查询时只在「降雨状态相同、温度相近」的记录中打分：
+- 天气类别相同、同一城市、季节相同、时间段相同各加权分
+- 温差越小得分越高，温差超过 MAX_TEMP_GAP 的记录不参与
+最后在得分最高的几条不同建议中按得分随机选择一条，相同天气也能给出不同的说法。
+没有足够相近的历史建议时返回 None，由调用方回退到规则引擎。
+"""
+import bisect
+import heapq
+import random
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from weather_advisor.advice_table import CATEGORY_COUNT, weather_key
+from weather_advisor.clock import ClockContext, clock_for, current_clock
+from weather_advisor.history import HistoryEntry, HistoryStore, get_history_store
+
+# 作为语料的历史建议来源
+LLM_MODES = ["ollama", "local", "openai"]
+
+TEMP_BUCKET = 3.0  # 温度分桶宽度（°C）
+MAX_TEMP_GAP = 4.0  # 可接受的最大温差（°C）
+MAX_CANDIDATES = 2000  # 每次查询最多打分的记录数（取最新的）
+TOP_K = 5  # 在得分最高的几条不同建议中随机选择
+
+# 特征权重
+WEIGHT_CATEGORY = 3.0
+WEIGHT_CITY = 2.0
+WEIGHT_SEASON = 1.0
+WEIGHT_PERIOD = 1.0
+WEIGHT_TEMP = 2.0
+
+
+class _Doc:
+    """一条可检索的历史建议（只保留打分需要的字段）"""
+
+    __slots__ = ("ts", "temp", "category", "city", "season", "period", "suggestion")
+
+    def __init__(self, entry: HistoryEntry):
+        # 旧记录没有保存当地时间段和季节，按本机时间推算
+        local = time.localtime(entry.ts)
+        clock = clock_for(local.tm_hour, local.tm_mon)
+        self.ts = entry.ts
+        self.temp = entry.temp
+        self.category = weather_key(entry.desc) % CATEGORY_COUNT
+        self.city = entry.city.lower()
+        self.season = entry.season or clock.season
+        self.period = entry.period or clock.period
+        self.suggestion = entry.suggestion
+
+
+def _doc_ts(doc: _Doc) -> float:
+    return doc.ts
+
+
+class FastModel:
+    """单一语言的检索模型，后台数据增加时按 refresh_interval 增量加载"""
+
+    def __init__(
+        self,
+        lang: str,
+        store: Optional[HistoryStore] = None,
+        refresh_interval: float = 60.0,
+        seed: Optional[int] = None,
+    ):
+        self.lang = lang
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # (降雨, 温度桶) -> 按时间顺序排列的记录
+        self._buckets: Dict[Tuple[int, int], List[_Doc]] = defaultdict(list)
+        self._last_ts = 0.0
+        self._loaded_at: Optional[float] = None
+        self.size = 0
+
+    def add(self, entry: HistoryEntry) -> None:
+        """加入一条历史建议"""
+        doc = _Doc(entry)
+        rain = weather_key(entry.desc) // CATEGORY_COUNT
+        bucket = self._buckets[(rain, int(doc.temp // TEMP_BUCKET))]
+        if bucket and bucket[-1].ts > doc.ts:
+            # 乱序加入时插入到对应位置，保持桶内按时间排序
+            bucket.insert(bisect.bisect_right(bucket, doc.ts, key=_doc_ts), doc)
+        else:
+            bucket.append(doc)
+        self._last_ts = max(self._last_ts, entry.ts)
+        self.size += 1
+
+    def _stale(self, now: float) -> bool:
+        return self._loaded_at is None or now - self._loaded_at >= self.refresh_interval
+
+    def refresh(self, force: bool = False) -> None:
+        """从历史数据库增量加载新记录"""
+        if self.store is None:
+            return
+        now = time.monotonic()
+        if not (force or self._stale(now)):
+            return
+        with self._lock:
+            if not (force or self._stale(now)):
+                return
+            try:
+                entries = self.store.suggestions(self.lang, LLM_MODES, after=self._last_ts)
+            except sqlite3.Error as e:
+                print(f"⚠️ fast 模式语料加载失败: {e}")
+                entries = []
+            for entry in entries:
+                self.add(entry)
+            self._loaded_at = now
+
+    def _candidates(self, rain: int, temp: float) -> List[_Doc]:
+        bucket = int(temp // TEMP_BUCKET)
+        span = int(MAX_TEMP_GAP // TEMP_BUCKET) + 1
+        buckets = [
+            self._buckets[(rain, b)]
+            for b in range(bucket - span, bucket + span + 1)
+            if (rain, b) in self._buckets
+        ]
+        if sum(len(docs) for docs in buckets) <= MAX_CANDIDATES:
+            return [doc for docs in buckets for doc in docs]
+        # 各桶已按时间排序：从新到旧归并，取所有桶中最新的记录
+        newest = heapq.merge(*(reversed(docs) for docs in buckets), key=_doc_ts, reverse=True)
+        return list(islice(newest, MAX_CANDIDATES))
+
+    def suggest(
+        self, city: str, temp: float, desc: str, clock: Optional[ClockContext] = None
+    ) -> Optional[str]:
+        """返回最相近的历史建议之一；没有足够相近的记录时返回 None"""
+        self.refresh()
+        clock = clock or current_clock()
+        rain, category = divmod(weather_key(desc), CATEGORY_COUNT)
+        city_lower = city.lower()
+
+        best: Dict[str, float] = {}
+        for doc in self._candidates(rain, temp):
+            gap = abs(doc.temp - temp)
+            if gap > MAX_TEMP_GAP:
+                continue
+            score = WEIGHT_TEMP * (1 - gap / MAX_TEMP_GAP)
+            if doc.category == category:
+                score += WEIGHT_CATEGORY
+            if doc.city == city_lower:
+                score += WEIGHT_CITY
+            if doc.season == clock.season:
+                score += WEIGHT_SEASON
+            if doc.period == clock.period:
+                score += WEIGHT_PERIOD
+            # 同一条建议只保留最高得分
+            if score > best.get(doc.suggestion, 0.0):
+                best[doc.suggestion] = score
+
+        if not best:
+            return None
+        top = sorted(best.items(), key=lambda item: item[1], reverse=True)[:TOP_K]
+        with self._lock:
+            return self._rng.choices([s for s, _ in top], weights=[w for _, w in top])[0]
+
+
+_models: Dict[str, FastModel] = {}
+_models_lock = threading.Lock()
+
+
+def get_fast_model(lang: str) -> FastModel:
+    """返回进程内共享的指定语言模型（首次使用时从历史记录加载）"""
+    model = _models.get(lang)
+    if model is None:
+        with _models_lock:
+            model = _models.get(lang)
+            if model is None:
+                model = FastModel(lang, get_history_store())
+                _models[lang] = model
+    return model
+
+
+def fast_suggestion(
+    city: str,
+    temp: float,
+    desc: str,
+    lang: str = "ja",
+    clock: Optional[ClockContext] = None,
+) -> Optional[str]:
+    """fast 模式入口"""
+    return get_fast_model(lang).suggest(city, temp, desc, clock)
@@ -0,0 +1,353 @@
+# weather_advisor/geocode.py
+"""
+城市名 -> 坐标的离线索引
+
+python -m weather_advisor.geocode cities.txt 预先用 OpenWeatherMap 地理编码接口
+（/geo/1.0/direct）批量解析城市名（并发 + 限流），写入紧凑的二进制索引文件。
+运行时以只读方式内存映射该文件，按名称二分查找：
+- 天气查询改用 lat/lon 参数，不再依赖服务端按名称解析
+- 空气质量 / 紫外线在首次查询城市时就能与天气并发获取
+索引中没有的城市照常按名称查询。
+
+文件格式（小端）：
+    头部    MAGIC(8) 版本(u32) 记录数(u32)
+    记录    按 (名称哈希, 名称) 排序的定长记录
+            哈希(u64) lat(f64) lon(f64) 国家(2s) 键偏移(u32) 键长(u16) 名称偏移(u32) 名称长(u16)
+    字符串表 UTF-8，偏移相对字符串表起点
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import requests
+
+from weather_advisor.decoding import loads
+from weather_advisor.throttle import TokenBucket
+from weather_advisor.utils import normalize_city
+
+GEOCODE_PATH = os.getenv(
+    "WEATHER_ADVISOR_GEOCODE", os.path.expanduser("~/.weather_advisor_geocode.idx")
+)
+
+MAGIC = b"WAGEOIDX"
+VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_RECORD = struct.Struct("<Qdd2sIHIH")
+_HASH = struct.Struct("<Q")
+
+REQUEST_TIMEOUT = 10
+
+
+class Place(NamedTuple):
+    """解析结果：name 为地理编码接口返回的标准名称，country 为 ISO 国家代码"""
+
+    name: str
+    country: str
+    lat: float
+    lon: float
+
+
+def geocode_key(city: str) -> str:
+    """索引键：先做常用别名映射，再忽略大小写和首尾空白"""
+    return normalize_city(city.strip()).strip().casefold()
+
+
+def _hash(key: bytes) -> int:
+    return _HASH.unpack(hashlib.blake2b(key, digest_size=8).digest())[0]
+
+
+class GeocodeIndex:
+    """内存映射的只读索引，查找为 O(log n)，不把记录读入 Python 对象"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            magic, version, count = b"", 0, 0
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"不是有效的地理编码索引: {path}")
+        self._count = count
+        self._strings = _HEADER.size + count * _RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record(self, i: int) -> tuple:
+        return _RECORD.unpack_from(self._mm, _HEADER.size + i * _RECORD.size)
+
+    def _text(self, offset: int, length: int) -> bytes:
+        start = self._strings + offset
+        return self._mm[start:start + length]
+
+    def _place(self, record: tuple) -> Place:
+        _, lat, lon, country, _, _, name_off, name_len = record
+        return Place(
+            self._text(name_off, name_len).decode("utf-8"), country.decode("ascii"), lat, lon
+        )
+
+    def lookup(self, city: str) -> Optional[Place]:
+        """按城市名查找，没有时返回 None"""
+        key = geocode_key(city).encode("utf-8")
+        h = _hash(key)
+        # 找到第一个哈希 >= h 的记录
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _HASH.unpack_from(self._mm, _HEADER.size + mid * _RECORD.size)[0] < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        # 哈希相同的记录再比较完整的键
+        for i in range(lo, self._count):
+            record = self._record(i)
+            if record[0] != h:
+                break
+            if self._text(record[4], record[5]) == key:
+                return self._place(record)
+        return None
+
+    def items(self) -> Iterator[Tuple[str, Place]]:
+        """遍历全部 (键, 地点)"""
+        for i in range(self._count):
+            record = self._record(i)
+            yield self._text(record[4], record[5]).decode("utf-8"), self._place(record)
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def write_index(path: str, places: Dict[str, Place]) -> None:
+    """原子写出索引文件，places 的键为 geocode_key() 处理后的名称"""
+    strings = bytearray()
+    offsets: Dict[bytes, int] = {}
+
+    def intern(text: bytes) -> int:
+        offset = offsets.get(text)
+        if offset is None:
+            offset = offsets[text] = len(strings)
+            strings.extend(text)
+        return offset
+
+    rows = []
+    for key, place in places.items():
+        key_bytes = key.encode("utf-8")
+        name_bytes = place.name.encode("utf-8")
+        rows.append(
+            (
+                _hash(key_bytes),
+                key_bytes,
+                place.lat,
+                place.lon,
+                place.country.encode("ascii", "replace")[:2].ljust(2),
+                intern(key_bytes),
+                intern(name_bytes),
+                len(name_bytes),
+            )
+        )
+    rows.sort(key=lambda row: (row[0], row[1]))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(rows)))
+        for h, key_bytes, lat, lon, country, key_off, name_off, name_len in rows:
+            f.write(
+                _RECORD.pack(h, lat, lon, country, key_off, len(key_bytes), name_off, name_len)
+            )
+        f.write(strings)
+    os.replace(tmp_path, path)
+
+
+_index: Optional[GeocodeIndex] = None
+_index_stamp: Optional[tuple] = None
+_index_lock = threading.Lock()
+
+
+def get_geocode_index(path: Optional[str] = None) -> Optional[GeocodeIndex]:
+    """
+    返回进程内共享的索引；文件不存在时返回 None
+    重新生成索引后（文件被替换）自动重新映射
+    """
+    global _index, _index_stamp
+    path = path or GEOCODE_PATH
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    if stamp == _index_stamp:
+        return _index
+    with _index_lock:
+        if stamp != _index_stamp:
+            try:
+                _index = GeocodeIndex(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 地理编码索引读取失败: {e}", file=sys.stderr)
+                _index = None
+            _index_stamp = stamp
+    return _index
+
+
+def lookup_place(city: str) -> Optional[Place]:
+    """运行时查找城市坐标（只读本地索引，不访问网络）"""
+    index = get_geocode_index()
+    return index.lookup(city) if index is not None else None
+
+
+def fetch_place(city: str, api_key: str) -> Optional[Place]:
+    """调用地理编码接口解析一个城市名；找不到时返回 None，请求失败时抛出异常"""
+    # advisor 在运行时依赖本模块，这里延迟导入
+    from weather_advisor.advisor import DEFAULT_OPENWEATHER_BASE_URL
+
+    base_url = os.getenv("OPENWEATHER_BASE_URL", DEFAULT_OPENWEATHER_BASE_URL)
+    response = requests.get(
+        f"{base_url.rstrip('/')}/geo/1.0/direct",
+        params={"q": city, "limit": 1, "appid": api_key},
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    results = loads(response.content)
+    if not results:
+        return None
+    item = results[0]
+    return Place(item["name"], item.get("country", ""), float(item["lat"]), float(item["lon"]))
+
+
+def resolve_places(
+    names: Iterable[str],
+    api_key: str,
+    workers: int = 8,
+    rate_per_minute: float = 60.0,
+    existing: Optional[Dict[str, Place]] = None,
+) -> Tuple[Dict[str, Place], List[str]]:
+    """
+    并发解析城市名（已在 existing 中的跳过）
+    返回: (键 -> 地点, 未能解析的名称)
+    标准名称也作为键加入，之后按标准名称查询同样命中
+    """
+    places = dict(existing or {})
+    pending: Dict[str, str] = {}
+    for name in names:
+        key = geocode_key(name)
+        if key and key not in places and key not in pending:
+            pending[key] = normalize_city(name.strip())
+    # 突发量固定为 1，与并发数无关：任意 60 秒内的请求数不超过 rate_per_minute
+    limiter = TokenBucket.per_minute(rate_per_minute)
+
+    def resolve(name: str) -> Optional[Place]:
+        limiter.acquire()
+        try:
+            return fetch_place(name, api_key)
+        except (requests.exceptions.RequestException, KeyError, TypeError, ValueError) as e:
+            print(f"⚠️ {name}: {e}", file=sys.stderr)
+            return None
+
+    failed: List[str] = []
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        results = pool.map(resolve, pending.values())
+        for (key, name), place in zip(pending.items(), results):
+            if place is None:
+                failed.append(name)
+                continue
+            places[key] = place
+            places.setdefault(geocode_key(place.name), place)
+    return places, failed
+
+
+def refresh_names(names: Sequence[str], existing: Dict[str, Place]) -> List[str]:
+    """--refresh 时要解析的名称：指定的城市 + 索引中已有地点的标准名称（去重）"""
+    result = list(names)
+    seen = {geocode_key(name) for name in names}
+    for place in existing.values():
+        key = geocode_key(place.name)
+        if key not in seen:
+            seen.add(key)
+            result.append(place.name)
+    return result
+
+
+def read_names(paths: Sequence[str], names: Sequence[str]) -> List[str]:
+    """命令行中的城市名 + 列表文件（每行一个，# 开头为注释）"""
+    result = list(names)
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            result.extend(
+                line.strip() for line in f if line.strip() and not line.startswith("#")
+            )
+    return result
+
+
+def parse_args():
+    """命令行参数解析"""
+    parser = argparse.ArgumentParser(description="批量解析城市坐标并生成地理编码索引")
+    parser.add_argument("cities", nargs="*", help="城市名")
+    parser.add_argument(
+        "--cities-file", action="append", default=[], help="城市列表文件（可多次指定）"
+    )
+    parser.add_argument("--output", "-o", default=GEOCODE_PATH, help="索引文件路径")
+    parser.add_argument("--workers", type=int, default=8, help="并发请求数")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=float(os.getenv("OPENWEATHER_RATE_LIMIT", "60")),
+        help="每分钟请求数上限（默认 OPENWEATHER_RATE_LIMIT）",
+    )
+    parser.add_argument("--refresh", action="store_true", help="重新解析索引中已有的城市")
+    return parser.parse_args()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args = parse_args()
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        print("❌ 未找到 API 密钥，请在 .env 文件中设置 OPENWEATHER_API_KEY", file=sys.stderr)
+        sys.exit(1)
+    names = read_names(args.cities_file, args.cities)
+
+    existing: Dict[str, Place] = {}
+    if os.path.exists(args.output):
+        try:
+            index = GeocodeIndex(args.output)
+        except ValueError as e:
+            print(f"⚠️ {e}，将重新生成", file=sys.stderr)
+        else:
+            existing = dict(index.items())
+            index.close()
+    if not names and not (args.refresh and existing):
+        print("❌ 未指定城市", file=sys.stderr)
+        sys.exit(1)
+
+    if args.refresh:
+        # 索引中已有的城市一并重新解析，解析失败的保留旧结果
+        places, failed = resolve_places(
+            refresh_names(names, existing), api_key, workers=args.workers, rate_per_minute=args.rate
+        )
+        for key, place in existing.items():
+            places.setdefault(key, place)
+    else:
+        places, failed = resolve_places(
+            names, api_key, workers=args.workers, rate_per_minute=args.rate, existing=existing
+        )
+    write_index(args.output, places)
+    print(
+        f"✅ 索引 {len(places)} 个名称（新增 {len(places) - len(existing)}，失败 {len(failed)}）: {args.output}",
+        file=sys.stderr,
+    )
+    if failed:
+        print(f"⚠️ 未能解析: {', '.join(failed)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
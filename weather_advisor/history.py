@@ -0,0 +1,272 @@
+# weather_advisor/history.py
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import astuple, dataclass
+from typing import Iterator, List, Optional
+
+HISTORY_PATH = os.getenv(
+    "WEATHER_ADVISOR_HISTORY", os.path.expanduser("~/.weather_advisor_history.db")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS advice (
+    ts REAL NOT NULL,
+    city TEXT NOT NULL COLLATE NOCASE,
+    temp REAL NOT NULL,
+    desc TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    suggestion TEXT NOT NULL,
+    humidity REAL,
+    wind_speed REAL,
+    period TEXT,
+    season TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_advice_city_ts ON advice (city, ts);
+CREATE INDEX IF NOT EXISTS idx_advice_ts ON advice (ts);
+"""
+
+_COLUMNS = (
+    "ts, city, temp, desc, lang, mode, suggestion, humidity, wind_speed, period, season"
+)
+_PLACEHOLDERS = ", ".join("?" * len(_COLUMNS.split(",")))
+
+# 旧版本数据库中没有的列（打开时自动补上）
+_ADDED_COLUMNS = (("period", "TEXT"), ("season", "TEXT"))
+
+_STOP = object()
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    """一条已输出的建议"""
+
+    ts: float
+    city: str
+    temp: float
+    desc: str
+    lang: str
+    mode: str
+    suggestion: str
+    humidity: Optional[float] = None
+    wind_speed: Optional[float] = None
+    period: Optional[str] = None  # 城市当地的时间段和季节（见 clock.py）
+    season: Optional[str] = None
+
+
+class HistoryStore:
+    """
+    本地建议历史（SQLite WAL，只追加）
+    - 创建时不访问文件，数据库在第一次读写时才打开（只写入的命令行运行在后台线程中打开）
+    - record() 只把记录放入队列，由后台线程批量写入，不阻塞调用方
+    - 按 (city, ts) 建索引，百万级数据下按城市和时间范围查询依然很快
+    """
+
+    def __init__(
+        self,
+        path: str = HISTORY_PATH,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._warned = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用自己的连接（WAL 模式下读写互不阻塞），第一次连接时建表"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                self._ensure_schema(conn)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn.executescript(_SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(advice)")}
+            for name, sql_type in _ADDED_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE advice ADD COLUMN {name} {sql_type}")
+            self._schema_ready = True
+
+    def _warn(self, error: sqlite3.Error) -> None:
+        """数据库不可用时只提示一次（写到 stderr，不影响 JSONL 输出）"""
+        if not self._warned:
+            self._warned = True
+            print(f"⚠️ 历史记录数据库不可用: {error}", file=sys.stderr)
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="history-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        try:
+            conn: Optional[sqlite3.Connection] = self._connect()
+        except sqlite3.Error as e:
+            # 无法打开时丢弃记录，不影响建议输出
+            self._warn(e)
+            conn = None
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, taken = [], 1
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+            # 收集一批记录，最多等待 flush_interval 秒
+            deadline = time.monotonic() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            if batch and conn is not None:
+                try:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT INTO advice ({_COLUMNS}) VALUES ({_PLACEHOLDERS})",
+                            [astuple(entry) for entry in batch],
+                        )
+                except sqlite3.Error as e:
+                    self._warn(e)
+            for _ in range(taken):
+                self._queue.task_done()
+
+    def record(self, entry: HistoryEntry) -> None:
+        """追加一条记录（异步写入）"""
+        self._ensure_writer()
+        self._queue.put(entry)
+
+    def flush(self) -> None:
+        """等待队列中的记录全部写入"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """写完剩余记录并停止后台线程"""
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+
+    def query(
+        self,
+        city: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        lang: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[HistoryEntry]:
+        """按城市和时间范围查询（新的在前）"""
+        sql = f"SELECT {_COLUMNS} FROM advice WHERE city = ? AND ts >= ? AND ts <= ?"
+        params: list = [city, since or 0.0, until or time.time()]
+        if lang:
+            sql += " AND lang = ?"
+            params.append(lang)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        try:
+            rows = self._connect().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self._warn(e)
+            return []
+        return [HistoryEntry(*row) for row in rows]
+
+    def suggestions(
+        self,
+        lang: str,
+        modes: List[str],
+        after: float = 0.0,
+        limit: int = 50000,
+    ) -> List[HistoryEntry]:
+        """按时间顺序返回 after 之后指定模式生成的建议（最多 limit 条最新记录）"""
+        sql = (
+            f"SELECT {_COLUMNS} FROM ("
+            f"SELECT {_COLUMNS} FROM advice WHERE ts > ? AND lang = ?"
+            f" AND mode IN ({', '.join('?' * len(modes))})"
+            " ORDER BY ts DESC LIMIT ?) ORDER BY ts"
+        )
+        try:
+            rows = self._connect().execute(sql, [after, lang, *modes, limit]).fetchall()
+        except sqlite3.Error as e:
+            self._warn(e)
+            return []
+        return [HistoryEntry(*row) for row in rows]
+
+    def iter_suggestions(
+        self,
+        lang: str,
+        modes: List[str],
+        after: float = 0.0,
+        page_size: int = 5000,
+    ) -> Iterator[HistoryEntry]:
+        """按时间顺序分页返回 after 之后指定模式生成的全部建议（没有条数上限）"""
+        sql = (
+            f"SELECT rowid, {_COLUMNS} FROM advice WHERE (ts > ? OR (ts = ? AND rowid > ?))"
+            f" AND lang = ? AND mode IN ({', '.join('?' * len(modes))})"
+            " ORDER BY ts, rowid LIMIT ?"
+        )
+        # (ts, rowid) 键集分页：同一时间戳的记录跨页也不会遗漏
+        last_ts, last_rowid = after, sys.maxsize
+        while True:
+            try:
+                rows = self._connect().execute(
+                    sql, [last_ts, last_ts, last_rowid, lang, *modes, page_size]
+                ).fetchall()
+            except sqlite3.Error as e:
+                self._warn(e)
+                return
+            for row in rows:
+                yield HistoryEntry(*row[1:])
+            if len(rows) < page_size:
+                return
+            last_rowid, last_ts = rows[-1][0], rows[-1][1]
+
+
+_default_store: Optional[HistoryStore] = None
+
+
+def get_history_store() -> HistoryStore:
+    """返回进程内共享的历史存储（数据库在第一次读写时才打开，无法打开时读到空结果）"""
+    global _default_store
+    if _default_store is None:
+        _default_store = HistoryStore()
+        # 进程退出前写完队列中的记录
+        atexit.register(_default_store.close)
+    return _default_store
@@ -0,0 +1,258 @@
+# weather_advisor/ipc.py
+"""
+命令行与常驻进程之间的 Unix 域套接字通信
+
+python main.py --serve 启动常驻进程，解释器、配置、历史索引和 HTTP 连接保持热状态。
+之后每次运行 python main.py ... 只导入本模块（仅使用标准库），把命令行参数发给
+常驻进程并打印返回的输出。以下情况回退到在本进程内执行：
+- 常驻进程没有运行
+- 参数需要读取标准输入（--input-jsonl），或指定了 --no-daemon / --profile
+- 本进程设置的环境变量与常驻进程不一致（例如指向另一个历史数据库）
+
+协议：客户端发送一行 JSON {"argv": [...], "env": {...}}，服务端执行后返回一行
+{"stdout": "...", "stderr": "...", "code": 0}，或 {"fallback": "原因"} 表示由客户端自行执行。
+常驻进程最多同时执行 MAX_CONCURRENT 个请求，每个请求的输出写入各自的缓冲区
+（按 contextvar 转发，后台线程的输出仍写到常驻进程自己的终端）。
+常驻进程在 DAEMON_TIMEOUT 秒内没有返回结果时，客户端改为在本进程内执行。
+"""
+import contextlib
+import contextvars
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from typing import Callable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+SOCKET_PATH = os.getenv(
+    "WEATHER_ADVISOR_SOCKET", os.path.expanduser("~/.weather_advisor.sock")
+)
+
+# 影响执行结果的环境变量，客户端设置了的必须与常驻进程一致
+ENV_PREFIXES = ("WEATHER_ADVISOR_", "OPENWEATHER_", "OLLAMA_", "OPENAI_", "IP_LOOKUP_", "DEBUG_MODE")
+# 只在本进程执行的参数（--profile 的输出目录相对于当前进程）
+LOCAL_ONLY_FLAGS = ("--serve", "--no-daemon", "--input-jsonl", "--profile")
+
+CONNECT_TIMEOUT = 0.2  # 连接常驻进程的超时（秒）
+# 等待常驻进程返回结果的超时（秒），超时后在本进程内执行
+DAEMON_TIMEOUT = float(os.getenv("WEATHER_ADVISOR_DAEMON_TIMEOUT", "120"))
+MAX_CONCURRENT = 8  # 常驻进程同时执行的请求数上限，超出的请求排队
+
+# 当前请求的 (stdout, stderr) 缓冲区；None 表示不在请求中
+_request_output: contextvars.ContextVar[Optional[Tuple[TextIO, TextIO]]] = contextvars.ContextVar(
+    "weather_advisor_request_output", default=None
+)
+_install_lock = threading.Lock()
+
+
+class _RoutedStream(io.TextIOBase):
+    """
+    代替 sys.stdout / sys.stderr：请求中的输出写入该请求的缓冲区，
+    其余输出（后台线程、常驻进程自身的日志）写到原来的流
+    """
+
+    def __init__(self, index: int, fallback: TextIO):
+        self._index = index
+        self._fallback = fallback
+
+    def _target(self) -> TextIO:
+        streams = _request_output.get()
+        return self._fallback if streams is None else streams[self._index]
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return _request_output.get() is None and self._fallback.isatty()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self._fallback, "encoding", None) or "utf-8"
+
+
+def _install_routing() -> None:
+    with _install_lock:
+        if not isinstance(sys.stdout, _RoutedStream):
+            sys.stdout = _RoutedStream(0, sys.stdout)
+        if not isinstance(sys.stderr, _RoutedStream):
+            sys.stderr = _RoutedStream(1, sys.stderr)
+
+
+@contextlib.contextmanager
+def stdout_to_stderr() -> Iterator[None]:
+    """
+    把标准输出改写到标准错误（JSON 输出模式下保证 stdout 只有 JSON）
+    常驻进程中只作用于当前请求，不影响并发执行的其他请求
+    """
+    streams = _request_output.get()
+    if streams is None:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+        return
+    token = _request_output.set((streams[1], streams[1]))
+    try:
+        yield
+    finally:
+        _request_output.reset(token)
+
+
+def _client_env() -> dict:
+    return {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith(ENV_PREFIXES) and key != "WEATHER_ADVISOR_SOCKET"
+    }
+
+
+def _local_only(argv: Sequence[str]) -> bool:
+    """
+    是否包含只在本进程执行的参数
+    兼容 --flag=值 的写法和 argparse 的前缀缩写（例如 --prof DIR）
+    """
+    for arg in argv:
+        if arg == "--":
+            break
+        name = arg.split("=", 1)[0]
+        if len(name) > 2 and name.startswith("--") and any(
+            flag.startswith(name) for flag in LOCAL_ONLY_FLAGS
+        ):
+            return True
+    return False
+
+
+def run_via_daemon(argv: Sequence[str], path: Optional[str] = None) -> Optional[int]:
+    """
+    交给常驻进程执行并输出结果，返回退出码
+    需要在本进程执行时返回 None
+    """
+    if os.getenv("WEATHER_ADVISOR_NO_DAEMON") or _local_only(argv):
+        return None
+    path = path or SOCKET_PATH
+    if not os.path.exists(path):
+        return None
+    request = json.dumps({"argv": list(argv), "env": _client_env()}, ensure_ascii=False)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(DAEMON_TIMEOUT)
+            sock.sendall(request.encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        response = json.loads(line)
+    except KeyboardInterrupt:
+        print("\n\n👋 さようなら！")
+        return 0
+    except (OSError, ValueError):
+        # 常驻进程已退出、中途断开或超时未返回
+        return None
+    if "fallback" in response:
+        return None
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stdout.flush()
+    sys.stderr.write(response.get("stderr", ""))
+    sys.stderr.flush()
+    return response.get("code", 0)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "AdvisorServer"
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        response = self.server.execute(request)
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class AdvisorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    常驻进程的套接字服务
+    runner(argv) 执行一次命令行调用，输出写到 sys.stdout / sys.stderr
+    """
+
+    daemon_threads = True
+
+    def __init__(self, runner: Callable[[List[str]], Optional[int]], path: str = SOCKET_PATH):
+        self.runner = runner
+        self.path = path
+        # 限制同时执行的请求数，超出的请求排队等待
+        self._slots = threading.BoundedSemaphore(MAX_CONCURRENT)
+        self._remove_stale(path)
+        # 套接字只允许当前用户连接
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    @staticmethod
+    def _remove_stale(path: str) -> None:
+        """删除上次异常退出留下的套接字文件；已有常驻进程在运行时报错"""
+        if not os.path.exists(path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(path)
+            except OSError:
+                os.unlink(path)
+                return
+        raise OSError(f"常驻进程已在运行: {path}")
+
+    def execute(self, request: dict) -> dict:
+        env = request.get("env") or {}
+        mismatch = sorted(key for key, value in env.items() if os.environ.get(key) != value)
+        if mismatch:
+            return {"fallback": f"environment differs: {', '.join(mismatch)}"}
+        _install_routing()
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with self._slots:
+            # 每个请求的输出写入自己的缓冲区（经 contextvar 传给它提交的线程池任务）
+            token = _request_output.set((stdout, stderr))
+            try:
+                code = self.runner(list(request.get("argv") or [])) or 0
+            except SystemExit as e:
+                # argparse 的 --help 和参数错误
+                if e.code is None or isinstance(e.code, int):
+                    code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    code = 1
+            finally:
+                _request_output.reset(token)
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.path)
+
+
+def serve(runner: Callable[[List[str]], Optional[int]], path: str = SOCKET_PATH) -> None:
+    """启动常驻进程直到 Ctrl+C"""
+    try:
+        server = AdvisorServer(runner, path)
+    except OSError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return
+    print(f"🔌 常驻进程已启动: {path}", file=sys.stderr)
+    if threading.current_thread() is threading.main_thread():
+        # SIGTERM 与 Ctrl+C 一样正常退出并删除套接字文件
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
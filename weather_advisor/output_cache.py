@@ -0,0 +1,156 @@
+# weather_advisor/output_cache.py
+"""
+常驻服务的响应缓存
+
+同一城市、语言在一次天气刷新周期内会被反复请求。最终的响应体按
+（城市, 观测版本, 语言, 建议模式, 时钟分段, 格式）缓存，并附带 ETag / Last-Modified：
+- 客户端带 If-None-Match / If-Modified-Since 重新验证时返回 304，不再传输响应体
+- 被请求达到 compress_after 次的热门条目预先压缩（gzip；安装了 brotli 时同时生成 br），
+  之后按 Accept-Encoding 直接返回压缩好的字节串
+条目数超过 max_entries 时淘汰最久未使用的条目；观测更新后版本号变化，旧条目随之被淘汰。
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+COMPRESS_AFTER = 2  # 第几次请求时预先压缩
+MIN_COMPRESS_SIZE = 256  # 小于该字节数的响应不压缩
+ENCODINGS = ("br", "gzip")  # 协商时的优先顺序
+
+
+@dataclass(slots=True)
+class Rendered:
+    """一个缓存的响应：原始字节串、校验信息和预先压缩的版本"""
+
+    body: bytes
+    content_type: str
+    etag: str
+    mtime: float
+    last_modified: str
+    hits: int = 0
+    # 编码名 -> 压缩后的字节串（整体替换）
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+def make_rendered(body: bytes, content_type: str, mtime: float) -> Rendered:
+    # 同一内容的各种压缩版本语义相同，使用弱 ETag
+    etag = f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    return Rendered(body, content_type, etag, mtime, formatdate(mtime, usegmt=True))
+
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    encoded = {"gzip": gzip.compress(body, compresslevel=6, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body)
+    return encoded
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Dict[str, bytes]) -> Optional[str]:
+    """按 Accept-Encoding 选择已有的压缩版本，没有可用的返回 None（原样发送）"""
+    if not accept_encoding or not available:
+        return None
+    accepted = {}
+    for token in accept_encoding.split(","):
+        name, _, params = token.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for name in ENCODINGS:
+        if name in available and accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+    return None
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(
+    item: Rendered, if_none_match: Optional[str], if_modified_since: Optional[str]
+) -> bool:
+    """条件请求是否可以返回 304（If-None-Match 优先，使用弱比较）"""
+    if if_none_match is not None:
+        tags = [_opaque(tag) for tag in if_none_match.split(",")]
+        return "*" in tags or _opaque(item.etag) in tags
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP 日期精确到秒
+        return int(item.mtime) <= since
+    return False
+
+
+class OutputCache:
+    """线程安全的 LRU 响应缓存"""
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        compress_after: int = COMPRESS_AFTER,
+        min_size: int = MIN_COMPRESS_SIZE,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.compress_after = compress_after
+        self.min_size = min_size
+        self._items: "OrderedDict[Hashable, Rendered]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compressed = 0
+
+    def get(
+        self, key: Hashable, render: Callable[[], Tuple[bytes, str, float]]
+    ) -> Rendered:
+        """
+        返回 key 对应的响应，未缓存时调用 render() -> (body, content_type, mtime) 生成
+        渲染在锁外进行，并发的首次请求可能各自渲染一次，结果相同
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                item.hits += 1
+                self.hits += 1
+        if item is None:
+            body, content_type, mtime = render()
+            fresh = make_rendered(body, content_type, mtime)
+            with self._lock:
+                item = self._items.setdefault(key, fresh)
+                self._items.move_to_end(key)
+                item.hits += 1
+                self.misses += 1
+                while len(self._items) > self.max_entries:
+                    self._items.popitem(last=False)
+        if item.hits >= self.compress_after and not item.encoded and len(item.body) >= self.min_size:
+            item.encoded = compress(item.body)
+            self.compressed += 1
+        return item
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "compressed": self.compressed,
+            }
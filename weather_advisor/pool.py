@@ -0,0 +1,211 @@
+# weather_advisor/pool.py
+"""
+同步 API 的线程池执行层
+
+线程数建议：
+- OpenWeatherMap / IP 定位 / OpenAI 都是网络 I/O，线程大部分时间在等待响应，
+  io_workers 可以远大于 CPU 核数（默认 min(32, 4×CPU)）。但天气请求还受
+  OPENWEATHER_RATE_LIMIT 限流，线程再多也只是在令牌桶前排队，
+  一般设置为「期望并发请求数」即可，例如 16~32。
+- 本地 Ollama 推理占满 CPU/GPU，服务端默认一次只处理少量请求
+  （OLLAMA_NUM_PARALLEL），多开线程只会在服务端排队并拖长每个请求的延迟、
+  更容易触发超时。ai_workers 默认 1，应与 OLLAMA_NUM_PARALLEL 保持一致。
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, List, Optional
+
+from weather_advisor.advisor import get_weather
+from weather_advisor.ai_suggester import get_ai_suggestion
+from weather_advisor.deadline import deadline_scope, remaining, submit_with_deadline
+from weather_advisor.utils import get_city_by_ip
+
+
+class PoolFullError(RuntimeError):
+    """等待中的任务已达到上限"""
+
+
+class _Watchdog:
+    """单线程定时器：到期时让尚未完成的 Future 以 TimeoutError 结束"""
+
+    def __init__(self):
+        self._heap: list = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="advisor-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def add(self, deadline: float, future: Future) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._counter), future))
+            self._cond.notify()
+
+    def _run(self) -> None:
+        with self._cond:
+            while not self._closed:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, _, future = self._heap[0]
+                wait = deadline - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                if not future.done():
+                    _set_exception(future, TimeoutError())
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+def _set_exception(future: Future, exc: BaseException) -> None:
+    try:
+        future.set_exception(exc)
+    except Exception:  # 已被其他线程设置结果
+        pass
+
+
+class AdvisorPool:
+    """
+    把 get_weather / get_ai_suggestion / get_city_by_ip 提交到线程池，返回 Future
+
+    - max_pending: 同时排队 + 执行中的任务上限，超过时 submit 阻塞（block=True）
+      或抛出 PoolFullError（block=False）
+    - timeout: 单次调用的超时秒数，超时后 Future 以 TimeoutError 结束，任务内的 HTTP 请求
+      也按该时间截止；未指定时使用当前请求的剩余时间（见 deadline.py）
+    - Future.cancel(): 尚未开始的任务直接取消；已开始的任务结果会被丢弃
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        io_workers: Optional[int] = None,
+        ai_workers: int = 1,
+        max_pending: int = 256,
+    ):
+        self.api_key = api_key or os.getenv("OPENWEATHER_API_KEY")
+        io_workers = io_workers or min(32, 4 * (os.cpu_count() or 1))
+        self._io = ThreadPoolExecutor(io_workers, thread_name_prefix="advisor-io")
+        self._ai = ThreadPoolExecutor(ai_workers, thread_name_prefix="advisor-ai")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._watchdog = _Watchdog()
+
+    def _submit(
+        self,
+        executor: ThreadPoolExecutor,
+        fn: Callable[..., Any],
+        args: tuple,
+        timeout: Optional[float],
+        block: bool,
+    ) -> Future:
+        if not self._slots.acquire(blocking=block):
+            raise PoolFullError("任务队列已满")
+
+        outer: Future = Future()
+        if timeout is None:
+            timeout = remaining()
+        at = None if timeout is None else time.monotonic() + timeout
+
+        def _run(*call_args: Any) -> Any:
+            # 任务内的各阶段同样受 timeout 约束（与请求截止时间取较早者），超时后不再占用线程
+            with deadline_scope(None if at is None else at - time.monotonic()):
+                return fn(*call_args)
+
+        try:
+            # 任务继承提交时的请求截止时间
+            inner = submit_with_deadline(executor, _run, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        def _relay(f: Future) -> None:
+            self._slots.release()
+            if outer.done():
+                return
+            if f.cancelled():
+                outer.cancel()
+            elif f.exception() is not None:
+                _set_exception(outer, f.exception())
+            else:
+                try:
+                    outer.set_result(f.result())
+                except Exception:  # 已超时或已取消
+                    pass
+
+        def _cancel_inner(f: Future) -> None:
+            if f.cancelled() or isinstance(f.exception(), TimeoutError):
+                inner.cancel()
+
+        # 外层 Future 超时或被取消时，尽量取消尚未开始的内层任务
+        outer.add_done_callback(_cancel_inner)
+        inner.add_done_callback(_relay)
+        if at is not None:
+            self._watchdog.add(at, outer)
+        return outer
+
+    def submit_weather(
+        self,
+        city: str,
+        units: str = "metric",
+        timeout: Optional[float] = None,
+        block: bool = True,
+    ) -> Future:
+        """异步获取天气，结果为 (温度, 天气描述)"""
+        return self._submit(
+            self._io, get_weather, (city, self.api_key, units), timeout, block
+        )
+
+    def submit_ai_suggestion(
+        self,
+        city: str,
+        temp: float,
+        desc: str,
+        time_remark: str,
+        lang: str = "ja",
+        ai_mode: str = "ollama",
+        timeout: Optional[float] = None,
+        block: bool = True,
+    ) -> Future:
+        """异步获取 AI 建议；本地 Ollama 使用独立的小线程池，OpenAI 走 I/O 线程池"""
+        executor = self._ai if ai_mode in ("ollama", "local") else self._io
+        return self._submit(
+            executor,
+            get_ai_suggestion,
+            (city, temp, desc, time_remark, lang, ai_mode),
+            timeout,
+            block,
+        )
+
+    def submit_city_by_ip(
+        self, timeout: Optional[float] = None, block: bool = True
+    ) -> Future:
+        """异步通过 IP 获取城市"""
+        return self._submit(self._io, get_city_by_ip, (), timeout, block)
+
+    def map_weather(
+        self, cities: List[str], timeout: Optional[float] = None
+    ) -> List[Future]:
+        """批量提交天气查询，返回与 cities 顺序一致的 Future 列表"""
+        return [self.submit_weather(city, timeout=timeout) for city in cities]
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        self._io.shutdown(wait=wait, cancel_futures=cancel_futures)
+        self._ai.shutdown(wait=wait, cancel_futures=cancel_futures)
+        self._watchdog.close()
+
+    def __enter__(self) -> "AdvisorPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
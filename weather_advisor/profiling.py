@@ -0,0 +1,196 @@
+# weather_advisor/profiling.py
+"""
+一次调用的性能分析（main.py --profile DIR）
+
+同时运行两种分析器，结果写入 DIR：
+- cProfile（确定性）：<名称>.pstats，可用 python -m pstats / snakeviz 查看；
+  另附按累计时间排序的前几十项 <名称>.txt
+- 采样器：每 interval 秒记录一次执行线程的调用栈，<名称>.collapsed 为
+  flamegraph.pl / speedscope 可直接读取的折叠栈格式（「帧;帧;帧 次数」）
+两者都按墙钟时间计时，等待网络响应的时间会计入正在阻塞的调用。
+
+常驻进程（--serve --profile DIR --profile-rate 0.05）中由 RequestSampler
+按比例抽取请求进行分析，并限制每分钟的分析次数，开销有上限。
+"""
+import cProfile
+import itertools
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, Optional, TextIO, TypeVar
+
+from weather_advisor.throttle import TokenBucket
+
+SAMPLE_INTERVAL = 0.005  # 采样间隔（秒）
+MAX_DEPTH = 128  # 折叠栈的最大深度
+REPORT_LINES = 40  # 文本报告中的条目数
+
+T = TypeVar("T")
+
+_seq = itertools.count(1)
+# 同一进程内同时只能有一个 cProfile 在运行，分析会话依次进行
+_active = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """后台线程定期采集指定线程的调用栈，累计为折叠栈"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            # 根在前，叶在后
+            self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """
+    with ProfileSession(directory): ... 分析 with 块内当前线程的执行
+    结束后写出 .pstats / .collapsed / .txt，paths 为写出的文件路径
+    log: 结果摘要的输出位置（默认当时的 sys.stderr）
+    其他线程正在分析时等待其结束（cProfile 不能同时启用两个）
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        label: str = "run",
+        interval: float = SAMPLE_INTERVAL,
+        log: Optional[TextIO] = None,
+    ):
+        self.directory = directory
+        self.log = log
+        safe = re.sub(r"[^\w.-]+", "_", label)[:40] or "run"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.name = f"{stamp}-{os.getpid()}-{next(_seq)}-{safe}"
+        self.interval = interval
+        self.paths: List[str] = []
+        self.elapsed = 0.0
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._start = 0.0
+
+    def __enter__(self) -> "ProfileSession":
+        _active.acquire()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        except BaseException:
+            _active.release()
+            raise
+        self._sampler = StackSampler(threading.get_ident(), self.interval).start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._profiler.disable()
+        _active.release()
+        self.elapsed = time.perf_counter() - self._start
+        self._sampler.stop()
+        try:
+            self._write()
+        except OSError as e:
+            print(f"⚠️ 性能分析结果写入失败: {e}", file=self.log or sys.stderr)
+            return
+        print(
+            f"🔬 性能分析 {self.elapsed * 1000:.0f} ms，{self._sampler.samples} 个采样: "
+            f"{os.path.join(self.directory, self.name)}.{{pstats,collapsed,txt}}",
+            file=self.log or sys.stderr,
+        )
+
+    def _write(self) -> None:
+        base = os.path.join(self.directory, self.name)
+        self._profiler.dump_stats(f"{base}.pstats")
+        self._sampler.write(f"{base}.collapsed")
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(f"wall time: {self.elapsed:.3f}s\n")
+            stats = pstats.Stats(self._profiler, stream=f)
+            stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+        self.paths = [f"{base}.pstats", f"{base}.collapsed", f"{base}.txt"]
+
+
+def profile_call(
+    directory: str, fn: Callable[..., T], *args, label: str = "run", log: Optional[TextIO] = None
+) -> T:
+    """在性能分析下执行 fn(*args)"""
+    with ProfileSession(directory, label, log=log):
+        return fn(*args)
+
+
+class RequestSampler:
+    """
+    常驻进程中按比例抽取请求做性能分析
+    - rate: 被分析的请求比例（0~1）
+    - max_per_minute: 每分钟最多分析的请求数，超出时即使被抽中也直接执行
+    - 已有请求正在被分析时，并发的请求不再分析，直接执行
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        rate: float,
+        max_per_minute: float = 6.0,
+        seed: Optional[int] = None,
+    ):
+        self.directory = directory
+        self.rate = max(0.0, min(1.0, rate))
+        self._limiter = TokenBucket.per_minute(max_per_minute)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.profiled = 0
+
+    def should_profile(self) -> bool:
+        with self._lock:
+            chosen = self._rng.random() < self.rate
+        # 不等待令牌：限额用完时本次不分析
+        return chosen and not _active.locked() and self._limiter.acquire(timeout=0)
+
+    def wrap(self, runner: Callable[..., T], label: str = "serve") -> Callable[..., T]:
+        """返回带抽样分析的 runner"""
+
+        def sampled(*args):
+            if not self.should_profile():
+                return runner(*args)
+            self.profiled += 1
+            # 请求的输出被重定向给客户端，摘要写到常驻进程自己的 stderr
+            return profile_call(self.directory, runner, *args, label=label, log=sys.__stderr__)
+
+        return sampled
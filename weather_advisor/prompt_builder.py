@@ -0,0 +1,186 @@
+# weather_advisor/prompt_builder.py
+"""
+预编译的提示词构建器
+
+每种语言的提示词拆成两部分：
+- 固定前缀：角色、考虑要点和输出要求，导入时生成一次，所有调用完全相同，
+  Ollama / llama.cpp 等服务端可以复用这部分的 KV 缓存
+- 可变后缀：本次的地点、气温、天气、时间段、季节和实测空气质量 / 紫外线，
+  用导入时转换好的 % 模板格式化
+相同输入直接从 LRU 缓存返回，批量生成时同一城市/天气不会重复构建。
+"""
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from weather_advisor.clock import ClockContext, current_clock
+
+# 地域特色提示
+REGIONAL_CONTEXT = {
+    "tokyo": "high humidity area",
+    "osaka": "windy conditions common",
+    "kyoto": "temperature fluctuations due to basin location",
+    "london": "frequent light rain",
+    "paris": "cobblestone streets",
+    "new york": "windy between buildings",
+    "beijing": "dusty conditions and air quality concerns",
+    "shanghai": "high humidity and frequent rain",
+    "singapore": "extremely hot and humid year-round",
+}
+
+_PREFIXES = {
+    "en": """You are a professional styling consultant with expertise in weather-appropriate fashion.
+
+Provide ONE concise, practical clothing recommendation that considers:
+1. Temperature comfort and layering
+2. Weather protection needs
+3. Time-appropriate styling
+4. Seasonal fashion trends
+5. Regional climate characteristics
+
+Response should be specific, actionable, and under 25 words.
+
+""",
+    "zh": """你是专业的时尚造型顾问，专门提供适合天气的穿搭建议。
+
+请提供一条简洁实用的穿衣建议，需要考虑：
+1. 温度舒适性和层次搭配
+2. 天气防护需求
+3. 时间段合适性
+4. 季节时尚趋势
+5. 地域气候特点
+
+回答要具体、可行，控制在25字以内。
+
+""",
+    "ja": """あなたは天候に適したファッションの専門スタイリストです。
+
+以下を考慮した簡潔で実用的な服装提案を1つお願いします：
+1. 気温による快適性と重ね着
+2. 天候に対する防護
+3. 時間帯に適したスタイル
+4. 季節のトレンド
+5. 地域の気候特性
+
+25文字以内で、具体的で実行可能な提案をしてください。
+
+""",
+}
+
+_SUFFIXES = {
+    "en": """Current Context:
+- Location: {city}{region_hint}
+- Temperature: {temp}℃
+- Weather: {desc}
+- Time: {period} ({time_remark})
+- Season: {season}{env}""",
+    "zh": """当前情况：
+- 地点：{city}{region_hint}
+- 气温：{temp}℃
+- 天气：{desc}
+- 时间：{period}（{time_remark}）
+- 季节：{season}{env}""",
+    "ja": """現在の状況：
+- 場所：{city}{region_hint}
+- 気温：{temp}℃
+- 天気：{desc}
+- 時間帯：{period}（{time_remark}）
+- 季節：{season}{env}""",
+}
+
+
+# 后缀模板中的字段顺序
+_FIELDS = ("city", "region_hint", "temp", "desc", "period", "time_remark", "season", "env")
+
+# 实测空气质量 / 紫外线（有数据时追加到后缀末尾）
+_ENV_LINES = {
+    "en": ("\n- Air quality: AQI {aqi}/5", "\n- UV index: {uvi}"),
+    "zh": ("\n- 空气质量：AQI {aqi}/5", "\n- 紫外线指数：{uvi}"),
+    "ja": ("\n- 大気質：AQI {aqi}/5", "\n- UV指数：{uvi}"),
+}
+
+
+def _compile_suffix(template: str) -> str:
+    """把 {字段} 模板转换为按 _FIELDS 顺序取值的 % 模板（比关键字 format 快）"""
+    return template.replace("%", "%%").format(**{name: "%s" for name in _FIELDS})
+
+
+class PromptTemplate(NamedTuple):
+    """一种语言的预编译模板：固定前缀 + % 格式的后缀模板"""
+
+    prefix: str
+    suffix: str
+
+
+class CompiledPrompt(NamedTuple):
+    """构建结果，text 为前缀与后缀拼接后的完整提示词"""
+
+    prefix: str
+    suffix: str
+    text: str
+
+
+TEMPLATES = {
+    lang: PromptTemplate(_PREFIXES[lang], _compile_suffix(_SUFFIXES[lang]))
+    for lang in _PREFIXES
+}
+
+
+@lru_cache(maxsize=1024)
+def regional_context(city: str) -> str:
+    """城市的气候特点（英文），未收录时返回空字符串"""
+    city_lower = city.lower()
+    for city_key, context in REGIONAL_CONTEXT.items():
+        if city_key in city_lower:
+            return context
+    return ""
+
+
+def environment_hint(lang: str, aqi: Optional[int] = None, uvi: Optional[float] = None) -> str:
+    """实测空气质量 / 紫外线的后缀行，没有数据时为空字符串"""
+    air_line, uv_line = _ENV_LINES.get(lang, _ENV_LINES["ja"])
+    hint = air_line.format(aqi=aqi) if aqi is not None else ""
+    if uvi is not None:
+        hint += uv_line.format(uvi=round(uvi, 1))
+    return hint
+
+
+@lru_cache(maxsize=4096)
+def compile_prompt(
+    city: str,
+    temp: float,
+    desc: str,
+    time_remark: str,
+    lang: str,
+    period: str,
+    season: str,
+    env: str = "",
+) -> CompiledPrompt:
+    """
+    按已确定的时间段和季节构建提示词（结果带 LRU 缓存）
+    20 与 20.0 是同一个缓存键，温度统一按 float 格式化，结果与调用顺序无关
+    """
+    template = TEMPLATES.get(lang, TEMPLATES["ja"])
+    context = regional_context(city)
+    region_hint = f" Note: {city} is known for {context}." if context else ""
+    suffix = template.suffix % (
+        city, region_hint, float(temp), desc, period, time_remark, season, env
+    )
+    return CompiledPrompt(template.prefix, suffix, template.prefix + suffix)
+
+
+def build_prompt_parts(
+    city: str,
+    temp: float,
+    desc: str,
+    time_remark: str,
+    lang: str = "ja",
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> CompiledPrompt:
+    """确定时间段和季节后构建提示词"""
+    clock = clock or current_clock()
+    return compile_prompt(
+        city, float(temp), desc, time_remark, lang, clock.period, clock.season,
+        environment_hint(lang, aqi, uvi),
+    )
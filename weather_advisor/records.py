@@ -0,0 +1,163 @@
+# weather_advisor/records.py
+import csv
+import json
+import math
+import sys
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, Optional, Sequence, TextIO
+
+
+def _opt_float(value: Any) -> Optional[float]:
+    return None if value in (None, "") else float(value)
+
+
+def _opt_int(value: Any) -> Optional[int]:
+    return None if value in (None, "") else int(value)
+
+
+@dataclass(slots=True)
+class Observation:
+    """
+    一次天气观测（只保留流程中实际用到的字段）
+    timezone 为 UTC 偏移秒数，与 OpenWeatherMap 返回值一致
+    """
+
+    city: str
+    temp: float
+    desc: str
+    timezone: Optional[int] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    humidity: Optional[float] = None
+    wind_speed: Optional[float] = None
+    aqi: Optional[int] = None  # 空气质量等级 1~5（见 environment）
+    uvi: Optional[float] = None  # 紫外线指数
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any], city: Optional[str] = None) -> "Observation":
+        """从 OpenWeatherMap /weather 响应中提取所需字段"""
+        main = data["main"]
+        coord = data.get("coord") or {}
+        wind = data.get("wind") or {}
+        return cls(
+            city=city or data.get("name", ""),
+            temp=main["temp"],
+            desc=data["weather"][0]["description"],
+            timezone=data.get("timezone"),
+            lat=coord.get("lat"),
+            lon=coord.get("lon"),
+            humidity=main.get("humidity"),
+            wind_speed=wind.get("speed"),
+        )
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Observation":
+        """
+        从扁平的输入记录（JSONL 的一行）创建，缺少 temp/desc 时抛出 KeyError，
+        类型不对或温度不是有限数时抛出 TypeError / ValueError
+        """
+        temp = float(record["temp"])
+        if not math.isfinite(temp):
+            raise ValueError(f"temp must be finite: {record['temp']}")
+        desc = record["desc"]
+        if not isinstance(desc, str):
+            raise TypeError(f"desc must be a string: {desc!r}")
+        return cls(
+            city=record.get("city", ""),
+            temp=temp,
+            desc=desc,
+            timezone=_opt_int(record.get("timezone")),
+            lat=_opt_float(record.get("lat")),
+            lon=_opt_float(record.get("lon")),
+            humidity=_opt_float(record.get("humidity")),
+            wind_speed=_opt_float(record.get("wind_speed")),
+            aqi=_opt_int(record.get("aqi")),
+            uvi=_opt_float(record.get("uvi")),
+        )
+
+
+# 批量读取时按列名定位的可选字段及其转换函数
+_OPTIONAL_COLUMNS = (
+    ("timezone", _opt_int),
+    ("lat", _opt_float),
+    ("lon", _opt_float),
+    ("humidity", _opt_float),
+    ("wind_speed", _opt_float),
+    ("aqi", _opt_int),
+    ("uvi", _opt_float),
+)
+
+
+def observations_from_rows(
+    header: Sequence[str], rows: Iterator[Sequence[str]], first_line: int = 2
+) -> Iterator[Observation]:
+    """
+    批量构造：按表头确定列下标后直接从行（列表）创建记录，
+    不为每行构造中间字典。无效行会被跳过并在 stderr 给出提示
+    """
+    index = {name.strip(): i for i, name in enumerate(header)}
+    try:
+        ci, ti, di = index["city"], index["temp"], index["desc"]
+    except KeyError as e:
+        raise ValueError(f"缺少必要的列: {e}")
+    # 可选列与 Observation 字段顺序一致，未出现的列保持 None
+    optional = tuple((index.get(name), cast) for name, cast in _OPTIONAL_COLUMNS)
+
+    for line_no, row in enumerate(rows, start=first_line):
+        try:
+            yield Observation(
+                row[ci],
+                float(row[ti]),
+                row[di],
+                *[None if i is None else cast(row[i]) for i, cast in optional],
+            )
+        except (IndexError, ValueError):
+            print(f"⚠️ 跳过无效记录 (第 {line_no} 行)", file=sys.stderr)
+
+
+def iter_csv_observations(stream: TextIO) -> Iterator[Observation]:
+    """逐行读取 CSV 观测数据"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return iter(())
+    return observations_from_rows(header, reader)
+
+
+def iter_jsonl_observations(stream: TextIO) -> Iterator[Observation]:
+    """逐行读取 JSONL 观测数据，每行解析后立即转换为记录，不保留原始字典"""
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield Observation.from_record(json.loads(line))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            print(f"⚠️ 跳过无效记录 (第 {line_no} 行)", file=sys.stderr)
+
+
+@dataclass(slots=True)
+class Advice:
+    """一次建议的结构化结果"""
+
+    city: str
+    lang: str
+    temp: float
+    desc: str
+    comfort: str
+    emoji: str
+    suggestion: Optional[str]
+    ai_mode: Optional[str]
+    ai_error: Optional[str] = None
+    reused: bool = False  # 建议是否复用自历史记录
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        if data["ai_error"] is None:
+            del data["ai_error"]
+        if not data["reused"]:
+            del data["reused"]
+        return data
+
+    def to_json(self) -> str:
+        """紧凑 JSON（一行）"""
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,304 @@
+# weather_advisor/similarity.py
+"""
+历史 AI 建议的相似条件检索
+
+按（城市, 天气类别, 是否下雨, 时间段, 季节）分区，每个分区内用 KD 树索引
+（温度, 湿度, 风速）三维特征。新请求在同一分区中查找距离最近、且在阈值以内的
+历史建议，找到时直接复用，不再调用 get_ai_suggestion。
+温度 21.3 与 21.6、「小雨」与「弱い雨」这类精确匹配会错过的情况也能命中。
+
+新增记录先放入分区的待合并列表，积累到一定数量后再重建 KD 树，
+查询成本为 O(log n) + 待合并列表长度。
+"""
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from weather_advisor.advice_table import CATEGORY_COUNT, weather_key
+from weather_advisor.clock import ClockContext, clock_for, current_clock
+from weather_advisor.history import HistoryEntry, HistoryStore, get_history_store
+
+# 可复用的建议来源（只复用 LLM 生成的建议）
+REUSABLE_MODES = ["ollama", "local", "openai"]
+# 请求的 AI 模式 -> 可以复用的记录来源（local 与 ollama 是同一个本地模型）
+_MODE_SOURCES = {
+    "ollama": ("ollama", "local"),
+    "local": ("ollama", "local"),
+    "openai": ("openai",),
+}
+
+# 特征缩放：距离 1.0 约等于温差 1.5°C、湿度差 20%、风速差 3 m/s
+TEMP_SCALE = 1.5
+HUMIDITY_SCALE = 20.0
+WIND_SCALE = 3.0
+# 观测中缺少湿度/风速时使用的中性值
+DEFAULT_HUMIDITY = 60.0
+DEFAULT_WIND = 3.0
+
+Point = Tuple[float, float, float]
+
+
+def feature_vector(
+    temp: float, humidity: Optional[float] = None, wind_speed: Optional[float] = None
+) -> Point:
+    """缩放后的（温度, 湿度, 风速）特征"""
+    return (
+        temp / TEMP_SCALE,
+        (DEFAULT_HUMIDITY if humidity is None else humidity) / HUMIDITY_SCALE,
+        (DEFAULT_WIND if wind_speed is None else wind_speed) / WIND_SCALE,
+    )
+
+
+class KDTree:
+    """静态 KD 树（构建后不可修改），节点为 (point, payload, axis, left, right)"""
+
+    def __init__(self, items: Sequence[Tuple[Point, object]]):
+        self.size = len(items)
+        self._root = self._build(list(items), 0)
+
+    def _build(self, items: list, depth: int):
+        if not items:
+            return None
+        axis = depth % 3
+        items.sort(key=lambda item: item[0][axis])
+        mid = len(items) // 2
+        point, payload = items[mid]
+        return (
+            point,
+            payload,
+            axis,
+            self._build(items[:mid], depth + 1),
+            self._build(items[mid + 1:], depth + 1),
+        )
+
+    def nearest(
+        self,
+        query: Point,
+        max_distance: float = math.inf,
+        accept: Optional[Callable[[object], bool]] = None,
+    ) -> Tuple[Optional[object], float]:
+        """返回 (payload, 距离)；没有 max_distance 以内且被 accept 接受的点时返回 (None, inf)"""
+        best_payload = None
+        best_sq = max_distance * max_distance
+        found = False
+        # 栈中保存 (节点, 查询点到分割面的距离平方)
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, plane_sq = stack.pop()
+            if node is None or plane_sq > best_sq:
+                continue
+            point, payload, axis, left, right = node
+            d_sq = (
+                (point[0] - query[0]) ** 2
+                + (point[1] - query[1]) ** 2
+                + (point[2] - query[2]) ** 2
+            )
+            if d_sq <= best_sq and (accept is None or accept(payload)):
+                best_sq, best_payload, found = d_sq, payload, True
+            diff = query[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # 后进先出：先搜索查询点所在一侧，另一侧出栈时若已不可能更近则跳过
+            stack.append((far, diff * diff))
+            stack.append((near, 0.0))
+        return (best_payload, math.sqrt(best_sq)) if found else (None, math.inf)
+
+
+class _Partition:
+    """一个分区：已建好的 KD 树 + 待合并的新记录"""
+
+    __slots__ = ("tree", "pending", "items")
+
+    def __init__(self):
+        self.tree: Optional[KDTree] = None
+        self.pending: List[Tuple[Point, HistoryEntry]] = []
+        self.items: List[Tuple[Point, HistoryEntry]] = []
+
+    def add(self, point: Point, entry: HistoryEntry) -> None:
+        self.pending.append((point, entry))
+        self.items.append((point, entry))
+
+    def maybe_rebuild(self) -> None:
+        # 待合并列表超过树规模的平方根（至少 32）时重建
+        if len(self.pending) > max(32, int(math.sqrt(len(self.items)))):
+            self.tree = KDTree(self.items)
+            self.pending = []
+
+    def prune(self, cutoff: float) -> int:
+        """删除 cutoff 之前的记录并重建，返回删除的条数"""
+        keep = [item for item in self.items if item[1].ts >= cutoff]
+        removed = len(self.items) - len(keep)
+        if removed:
+            self.items = keep
+            self.tree = KDTree(keep) if keep else None
+            self.pending = []
+        return removed
+
+    def nearest(self, query: Point, max_distance: float, accept) -> Tuple[Optional[HistoryEntry], float]:
+        best, best_dist = (None, math.inf)
+        if self.tree is not None:
+            best, best_dist = self.tree.nearest(query, max_distance, accept)
+        for point, entry in self.pending:
+            d = math.dist(point, query)
+            if d <= max_distance and d < best_dist and accept(entry):
+                best, best_dist = entry, d
+        return best, best_dist
+
+
+def reuse_modes(ai_mode: Optional[str]) -> Tuple[str, ...]:
+    """请求 ai_mode 时可以复用哪些来源的建议；fast / off / auto 等返回空元组"""
+    return _MODE_SOURCES.get(ai_mode or "", ())
+
+
+def _entry_clock(entry: HistoryEntry) -> Tuple[str, str]:
+    """记录的时间段和季节；旧记录没有保存时按本地时间推算"""
+    if entry.period and entry.season:
+        return entry.period, entry.season
+    local = time.localtime(entry.ts)
+    clock = clock_for(local.tm_hour, local.tm_mon)
+    return entry.period or clock.period, entry.season or clock.season
+
+
+def _partition_key(city: str, desc: str, period: str, season: str) -> tuple:
+    rain, category = divmod(weather_key(desc), CATEGORY_COUNT)
+    return city.lower(), category, rain, period, season
+
+
+class SimilarityIndex:
+    """
+    单一语言的相似建议索引
+    - 首次使用时从历史数据库加载最近 max_age 内的 LLM 建议，之后按 refresh_interval 增量加载
+    - 本进程记录的建议通过 note() 立即加入，无需等待后台写入
+    """
+
+    def __init__(
+        self,
+        lang: str,
+        store: Optional[HistoryStore] = None,
+        max_age: float = 24 * 3600,
+        refresh_interval: float = 60.0,
+    ):
+        self.lang = lang
+        self.store = store
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self._partitions: Dict[tuple, _Partition] = {}
+        self._lock = threading.Lock()
+        self._watermark = time.time() - max_age
+        self._loaded_at: Optional[float] = None
+        # 已通过 note() 加入、尚未从数据库读回的记录
+        self._noted: set = set()
+        self.size = 0
+
+    def _add(self, entry: HistoryEntry) -> _Partition:
+        period, season = _entry_clock(entry)
+        key = _partition_key(entry.city, entry.desc, period, season)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = _Partition()
+        partition.add(feature_vector(entry.temp, entry.humidity, entry.wind_speed), entry)
+        self.size += 1
+        return partition
+
+    def note(self, entry: HistoryEntry) -> None:
+        """加入本进程刚生成的建议"""
+        if entry.lang != self.lang or entry.mode not in REUSABLE_MODES:
+            return
+        with self._lock:
+            self._noted.add((entry.ts, entry.city.lower()))
+            self._add(entry).maybe_rebuild()
+
+    def _load(self, entries: Sequence[HistoryEntry]) -> None:
+        # 批量加入后每个分区只重建一次
+        touched = {}
+        for entry in entries:
+            self._watermark = max(self._watermark, entry.ts)
+            key = (entry.ts, entry.city.lower())
+            if key in self._noted:
+                self._noted.discard(key)
+                continue
+            partition = self._add(entry)
+            touched[id(partition)] = partition
+        for partition in touched.values():
+            partition.maybe_rebuild()
+
+    def _prune(self, cutoff: float) -> None:
+        # 超过 max_age 的记录不会再被复用，从分区中删除，长时间运行时内存不会持续增长
+        for key, partition in list(self._partitions.items()):
+            self.size -= partition.prune(cutoff)
+            if not partition.items:
+                del self._partitions[key]
+        self._noted = {key for key in self._noted if key[0] >= cutoff}
+
+    def refresh(self, force: bool = False) -> None:
+        """从数据库增量加载其他进程写入的记录，并清理过期记录"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+                return
+            if self.store is not None:
+                try:
+                    # 分页读到底，水位只推进到实际读到的最后一条
+                    self._load(
+                        list(self.store.iter_suggestions(
+                            self.lang, REUSABLE_MODES, after=self._watermark
+                        ))
+                    )
+                except sqlite3.Error as e:
+                    print(f"⚠️ 历史建议索引加载失败: {e}")
+            self._prune(time.time() - self.max_age)
+            self._loaded_at = now
+
+    def nearest(
+        self,
+        city: str,
+        temp: float,
+        desc: str,
+        humidity: Optional[float] = None,
+        wind_speed: Optional[float] = None,
+        clock: Optional[ClockContext] = None,
+        max_distance: float = 1.0,
+        modes: Optional[Sequence[str]] = None,
+    ) -> Optional[HistoryEntry]:
+        """
+        返回条件最相近且距离在 max_distance 以内的历史建议
+        modes: 只复用这些模式生成的建议（None 表示不限）
+        """
+        self.refresh()
+        clock = clock or current_clock()
+        partition = self._partitions.get(
+            _partition_key(city, desc, clock.period, clock.season)
+        )
+        if partition is None:
+            return None
+        cutoff = time.time() - self.max_age
+        entry, _ = partition.nearest(
+            feature_vector(temp, humidity, wind_speed),
+            max_distance,
+            lambda e: e.ts >= cutoff and (modes is None or e.mode in modes),
+        )
+        return entry
+
+
+_indexes: Dict[str, SimilarityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_similarity_index(lang: str) -> SimilarityIndex:
+    """返回进程内共享的指定语言索引"""
+    index = _indexes.get(lang)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(lang)
+            if index is None:
+                index = SimilarityIndex(lang, get_history_store())
+                _indexes[lang] = index
+    return index
+
+
+def note_suggestion(entry: HistoryEntry) -> None:
+    """把刚记录的建议加入已创建的索引（尚未使用的语言不需要）"""
+    index = _indexes.get(entry.lang)
+    if index is not None:
+        index.note(entry)
@@ -0,0 +1,103 @@
+# weather_advisor/throttle.py
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from weather_advisor.deadline import DeadlineExceeded, remaining
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+    取不到令牌时按到达顺序排队等待，而不是直接失败
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        # rate: 每秒补充的令牌数；capacity: 允许的突发量
+        # 容量保持较小，保证任意 60 秒窗口内的请求数不超过上限
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: int, capacity: float = 1.0) -> "TokenBucket":
+        """按每分钟请求数创建限流器"""
+        return cls(limit / 60.0, capacity)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._last) * self.rate
+        )
+        self._last = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        获取一个令牌，必要时阻塞等待
+        返回: 是否在 timeout 内拿到令牌（timeout=None 表示一直等）
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            # 先预约令牌（允许为负），负值即排在前面的等待量
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if timeout is not None and wait > timeout:
+                self._tokens += 1
+                return False
+
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    请求合并（single-flight）
+    同一 key 的并发调用只执行一次，其余调用方等待并共享同一结果
+    等待不超过各自的截止时间；发起方因自己的截止时间失败时，其余调用方重新发起
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+            if leader:
+                break
+            if not call.event.wait(remaining()):
+                raise DeadlineExceeded()
+            if isinstance(call.error, DeadlineExceeded):
+                # 发起方的截止时间不代表本调用方的
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再唤醒，之后到达的调用会发起新的请求
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
@@ -0,0 +1,173 @@
+# weather_advisor/usage.py
+"""
+AI 调用的 token / 费用 / 延迟记账与预算
+
+每次 OpenAI 调用记录一行到历史数据库的 ai_usage 表（与建议历史同一个文件），
+预算按最近 openai_budget_hours 小时内的累计值判断，跨进程有效。
+"""
+import sqlite3
+import threading
+import time
+from dataclasses import astuple, dataclass
+from typing import Any, Dict, Optional
+
+from weather_advisor.history import HISTORY_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_usage (
+    ts REAL NOT NULL,
+    mode TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ai_usage_ts ON ai_usage (ts);
+"""
+
+
+@dataclass(slots=True)
+class CallUsage:
+    """一次 AI 调用的用量"""
+
+    ts: float
+    mode: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float
+    cost: float = 0.0
+
+
+@dataclass(slots=True)
+class UsageTotals:
+    """一段时间内的累计用量"""
+
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def avg_latency(self) -> float:
+        return self.latency / self.calls if self.calls else 0.0
+
+
+@dataclass(slots=True)
+class Budget:
+    """
+    OpenAI 预算（None 表示不限）
+    超出后按 fallback 降级：ollama 改用本地模型，fast 改用历史建议检索，off 直接使用传统模式
+    """
+
+    max_tokens: Optional[int] = None
+    max_cost: Optional[float] = None
+    period: float = 24 * 3600
+    fallback: str = "ollama"
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Budget":
+        return cls(
+            max_tokens=config.get("openai_token_budget"),
+            max_cost=config.get("openai_cost_budget"),
+            period=config.get("openai_budget_hours", 24) * 3600,
+            fallback=config.get("openai_budget_fallback", "ollama"),
+        )
+
+    @property
+    def limited(self) -> bool:
+        return self.max_tokens is not None or self.max_cost is not None
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int, config: Dict[str, Any]) -> float:
+    """按配置中的单价（美元 / 1K token）估算费用"""
+    return (
+        prompt_tokens * config.get("openai_prompt_price", 0.0)
+        + completion_tokens * config.get("openai_completion_price", 0.0)
+    ) / 1000
+
+
+class UsageLedger:
+    """
+    用量账本
+    - record() 同步写入（每次 AI 调用只有一行，相对调用本身可以忽略）
+    - session 为本进程内的累计值，totals() 查询数据库中的累计值
+    """
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.session = UsageTotals()
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, usage: CallUsage) -> None:
+        with self._lock:
+            s = self.session
+            s.calls += 1
+            s.prompt_tokens += usage.prompt_tokens
+            s.completion_tokens += usage.completion_tokens
+            s.latency += usage.latency
+            s.cost += usage.cost
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO ai_usage VALUES (?, ?, ?, ?, ?, ?, ?)", astuple(usage)
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️ 用量记录写入失败: {e}")
+
+    def totals(self, since: Optional[float] = None, mode: Optional[str] = None) -> UsageTotals:
+        """查询 since 之后的累计用量"""
+        sql = (
+            "SELECT COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0),"
+            " COALESCE(SUM(latency), 0), COALESCE(SUM(cost), 0) FROM ai_usage WHERE ts >= ?"
+        )
+        params: list = [since or 0.0]
+        if mode:
+            sql += " AND mode = ?"
+            params.append(mode)
+        return UsageTotals(*self._connect().execute(sql, params).fetchone())
+
+    def exceeded(self, budget: Budget, mode: str = "openai") -> Optional[str]:
+        """预算已用完时返回超出的项目（tokens / cost），否则返回 None"""
+        if not budget.limited:
+            return None
+        used = self.totals(since=time.time() - budget.period, mode=mode)
+        if budget.max_tokens is not None and used.total_tokens >= budget.max_tokens:
+            return "tokens"
+        if budget.max_cost is not None and used.cost >= budget.max_cost:
+            return "cost"
+        return None
+
+
+_default_ledger: Optional[UsageLedger] = None
+_default_lock = threading.Lock()
+
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """返回进程内共享的用量账本；数据库无法打开时返回 None"""
+    global _default_ledger
+    if _default_ledger is None:
+        with _default_lock:
+            if _default_ledger is None:
+                try:
+                    _default_ledger = UsageLedger()
+                except sqlite3.Error as e:
+                    print(f"⚠️ 无法打开用量数据库: {e}")
+                    return None
+    return _default_ledger
@@ -1,13 +1,14 @@
 # weather_advisor/utils.py
-import datetime
+import os
 import requests
-import calendar
-from typing import Tuple, Optional, Dict, Any
+from typing import Optional, Dict
+from weather_advisor.clock import ClockContext, current_clock
+from weather_advisor.deadline import DeadlineExceeded, stage_timeout
 
 
-def get_time_greeting(lang: str = "ja") -> str:
+def get_time_greeting(lang: str = "ja", clock: Optional[ClockContext] = None) -> str:
     """根据时间段返回问候语"""
-    current_hour = datetime.datetime.now().hour
+    clock = clock or current_clock()
 
     greetings = {
         "ja": {
@@ -30,22 +31,12 @@ def get_time_greeting(lang: str = "ja") -> str:
         },
     }
 
-    if 5 <= current_hour <= 11:
-        period = "morning"
-    elif 12 <= current_hour <= 17:
-        period = "afternoon"
-    elif 18 <= current_hour <= 23:
-        period = "evening"
-    else:
-        period = "night"
-
-    return greetings.get(lang, greetings["ja"])[period]
+    return greetings.get(lang, greetings["ja"])[clock.period]
 
 
-def get_time_remark(lang: str = "ja") -> str:
+def get_time_remark(lang: str = "ja", clock: Optional[ClockContext] = None) -> str:
     """根据当前时间返回时间段描述 - 保持原有功能但增强内容"""
-    current_hour = datetime.datetime.now().hour
-    now = datetime.datetime.now()
+    clock = clock or current_clock()
 
     # 增强版时间描述，包含更多细节
     time_remarks = {
@@ -78,37 +69,14 @@ def get_time_remark(lang: str = "ja") -> str:
         },
     }
 
-    remarks = time_remarks.get(lang, time_remarks["ja"])
-
-    if 5 <= current_hour <= 7:
-        return remarks["early_morning"]
-    elif 8 <= current_hour <= 11:
-        return remarks["morning"]
-    elif 12 <= current_hour <= 13:
-        return remarks["noon"]
-    elif 14 <= current_hour <= 17:
-        return remarks["afternoon"]
-    elif 18 <= current_hour <= 20:
-        return remarks["evening"]
-    elif 21 <= current_hour <= 23:
-        return remarks["night"]
-    else:
-        return remarks["late_night"]
+    return time_remarks.get(lang, time_remarks["ja"])[clock.remark_key]
 
 
-def get_seasonal_reminder(lang: str = "ja") -> Dict[str, str]:
+def get_seasonal_reminder(
+    lang: str = "ja", clock: Optional[ClockContext] = None
+) -> Dict[str, str]:
     """根据当前季节返回提醒"""
-    month = datetime.datetime.now().month
-
-    # 定义季节
-    if month in [12, 1, 2]:
-        season = "winter"
-    elif month in [3, 4, 5]:
-        season = "spring"
-    elif month in [6, 7, 8]:
-        season = "summer"
-    else:
-        season = "autumn"
+    clock = clock or current_clock()
 
     seasonal_tips = {
         "ja": {
@@ -179,90 +147,178 @@ def get_seasonal_reminder(lang: str = "ja") -> Dict[str, str]:
         },
     }
 
-    return seasonal_tips.get(lang, seasonal_tips["ja"])[season]
-
-
-def get_regional_advice(city: str, temp: float, lang: str = "ja") -> str:
-    """根据地域特色返回建议"""
+    return seasonal_tips.get(lang, seasonal_tips["ja"])[clock.season]
+
+
+# 各城市的地域特色建议（按字典顺序匹配城市名）
+REGIONAL_TIPS = {
+    "ja": {
+        # 日本主要城市
+        "tokyo": "東京は湿度が高めです。通気性の良い素材をおすすめします",
+        "osaka": "大阪は風が強い日が多いです。髪型が崩れないよう帽子があると安心",
+        "kyoto": "京都は盆地のため寒暖差が激しいです。調節しやすい服装を",
+        "hokkaido": "北海道は予想以上に寒くなることが。厚手のコートをお忘れなく",
+        "sapporo": "札幌は雪道が滑りやすいです。滑り止めのある靴がおすすめ",
+        "okinawa": "沖縄の紫外線は本土より強力です。しっかりとした日焼け対策を",
+        "nagoya": "名古屋は乾燥しやすい地域です。保湿対策をお願いします",
+        "fukuoka": "福岡は黄砂の影響を受けやすいです。マスクの準備を",
+        "hiroshima": "広島は瀬戸内海の影響で湿度が高めです",
+        "sendai": "仙台は東北の中では温暖ですが、風が強い日があります",
+        # 海外都市
+        "london": "ロンドンは急な雨が多いです。折りたたみ傘をお持ちください",
+        "paris": "パリの石畳は歩きにくいです。履きなれた靴がおすすめ",
+        "new york": "ニューヨークは風が強いエリアがあります。風対策を",
+        "shanghai": "上海は湿度が高く、汗をかきやすいです。替えのシャツがあると安心",
+        "seoul": "ソウルは大気汚染に注意。マスクの着用をおすすめします",
+        "singapore": "シンガポールは一年中高温多湿。軽くて通気性の良い服装を",
+    },
+    "zh": {
+        "beijing": "北京风沙较大，建议戴口罩保护",
+        "shanghai": "上海湿度较高，选择透气面料",
+        "guangzhou": "广州紫外线强烈，注意防晒",
+        "shenzhen": "深圳多雨，建议携带雨具",
+        "chengdu": "成都湿气重，注意防潮",
+        "hangzhou": "杭州四季分明，注意温差变化",
+        "nanjing": "南京夏热冬冷，选择合适厚度的衣物",
+        "tokyo": "东京湿度偏高，建议选择透气材质",
+        "osaka": "大阪风力较强，注意帽子固定",
+        "london": "伦敦多阵雨，记得带伞",
+        "paris": "巴黎石板路较多，选择舒适鞋子",
+        "new york": "纽约部分区域风大，注意防风",
+        "seoul": "首尔空气质量需关注，建议戴口罩",
+    },
+    "en": {
+        "london": "London has frequent showers. Bring an umbrella!",
+        "paris": "Paris cobblestones can be tricky. Wear comfortable shoes",
+        "new york": "NYC can be windy between buildings. Layer up!",
+        "tokyo": "Tokyo tends to be humid. Choose breathable fabrics",
+        "beijing": "Beijing can be dusty. Consider wearing a mask",
+        "shanghai": "Shanghai is quite humid. Moisture-wicking clothes recommended",
+        "sydney": "Sydney sun is strong. Don't forget sunscreen!",
+        "singapore": "Singapore is hot and humid year-round. Light, airy clothes work best",
+        "seoul": "Seoul air quality varies. A mask might be helpful",
+        "bangkok": "Bangkok is extremely hot and humid. Lightest possible clothing recommended",
+    },
+}
+
+# 温度相关地域建议
+TEMP_BASED_TIPS = {
+    "ja": {
+        "hot_humid": "高温多湿の地域では、速乾性のある素材がおすすめです",
+        "cold_dry": "寒冷乾燥地域では、保温と保湿の両方が大切です",
+        "moderate": "過ごしやすい気候ですが、急な天候変化にご注意を",
+    },
+    "zh": {
+        "hot_humid": "高温高湿地区建议选择快干面料",
+        "cold_dry": "寒冷干燥地区请注意保温保湿",
+        "moderate": "气候宜人，但需防范天气突变",
+    },
+    "en": {
+        "hot_humid": "For hot humid areas, quick-dry fabrics work best",
+        "cold_dry": "Cold dry regions require both warmth and moisture protection",
+        "moderate": "Pleasant weather, but watch for sudden changes",
+    },
+}
+
+
+# 实测空气质量 / 紫外线的提示，按等级（见 air_level / uv_level）排列
+ENVIRONMENT_TIPS = {
+    "ja": {
+        "air": (
+            "大気質は良好です（AQI {aqi}）",
+            "大気質はやや悪いです（AQI {aqi}）。敏感な方はマスクを",
+            "大気質が悪いです（AQI {aqi}）。マスクの着用をおすすめします",
+        ),
+        "uv": (
+            "紫外線は穏やかです（UV指数 {uvi}）",
+            "紫外線が強めです（UV指数 {uvi}）。日焼け止めをお忘れなく",
+            "紫外線が非常に強いです（UV指数 {uvi}）。日差しを避けましょう",
+        ),
+    },
+    "zh": {
+        "air": (
+            "空气质量良好（AQI {aqi}）",
+            "空气质量一般（AQI {aqi}），敏感人群建议戴口罩",
+            "空气质量较差（AQI {aqi}），建议戴口罩",
+        ),
+        "uv": (
+            "紫外线较弱（UV指数 {uvi}）",
+            "紫外线较强（UV指数 {uvi}），注意防晒",
+            "紫外线很强（UV指数 {uvi}），尽量避免暴晒",
+        ),
+    },
+    "en": {
+        "air": (
+            "Air quality is good today (AQI {aqi})",
+            "Air quality is moderate (AQI {aqi}). Sensitive groups may want a mask",
+            "Air quality is poor (AQI {aqi}). A mask is recommended",
+        ),
+        "uv": (
+            "UV is mild today (index {uvi})",
+            "UV is high today (index {uvi}). Don't forget sunscreen",
+            "UV is very high today (index {uvi}). Limit time in the sun",
+        ),
+    },
+}
+
+# 地域表中按城市假定的空气质量 / 紫外线提示，有实测数据时改用实测值
+AIR_TIP_CITIES = ("seoul", "beijing", "fukuoka")
+UV_TIP_CITIES = ("okinawa", "guangzhou", "sydney")
+
+
+def air_level(aqi: Optional[int]) -> int:
+    """空气质量等级：0 良好（AQI 1~2 或未知）、1 一般（3）、2 较差（4~5）"""
+    if aqi is None or aqi <= 2:
+        return 0
+    return 1 if aqi == 3 else 2
+
+
+def uv_level(uvi: Optional[float]) -> int:
+    """紫外线等级：0 低/中（<6 或未知）、1 高（6~8）、2 很高（≥8）"""
+    if uvi is None or uvi < 6:
+        return 0
+    return 1 if uvi < 8 else 2
+
+
+def _environment_tip(lang: str, kind: str, level: int, aqi=None, uvi=None) -> str:
+    tips = ENVIRONMENT_TIPS.get(lang, ENVIRONMENT_TIPS["en"])[kind]
+    return f"🗺️ {tips[level].format(aqi=aqi, uvi=None if uvi is None else round(uvi, 1))}"
+
+
+def get_regional_advice(
+    city: str,
+    temp: float,
+    lang: str = "ja",
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
+) -> str:
+    """根据地域特色返回建议；有实测空气质量 / 紫外线数据时优先使用"""
     city_lower = city.lower()
+    air, uv = air_level(aqi), uv_level(uvi)
 
-    regional_tips = {
-        "ja": {
-            # 日本主要城市
-            "tokyo": "東京は湿度が高めです。通気性の良い素材をおすすめします",
-            "osaka": "大阪は風が強い日が多いです。髪型が崩れないよう帽子があると安心",
-            "kyoto": "京都は盆地のため寒暖差が激しいです。調節しやすい服装を",
-            "hokkaido": "北海道は予想以上に寒くなることが。厚手のコートをお忘れなく",
-            "sapporo": "札幌は雪道が滑りやすいです。滑り止めのある靴がおすすめ",
-            "okinawa": "沖縄の紫外線は本土より強力です。しっかりとした日焼け対策を",
-            "nagoya": "名古屋は乾燥しやすい地域です。保湿対策をお願いします",
-            "fukuoka": "福岡は黄砂の影響を受けやすいです。マスクの準備を",
-            "hiroshima": "広島は瀬戸内海の影響で湿度が高めです",
-            "sendai": "仙台は東北の中では温暖ですが、風が強い日があります",
-            # 海外都市
-            "london": "ロンドンは急な雨が多いです。折りたたみ傘をお持ちください",
-            "paris": "パリの石畳は歩きにくいです。履きなれた靴がおすすめ",
-            "new york": "ニューヨークは風が強いエリアがあります。風対策を",
-            "shanghai": "上海は湿度が高く、汗をかきやすいです。替えのシャツがあると安心",
-            "seoul": "ソウルは大気汚染に注意。マスクの着用をおすすめします",
-            "singapore": "シンガポールは一年中高温多湿。軽くて通気性の良い服装を",
-        },
-        "zh": {
-            "beijing": "北京风沙较大，建议戴口罩保护",
-            "shanghai": "上海湿度较高，选择透气面料",
-            "guangzhou": "广州紫外线强烈，注意防晒",
-            "shenzhen": "深圳多雨，建议携带雨具",
-            "chengdu": "成都湿气重，注意防潮",
-            "hangzhou": "杭州四季分明，注意温差变化",
-            "nanjing": "南京夏热冬冷，选择合适厚度的衣物",
-            "tokyo": "东京湿度偏高，建议选择透气材质",
-            "osaka": "大阪风力较强，注意帽子固定",
-            "london": "伦敦多阵雨，记得带伞",
-            "paris": "巴黎石板路较多，选择舒适鞋子",
-            "new york": "纽约部分区域风大，注意防风",
-            "seoul": "首尔空气质量需关注，建议戴口罩",
-        },
-        "en": {
-            "london": "London has frequent showers. Bring an umbrella!",
-            "paris": "Paris cobblestones can be tricky. Wear comfortable shoes",
-            "new york": "NYC can be windy between buildings. Layer up!",
-            "tokyo": "Tokyo tends to be humid. Choose breathable fabrics",
-            "beijing": "Beijing can be dusty. Consider wearing a mask",
-            "shanghai": "Shanghai is quite humid. Moisture-wicking clothes recommended",
-            "sydney": "Sydney sun is strong. Don't forget sunscreen!",
-            "singapore": "Singapore is hot and humid year-round. Light, airy clothes work best",
-            "seoul": "Seoul air quality varies. A mask might be helpful",
-            "bangkok": "Bangkok is extremely hot and humid. Lightest possible clothing recommended",
-        },
-    }
-
-    # 温度相关地域建议
-    temp_based_tips = {
-        "ja": {
-            "hot_humid": "高温多湿の地域では、速乾性のある素材がおすすめです",
-            "cold_dry": "寒冷乾燥地域では、保温と保湿の両方が大切です",
-            "moderate": "過ごしやすい気候ですが、急な天候変化にご注意を",
-        },
-        "zh": {
-            "hot_humid": "高温高湿地区建议选择快干面料",
-            "cold_dry": "寒冷干燥地区请注意保温保湿",
-            "moderate": "气候宜人，但需防范天气突变",
-        },
-        "en": {
-            "hot_humid": "For hot humid areas, quick-dry fabrics work best",
-            "cold_dry": "Cold dry regions require both warmth and moisture protection",
-            "moderate": "Pleasant weather, but watch for sudden changes",
-        },
-    }
+    # 实测值很差时优先提示
+    if air == 2:
+        return _environment_tip(lang, "air", air, aqi=aqi)
+    if uv == 2:
+        return _environment_tip(lang, "uv", uv, uvi=uvi)
 
     # 查找城市特定建议
-    tips = regional_tips.get(lang, regional_tips["en"])
+    tips = REGIONAL_TIPS.get(lang, REGIONAL_TIPS["en"])
     for city_key in tips:
         if city_key in city_lower:
+            if aqi is not None and city_key in AIR_TIP_CITIES:
+                return _environment_tip(lang, "air", air, aqi=aqi)
+            if uvi is not None and city_key in UV_TIP_CITIES:
+                return _environment_tip(lang, "uv", uv, uvi=uvi)
             return f"🗺️ {tips[city_key]}"
 
+    if air:
+        return _environment_tip(lang, "air", air, aqi=aqi)
+    if uv:
+        return _environment_tip(lang, "uv", uv, uvi=uvi)
+
     # 根据温度返回通用地域建议
-    temp_tips = temp_based_tips.get(lang, temp_based_tips["en"])
+    temp_tips = TEMP_BASED_TIPS.get(lang, TEMP_BASED_TIPS["en"])
     if temp > 25:
         return f"🗺️ {temp_tips['hot_humid']}"
     elif temp < 10:
@@ -323,17 +379,21 @@ def format_personalized_weather_display(
     suggestion: str,
     time_remark: str,
     lang: str = "ja",
+    clock: Optional[ClockContext] = None,
+    aqi: Optional[int] = None,
+    uvi: Optional[float] = None,
 ) -> str:
-    """整合所有个性化元素的完整显示"""
+    """整合所有个性化元素的完整显示（aqi / uvi 为实测的空气质量和紫外线）"""
+    clock = clock or current_clock()
 
     # 1. 时间问候
-    greeting = get_time_greeting(lang)
+    greeting = get_time_greeting(lang, clock)
 
     # 2. 季节提醒
-    seasonal = get_seasonal_reminder(lang)
+    seasonal = get_seasonal_reminder(lang, clock)
 
     # 3. 地域建议
-    regional = get_regional_advice(city, temp, lang)
+    regional = get_regional_advice(city, temp, lang, aqi, uvi)
 
     # 组装完整信息
     separator = "─" * 35
@@ -389,23 +449,29 @@ def format_personalized_weather_display(
     return output.strip()
 
 
+IP_LOOKUP_SERVICES = [
+    "http://ipapi.co/city/",
+    "https://ipinfo.io/city",
+    "http://ip-api.com/line?fields=city",
+]
+
+
 def get_city_by_ip() -> str:
     """通过IP获取城市信息 - 增强版实现"""
     try:
-        # 尝试多个IP定位服务，提高成功率
-        services = [
-            "http://ipapi.co/city/",
-            "https://ipinfo.io/city",
-            "http://ip-api.com/line?fields=city",
-        ]
+        # 尝试多个IP定位服务，提高成功率（IP_LOOKUP_URLS 可用逗号分隔覆盖）
+        override = os.getenv("IP_LOOKUP_URLS")
+        services = override.split(",") if override else IP_LOOKUP_SERVICES
 
         for service in services:
             try:
-                response = requests.get(service, timeout=3)
+                response = requests.get(service, timeout=stage_timeout(3))
                 if response.status_code == 200:
                     city = response.text.strip()
                     if city and city != "Unknown":
                         return normalize_city(city)
+            except DeadlineExceeded:
+                break
             except:
                 continue
 
@@ -503,39 +569,41 @@ def validate_temperature(temp: float) -> bool:
     return -50 <= temp <= 60  # 地球上合理的温度范围
 
 
+COMFORT_LABELS = {
+    "ja": {
+        "very_hot": "🔥 非常に暑い",
+        "hot": "🌡️ 暑い",
+        "warm": "😊 暖かい",
+        "comfortable": "😌 快適",
+        "cool": "🍃 涼しい",
+        "cold": "🧊 寒い",
+        "very_cold": "🥶 非常に寒い",
+    },
+    "zh": {
+        "very_hot": "🔥 非常炎热",
+        "hot": "🌡️ 炎热",
+        "warm": "😊 温暖",
+        "comfortable": "😌 舒适",
+        "cool": "🍃 凉爽",
+        "cold": "🧊 寒冷",
+        "very_cold": "🥶 严寒",
+    },
+    "en": {
+        "very_hot": "🔥 Very Hot",
+        "hot": "🌡️ Hot",
+        "warm": "😊 Warm",
+        "comfortable": "😌 Comfortable",
+        "cool": "🍃 Cool",
+        "cold": "🧊 Cold",
+        "very_cold": "🥶 Very Cold",
+    },
+}
+
+
 def get_comfort_level(temp: float, desc: str, lang: str = "ja") -> str:
     """根据温度和天气返回舒适度评级"""
-    comfort_labels = {
-        "ja": {
-            "very_hot": "🔥 非常に暑い",
-            "hot": "🌡️ 暑い",
-            "warm": "😊 暖かい",
-            "comfortable": "😌 快適",
-            "cool": "🍃 涼しい",
-            "cold": "🧊 寒い",
-            "very_cold": "🥶 非常に寒い",
-        },
-        "zh": {
-            "very_hot": "🔥 非常炎热",
-            "hot": "🌡️ 炎热",
-            "warm": "😊 温暖",
-            "comfortable": "😌 舒适",
-            "cool": "🍃 凉爽",
-            "cold": "🧊 寒冷",
-            "very_cold": "🥶 严寒",
-        },
-        "en": {
-            "very_hot": "🔥 Very Hot",
-            "hot": "🌡️ Hot",
-            "warm": "😊 Warm",
-            "comfortable": "😌 Comfortable",
-            "cool": "🍃 Cool",
-            "cold": "🧊 Cold",
-            "very_cold": "🥶 Very Cold",
-        },
-    }
 
-    labels = comfort_labels.get(lang, comfort_labels["ja"])
+    labels = COMFORT_LABELS.get(lang, COMFORT_LABELS["ja"])
 
     if temp > 35:
         return labels["very_hot"]